@@ -1,19 +1,44 @@
 import os
+import uuid
 from dotenv import load_dotenv
 import chainlit as cl
-from datetime import datetime
+import chainlit.server
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
-from config import DATABASE_NAME, MONGO_URI
+from config import (
+    DATABASE_NAME,
+    MONGO_URI,
+    CHECKPOINT_COLLECTION_NAME,
+    CHECKPOINT_DELTA,
+    CHECKPOINT_SNAPSHOT_INTERVAL,
+    CHECKPOINT_SERIALIZER,
+    CHECKPOINT_KEEP_LAST,
+    CHECKPOINT_THREAD_TTL_DAYS,
+    CHECKPOINT_COMPACTION_INTERVAL,
+    CHECKPOINT_WRITE_BEHIND,
+    CHECKPOINT_FLUSH_INTERVAL_MS,
+    CHECKPOINT_CACHE_SIZE,
+    CHECKPOINT_CACHE_VALIDATION,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_TOOL_RESULT_TOKENS,
+    CONTEXT_SUMMARY_WORDS,
+    STREAM_WINDOW_MS,
+    STREAM_MAX_BYTES,
+    STREAM_MAX_BUFFER_BYTES,
+)
 from tools.mongodb_tools import tools
 from agent import create_agent
-from graph import create_workflow, AgentState
-from mongodb.connect import get_mongo_client
+from graph import create_workflow
+from context_window import ContextWindowManager, SUMMARY_TAG
+from streaming import TokenStreamer
+from mongodb.connect import get_mongo_client, registry
 from mongodb import checkpointer
-from pymongo import AsyncMongoClient
-from langchain_core.messages import HumanMessage, AIMessage
+from mongodb.serde import get_serializer
+from db_utils import async_mongo_client
+from langchain_core.messages import HumanMessage
 from utilities import sanitize_name
-from langchain.schema.runnable import Runnable
 
 # Load environment variables
 load_dotenv()
@@ -28,8 +53,11 @@ if not mongo_client:
     print("Failed to connect to MongoDB. Exiting...")
     exit(1)
 
-@cl.on_chat_start
-async def on_chat_start():
+def build_graph():
+    """
+    Builds the model, agent, workflow and checkpointer once per process. None of it depends on the
+    user: every chat session shares the compiled graph and only differs by its config and thread.
+    """
     # model = ChatAnthropic(name="chat_anthropic", model="claude-3-5-sonnet-20240620", temperature=0, streaming=True)
     model = ChatOpenAI(name="chat_openai", model="gpt-4o-2024-05-13", temperature=0, streaming=True)
 
@@ -39,43 +67,115 @@ async def on_chat_start():
         system_message="You are helpful HR Chatbot Agent.",
     )
 
-    workflow = create_workflow(chatbot_agent, tools)
-
-    mongo_client = AsyncMongoClient(MONGO_URI)
-    mongodb_checkpointer = checkpointer.MongoDBSaver(mongo_client, DATABASE_NAME, "checkpoints_collection")
+    # Bounds the prompt of long sessions; the same model writes the rolling summary
+    context_manager = ContextWindowManager(
+        token_budget=CONTEXT_TOKEN_BUDGET,
+        tool_result_tokens=CONTEXT_TOOL_RESULT_TOKENS,
+        summarizer=model,
+        summary_words=CONTEXT_SUMMARY_WORDS,
+    )
 
-    graph = workflow.compile(checkpointer=mongodb_checkpointer)
+    workflow = create_workflow(chatbot_agent, tools, context_manager=context_manager)
+
+    # Same AsyncMongoClient as the async tools: one connection pool for every session
+    mongodb_checkpointer = checkpointer.MongoDBSaver(
+        async_mongo_client,
+        DATABASE_NAME,
+        CHECKPOINT_COLLECTION_NAME,
+        serde=get_serializer(CHECKPOINT_SERIALIZER),
+        delta=CHECKPOINT_DELTA,
+        snapshot_interval=CHECKPOINT_SNAPSHOT_INTERVAL,
+        keep_last=CHECKPOINT_KEEP_LAST,
+        thread_ttl=timedelta(days=CHECKPOINT_THREAD_TTL_DAYS) if CHECKPOINT_THREAD_TTL_DAYS else None,
+        write_behind=CHECKPOINT_WRITE_BEHIND,
+        flush_interval_ms=CHECKPOINT_FLUSH_INTERVAL_MS,
+        cache_size=CHECKPOINT_CACHE_SIZE,
+        cache_validation=CHECKPOINT_CACHE_VALIDATION,
+    )
 
-    state = AgentState(messages=[])
+    return workflow.compile(checkpointer=mongodb_checkpointer), mongodb_checkpointer
+
+# Compiled at import, before Chainlit serves the first session
+graph, mongodb_checkpointer = build_graph()
+checkpoint_compaction = None
+
+# Chainlit has no startup or shutdown callback, so the server's lifespan is wrapped: the checkpoint
+# indexes and retention task are set up before the first session, and the shared MongoDB clients
+# are closed on the event loop the async clients were used on. Closing has to happen inside
+# Chainlit's lifespan: it ends the process with os._exit, which also skips atexit handlers.
+chainlit_lifespan = chainlit.server.app.router.lifespan_context
+
+@asynccontextmanager
+async def lifespan(app):
+    global checkpoint_compaction
+    async with chainlit_lifespan(app):
+        try:
+            # Index creation is idempotent; retention runs in one background task per process
+            await mongodb_checkpointer.setup()
+        except Exception as e:
+            print(f"Failed to create checkpoint indexes: {e}")
+        if CHECKPOINT_KEEP_LAST is not None or CHECKPOINT_THREAD_TTL_DAYS is not None:
+            checkpoint_compaction = mongodb_checkpointer.start_compaction(CHECKPOINT_COMPACTION_INTERVAL)
+        try:
+            yield
+        finally:
+            if checkpoint_compaction is not None:
+                checkpoint_compaction.cancel()
+            try:
+                await mongodb_checkpointer.aflush()
+            except Exception as e:
+                print(f"Failed to save conversation checkpoints: {e}")
+            await registry.aclose()
+
+chainlit.server.app.router.lifespan_context = lifespan
 
-    cl.user_session.set("graph", graph)
-    cl.user_session.set("state", state)
+@cl.on_chat_start
+async def on_chat_start():
+    # Each chat session is its own checkpointer thread. The id is made here rather than taken from
+    # Chainlit's session or thread id, which the browser sends and could point at another user's thread
+    user = cl.user_session.get("user")
+    thread_id = uuid.uuid4().hex
+    cl.user_session.set("thread_id", f"{user.identifier}:{thread_id}" if user else thread_id)
 
 @cl.on_message
 async def on_message(message: cl.Message):
+    config = {"configurable": {"thread_id": cl.user_session.get("thread_id")}}
     try:
-        graph: Runnable = cl.user_session.get("graph")
-        state = cl.user_session.get("state")
-
-        state["messages"] += [HumanMessage(content=message.content, name=sanitize_name("Human"))]
+        # Only the new message is sent: the earlier history is loaded from the thread's checkpoint
+        # and the messages reducer appends this one to it
+        turn = {"messages": [HumanMessage(content=message.content, name=sanitize_name("Human"))]}
 
         ui_message = cl.Message(content="")
         await ui_message.send()
-        config = {"configurable": {"thread_id": "20"}}
-
-        async for event in graph.astream_events(state, config, version="v1"):
-            if event["event"] == "on_chat_model_stream":
+        # Tokens reach the browser in coalesced frames rather than one websocket frame each
+        streamer = TokenStreamer(
+            ui_message.stream_token,
+            window_ms=STREAM_WINDOW_MS,
+            max_bytes=STREAM_MAX_BYTES,
+            max_buffer_bytes=STREAM_MAX_BUFFER_BYTES,
+        )
+
+        async for event in graph.astream_events(turn, config, version="v1"):
+            if event["event"] == "on_chat_model_stream" and SUMMARY_TAG not in event.get("tags", []):
                 content = event["data"]["chunk"].content or ""
-                await ui_message.stream_token(token=content)
+                await streamer.push(content)
             elif event["event"] == "on_tool_start":
+                # Text streamed so far is shown before the tool step
+                await streamer.flush()
                 tool_name = event.get("name", "Unknown Tool")
                 tool_input = event["data"].get("input", "No input provided")
                 async with cl.Step(name=f"Using Tool: {tool_name}", type="tool") as step:
                     step.input = tool_input
 
 
-        cl.user_session.set("state", state)
+        await streamer.flush()
         await ui_message.update()
     except Exception as e:
         print(f"An error occurred: {e}")
-        await cl.Message(content="I'm sorry, but an error occurred. Please try again.").send()
\ No newline at end of file
+        await cl.Message(content="I'm sorry, but an error occurred. Please try again.").send()
+    finally:
+        # Write-behind checkpoints of this turn are committed once the run is over
+        try:
+            await mongodb_checkpointer.aflush(config["configurable"]["thread_id"])
+        except Exception as e:
+            print(f"Failed to save conversation checkpoints: {e}")
\ No newline at end of file
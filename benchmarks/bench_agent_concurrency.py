@@ -0,0 +1,97 @@
+"""
+Load test for the chatbot node: p50/p95 turn latency with many concurrent sessions.
+
+"before" runs the synchronous agent_node, which LangGraph executes in the default thread
+pool, so turns queue for worker threads once sessions outnumber them. "after" is the graph
+from create_workflow, whose aagent_node awaits the model. The model is simulated with a
+fixed network latency so the numbers only reflect how the graph schedules LLM calls.
+
+Run from the project root:
+    python benchmarks/bench_agent_concurrency.py --sessions 50 --turns 4 --latency 0.5
+"""
+import argparse
+import asyncio
+import functools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import Runnable
+from langgraph.graph import END, StateGraph
+
+from graph import AgentState, agent_node, create_workflow
+
+
+class SimulatedModel(Runnable):
+    """Stands in for the chatbot agent: answers after `latency` seconds (+/- 20%) of waiting on I/O."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def _answer(self, state):
+        return AIMessage(content=f"Answer {len(state['messages'])}")
+
+    def invoke(self, state, config=None, **kwargs):
+        time.sleep(self.latency * random.uniform(0.8, 1.2))
+        return self._answer(state)
+
+    async def ainvoke(self, state, config=None, **kwargs):
+        await asyncio.sleep(self.latency * random.uniform(0.8, 1.2))
+        return self._answer(state)
+
+
+def blocking_workflow(agent):
+    """The graph as it was before aagent_node: a synchronous chatbot node."""
+    workflow = StateGraph(AgentState)
+    workflow.add_node("chatbot", functools.partial(agent_node, agent=agent, name="HR Chatbot"))
+    workflow.set_entry_point("chatbot")
+    workflow.add_edge("chatbot", END)
+    return workflow
+
+
+async def run_session(graph, turns, latencies):
+    messages = []
+    for turn in range(turns):
+        messages.append(HumanMessage(content=f"Question {turn}"))
+        start = time.perf_counter()
+        result = await graph.ainvoke({"messages": messages})
+        latencies.append(time.perf_counter() - start)
+        messages = list(result["messages"])
+
+
+async def measure(graph, sessions, turns):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(graph, turns, latencies) for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return p50, p95, len(latencies) / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated LLM latency in seconds")
+    args = parser.parse_args(argv)
+
+    agent = SimulatedModel(args.latency)
+    graphs = {
+        "before (sync node)": blocking_workflow(agent).compile(),
+        "after (async node)": create_workflow(agent, []).compile(),
+    }
+    print(f"{args.sessions} sessions x {args.turns} turns, simulated LLM latency {args.latency * 1e3:.0f} ms")
+    print(f"{'graph':<20} {'p50 ms':>10} {'p95 ms':>10} {'turns/s':>10}")
+    for name, graph in graphs.items():
+        p50, p95, throughput = asyncio.run(measure(graph, args.sessions, args.turns))
+        print(f"{name:<20} {p50 * 1e3:>10.0f} {p95 * 1e3:>10.0f} {throughput:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Recall and latency of employee retrieval: vector only (before) vs hybrid with rank fusion (after),
+and the same two with the in-process local vector index instead of $vectorSearch.
+
+Queries are exact terms taken from the employees collection: employee IDs, surnames and skill
+names, each with the employees it should find (that ID, that surname, everyone with the skill).
+Recall@n is the share of those found in the top n, out of at most n. Latency covers the database
+round trips only; every query is embedded once up front.
+
+Needs an ingested Atlas database with its search indexes (`python data/ingestion.py --search-index`).
+The $rankFusion row needs MongoDB 8.1+ and is reported as unavailable otherwise. The local index is
+built (or reopened from LOCAL_VECTOR_INDEX_PATH) before timing starts.
+
+Run from the project root:
+    python benchmarks/bench_hybrid_search.py --queries 60 --n 10 --repeat 3
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo.errors import OperationFailure
+
+from config import COLLECTION_NAME
+from db_utils import db
+from tools.mongodb_tools import embedding_model, get_local_employee_index, search_employees
+
+MODES = [
+    ("vector only (before)", "vector", "server", "atlas"),
+    ("hybrid, client RRF", "hybrid", "client", "atlas"),
+    ("hybrid, $rankFusion", "hybrid", "server", "atlas"),
+    ("local vector only", "vector", "server", "local"),
+    ("local hybrid, RRF", "hybrid", "client", "local"),
+]
+
+
+def build_queries(employees, count, rng):
+    """(kind, query, ids of the employees it should find) for exact-term lookups."""
+    by_surname, by_skill = defaultdict(set), defaultdict(set)
+    for employee in employees:
+        by_surname[employee["last_name"]].add(employee["employee_id"])
+        for skill in employee.get("skills") or []:
+            by_skill[skill].add(employee["employee_id"])
+
+    queries = []
+    for employee in rng.sample(employees, min(count, len(employees))):
+        kind = rng.choice(["id", "surname", "skill"] if employee.get("skills") else ["id", "surname"])
+        if kind == "id":
+            queries.append((kind, employee["employee_id"], {employee["employee_id"]}))
+        elif kind == "surname":
+            queries.append((kind, employee["last_name"], by_surname[employee["last_name"]]))
+        else:
+            skill = rng.choice(employee["skills"])
+            queries.append((kind, skill, by_skill[skill]))
+    return queries
+
+
+def recall(results, relevant, n):
+    found = {result.get("employee_id") for result in results[:n]}
+    return len(found & relevant) / min(n, len(relevant))
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=60)
+    parser.add_argument("--n", type=int, default=10, help="Results per query (recall@n)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per query and mode")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    employees = list(db[COLLECTION_NAME].find({}, {"_id": 0, "employee_id": 1, "last_name": 1, "skills": 1}))
+    queries = build_queries(employees, args.queries, random.Random(args.seed))
+    vectors = embedding_model.embed_documents([query for _, query, _ in queries])
+    print(f"{len(queries)} queries over {len(employees)} employees, n={args.n}, {args.repeat} runs each")
+
+    get_local_employee_index().refresh(force=True)
+
+    print(f"{'mode':<22} {'recall@n':>9} {'id':>6} {'surname':>8} {'skill':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, mode, fusion, vector_index in MODES:
+        latencies, recalls = [], defaultdict(list)
+        try:
+            for (kind, query, relevant), vector in zip(queries, vectors):
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    results = search_employees(query, vector, args.n, mode=mode, fusion=fusion, vector_index=vector_index)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                recalls[kind].append(recall(results, relevant, args.n))
+        except OperationFailure as e:
+            print(f"{name:<22} unavailable: {e.details.get('errmsg', e) if e.details else e}")
+            continue
+        overall = statistics.mean(value for values in recalls.values() for value in values)
+        by_kind = [statistics.mean(recalls[kind]) if recalls[kind] else float("nan") for kind in ("id", "surname", "skill")]
+        print(
+            f"{name:<22} {overall:>9.2f} {by_kind[0]:>6.2f} {by_kind[1]:>8.2f} {by_kind[2]:>6.2f} "
+            f"{percentile(latencies, 0.5):>8.1f} {percentile(latencies, 0.95):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Quantized employee embeddings (after) vs float arrays (before): storage, vector index memory,
+BSON decode time, query latency and recall@k.
+
+Formats:
+    float   embedding as a BSON array of doubles, searched directly
+    int8    packed float32 embedding plus an int8 copy; the copy is searched for
+            k * QUANTIZED_RESCORE_FACTOR["int8"] candidates, rescored with the float32 vectors
+    binary  the same with a one-bit-per-dimension copy
+
+Each format is loaded into its own scratch collection with its own vector index and queried with
+$vectorSearch, the way lookup_employees does. Recall@k is measured against exact float search over
+the same vectors, before ("1st stage") and after rescoring. Storage per document comes from
+collStats. Vector index memory is an estimate from the indexed vector size, since Atlas holds
+float vectors as float32 (HNSW graph overhead not included).
+
+With --offline no cluster is needed. The first stage is then an exhaustive search over the
+quantized vectors in numpy, so recall reflects quantization alone, storage is the documents' BSON
+size, and latency covers only the app's side: decoding the candidates and rescoring them.
+
+The vectors are synthetic and clustered like sentence embeddings, sized to OPEN_AI_EMBEDDING_MODEL_DIMENSION.
+The demo data has too few employees for recall to mean much.
+
+Run from the project root:
+    python benchmarks/bench_quantization.py --offline --employees 20000
+    python benchmarks/bench_quantization.py --employees 20000 --queries 100 --k 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+
+from config import (
+    OPEN_AI_EMBEDDING_MODEL_DIMENSION,
+    QUANTIZED_RESCORE_FACTOR,
+    VECTOR_SEARCH_CANDIDATE_FACTOR,
+    VECTOR_SEARCH_MIN_CANDIDATES,
+)
+from mongodb.quantization import (
+    QUANTIZED_FIELDS,
+    QUANTIZED_SIMILARITY,
+    add_quantized_embedding,
+    quantize_binary,
+    quantize_int8,
+    quantized_vector,
+    rescore,
+)
+from mongodb.vector_search import (
+    employee_vector_index_definition,
+    ensure_search_index,
+    num_candidates,
+    vector_search_pipeline,
+)
+
+FORMATS = ["float", "int8", "binary"]
+# Bytes per dimension of the vectors held by the vector index
+INDEXED_BYTES = {"float": 4, "int8": 1, "binary": 1 / 8}
+INDEX_NAME = "bench_vectors"
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int32)
+
+
+def make_vectors(count, dimensions, rng, spread, clusters=200):
+    """Unit vectors scattered around random topics; a larger `spread` makes neighbours harder to tell apart."""
+    centers = np.random.default_rng(0).normal(size=(clusters, dimensions))
+    vectors = centers[rng.integers(clusters, size=count)] + rng.normal(scale=spread, size=(count, dimensions))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def make_document(i, vector, fmt):
+    document = {"employee_id": f"E{i:07d}", "embedding": vector.tolist()}
+    return add_quantized_embedding(document, fmt) if fmt != "float" else document
+
+
+def search_limit(fmt, k):
+    return k if fmt == "float" else k * QUANTIZED_RESCORE_FACTOR[fmt]
+
+
+def exact_top(matrix, queries, k):
+    scores = queries @ matrix.T
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+
+def recall(found, relevant):
+    return len(set(found) & relevant) / len(relevant)
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def decode_ms(documents):
+    """Time to decode 1,000 stored documents from BSON and read their embeddings."""
+    encoded = [bson.encode(document) for document in documents[:1000]]
+    start = time.perf_counter()
+    for raw in encoded:
+        bson.decode(raw)["embedding"]
+    return (time.perf_counter() - start) * 1000 * 1000 / len(encoded)
+
+
+def offline_indexes(matrix):
+    """The vectors each format's index would hold, for the exhaustive first stage."""
+    int8 = quantize_int8(matrix).astype(np.float32)
+    return {"float": matrix, "int8": (int8, np.linalg.norm(int8, axis=1)), "binary": quantize_binary(matrix)}
+
+
+def offline_first_stage(fmt, indexed, query, limit):
+    """Exhaustive search over the format's indexed vectors: row numbers of the `limit` best."""
+    if fmt == "float":
+        scores = indexed @ query
+    elif fmt == "int8":
+        vectors, norms = indexed
+        scores = vectors @ quantize_int8(query).astype(np.float32) / norms
+    else:
+        # Hamming distance between the sign bits
+        scores = -POPCOUNT[np.bitwise_xor(indexed, quantize_binary(query))].sum(axis=1)
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def run_offline(fmt, indexed, documents, queries, truth, k):
+    encoded = [bson.encode({"employee_id": d["employee_id"], "embedding": d["embedding"]}) for d in documents]
+    first, final, latencies = [], [], []
+    for query, relevant in zip(queries, truth):
+        rows = offline_first_stage(fmt, indexed, query, search_limit(fmt, k))
+        first.append(recall(rows[:k], relevant))
+        if fmt == "float":
+            final.append(first[-1])
+            latencies.append(0.0)
+            continue
+        start = time.perf_counter()
+        candidates = [bson.decode(encoded[row]) for row in rows]
+        ranked = rescore(query, candidates, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        final.append(recall([int(d["employee_id"][1:]) for d in ranked], relevant))
+    return first, final, latencies
+
+
+def load_collection(db, fmt, documents, dimensions, timeout):
+    collection = db[f"bench_quantization_{fmt}"]
+    collection.drop()
+    for start in range(0, len(documents), 1000):
+        collection.insert_many([dict(document) for document in documents[start:start + 1000]])
+    path = "embedding" if fmt == "float" else QUANTIZED_FIELDS[fmt]
+    similarity = "cosine" if fmt == "float" else QUANTIZED_SIMILARITY[fmt]
+    ensure_search_index(collection, INDEX_NAME, employee_vector_index_definition(path, dimensions, similarity))
+    deadline = time.monotonic() + timeout
+    while not all(index.get("queryable") for index in collection.list_search_indexes(INDEX_NAME)):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{INDEX_NAME} on {collection.name} not queryable after {timeout}s")
+        time.sleep(5)
+    return collection
+
+
+def run_live(collection, fmt, queries, truth, k):
+    path = "embedding" if fmt == "float" else QUANTIZED_FIELDS[fmt]
+    limit = search_limit(fmt, k)
+    candidates = num_candidates(limit, VECTOR_SEARCH_CANDIDATE_FACTOR, VECTOR_SEARCH_MIN_CANDIDATES)
+    projection = {"_id": 0, "employee_id": 1, "score": 1, **({"embedding": 1} if fmt != "float" else {})}
+    first, final, latencies = [], [], []
+    for query, relevant in zip(queries, truth):
+        search_vector = query.tolist() if fmt == "float" else quantized_vector(query, fmt)
+        pipeline = vector_search_pipeline(INDEX_NAME, path, search_vector, limit, candidates, projection=projection)
+        start = time.perf_counter()
+        results = list(collection.aggregate(pipeline))
+        ranked = results if fmt == "float" else rescore(query, results, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        first.append(recall([int(d["employee_id"][1:]) for d in results[:k]], relevant))
+        final.append(recall([int(d["employee_id"][1:]) for d in ranked], relevant))
+    return first, final, latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--employees", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--spread", type=float, default=1.0, help="Noise around each topic, relative to the topics")
+    parser.add_argument("--offline", action="store_true", help="Simulate the first stage in numpy; no cluster")
+    parser.add_argument("--index-timeout", type=int, default=600, help="Seconds to wait for each vector index")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch collections")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    dimensions = OPEN_AI_EMBEDDING_MODEL_DIMENSION
+    matrix = make_vectors(args.employees, dimensions, rng, args.spread)
+    queries = make_vectors(args.queries, dimensions, rng, args.spread)
+    truth = exact_top(matrix, queries, args.k)
+    indexes = offline_indexes(matrix) if args.offline else None
+    if not args.offline:
+        from db_utils import db
+    where = "numpy, exhaustive first stage" if args.offline else "$vectorSearch"
+    print(f"{args.employees} employees x {dimensions} dims, {args.queries} queries, k={args.k} ({where})")
+    print(f"{'format':<8} {'doc bytes':>10} {'index MB':>9} {'decode ms/1k':>13} {'recall@k 1st':>13} "
+          f"{'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for fmt in FORMATS:
+        documents = [make_document(i, vector, fmt) for i, vector in enumerate(matrix)]
+        index_mb = args.employees * dimensions * INDEXED_BYTES[fmt] / 2 ** 20
+        if args.offline:
+            doc_bytes = statistics.mean(len(bson.encode(document)) for document in documents)
+            first, final, latencies = run_offline(fmt, indexes[fmt], documents, queries, truth, args.k)
+        else:
+            collection = load_collection(db, fmt, documents, dimensions, args.index_timeout)
+            doc_bytes = db.command("collStats", collection.name)["avgObjSize"]
+            first, final, latencies = run_live(collection, fmt, queries, truth, args.k)
+            if not args.keep:
+                collection.drop()
+        print(
+            f"{fmt:<8} {doc_bytes:>10.0f} {index_mb:>9.1f} {decode_ms(documents):>13.1f} "
+            f"{statistics.mean(first):>13.3f} {statistics.mean(final):>9.3f} "
+            f"{percentile(latencies, 0.5):>8.2f} {percentile(latencies, 0.95):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Frames and CPU per streamed response: one frame per token (before) vs TokenStreamer (after).
+
+Each session streams a response token by token, like on_chat_model_stream events, to a fake
+websocket that JSON-encodes every frame (as Socket.IO does) and takes `--client-ms` to accept it.
+CPU is process time for all sessions divided by the number of responses.
+
+Run from the project root:
+    python benchmarks/bench_token_streaming.py --sessions 50 --tokens 400
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import STREAM_MAX_BUFFER_BYTES, STREAM_MAX_BYTES, STREAM_WINDOW_MS
+from streaming import TokenStreamer
+
+WORDS = "John Doe is a software engineer in the Paris office who knows Kubernetes , SQL and Python .".split()
+
+
+class FakeSocket:
+    def __init__(self, client_ms):
+        self.client_ms = client_ms
+        self.frames = 0
+
+    async def emit(self, token):
+        payload = json.dumps({"event": "stream_token", "data": {"id": "msg", "token": token, "isSequence": False}})
+        self.frames += 1
+        await asyncio.sleep(self.client_ms / 1000 if self.client_ms else 0)
+        return payload
+
+
+async def stream_response(tokens, token_ms, coalesce, client_ms):
+    socket = FakeSocket(client_ms)
+    streamer = TokenStreamer(
+        socket.emit, window_ms=STREAM_WINDOW_MS, max_bytes=STREAM_MAX_BYTES, max_buffer_bytes=STREAM_MAX_BUFFER_BYTES
+    )
+    start = time.perf_counter()
+    for i in range(tokens):
+        token = " " + random.choice(WORDS)
+        if coalesce:
+            await streamer.push(token)
+        else:
+            await socket.emit(token)
+        await asyncio.sleep(token_ms / 1000)
+    if coalesce:
+        await streamer.flush()
+    return socket.frames, time.perf_counter() - start
+
+
+async def measure(sessions, tokens, token_ms, coalesce, client_ms):
+    cpu = time.process_time()
+    results = await asyncio.gather(
+        *(stream_response(tokens, token_ms, coalesce, client_ms) for _ in range(sessions))
+    )
+    cpu = time.process_time() - cpu
+    frames = sum(r[0] for r in results) / sessions
+    wall = max(r[1] for r in results)
+    return frames, cpu / sessions, wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--token-ms", type=float, default=2, help="Delay between LLM tokens")
+    args = parser.parse_args(argv)
+
+    print(f"{args.sessions} sessions x {args.tokens} tokens, one token every {args.token_ms} ms")
+    print(f"{'client':<12} {'streaming':<20} {'frames/resp':>12} {'CPU ms/resp':>12} {'wall s':>8}")
+    for client, client_ms in (("fast", 0), ("slow (5 ms)", 5)):
+        for name, coalesce in (("per token (before)", False), ("coalesced (after)", True)):
+            frames, cpu, wall = asyncio.run(measure(args.sessions, args.tokens, args.token_ms, coalesce, client_ms))
+            print(f"{client:<12} {name:<20} {frames:>12.1f} {cpu * 1e3:>12.2f} {wall:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
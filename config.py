@@ -8,4 +8,88 @@ DATABASE_NAME = 'demo_company_employees'
 COLLECTION_NAME = "employees"
 COMPANY_COLLECTION_NAME = 'companies'
 WORKFORCE_COLLECTION_NAME = 'workforce'
-ATLAS_VECTOR_SEARCH_INDEX = 'vector_index'
\ No newline at end of file
+ATLAS_VECTOR_SEARCH_INDEX = 'vector_index'
+# $vectorSearch numCandidates for lookup_employees: k * factor, at least the minimum (capped at 10,000).
+# Higher values trade latency for recall
+VECTOR_SEARCH_CANDIDATE_FACTOR = 10
+VECTOR_SEARCH_MIN_CANDIDATES = 100
+# lookup_employees retrieval: "vector", or "hybrid" to also run a full-text query on
+# EMPLOYEE_TEXT_SEARCH_INDEX and merge both rankings by reciprocal rank fusion, either in one
+# aggregation ("server", $rankFusion, MongoDB 8.1+) or from two concurrent queries ("client")
+EMPLOYEE_SEARCH_MODE = os.environ.get('EMPLOYEE_SEARCH_MODE', 'vector')
+HYBRID_FUSION = os.environ.get('HYBRID_FUSION', 'server')
+HYBRID_WEIGHTS = {"vector": 1.0, "text": 1.0}
+EMPLOYEE_TEXT_SEARCH_INDEX = 'employee_text'
+# Where the vector side of lookup_employees runs: "atlas" ($vectorSearch) or "local", an in-process
+# float32 index memory-mapped from LOCAL_VECTOR_INDEX_PATH (see mongodb/local_index.py) that is rebuilt
+# when ingestion bumps the employees version, checked at most every LOCAL_VECTOR_INDEX_REFRESH_S seconds
+EMPLOYEE_VECTOR_INDEX = os.environ.get('EMPLOYEE_VECTOR_INDEX', 'atlas')
+LOCAL_VECTOR_INDEX_PATH = os.environ.get('LOCAL_VECTOR_INDEX_PATH', '.cache/employee_vectors')
+LOCAL_VECTOR_INDEX_REFRESH_S = 30
+# Employee embeddings stored as packed BSON vectors by `data/ingestion.py --quantization`: "int8" or
+# "binary" (one bit per dimension), "" for float arrays. lookup_employees then searches the quantized
+# copies for k * QUANTIZED_RESCORE_FACTOR candidates and ranks them by their full-precision embedding
+EMBEDDING_QUANTIZATION = os.environ.get('EMBEDDING_QUANTIZATION', '')
+QUANTIZED_RESCORE_FACTOR = {"int8": 2, "binary": 8}
+
+# Batched embedding pipeline used by data/ingestion.py
+EMBEDDING_BATCH_SIZE = 256
+EMBEDDING_CONCURRENCY = 4
+EMBEDDING_MAX_RETRIES = 6
+
+# Records compared and upserted per bulk_write by `data/ingestion.py --sync`
+SYNC_CHUNK_SIZE = 1000
+
+# Bytes read per block by `data/ingestion.py --stream`
+STREAM_READ_SIZE = 1024 * 1024
+
+# Embedding cache shared by ingestion and query-time lookups.
+# Backend is "file" (local SQLite), "mongodb" (capped collection) or "memory" (LRU only); set it empty to disable.
+EMBEDDING_CACHE_BACKEND = os.environ.get('EMBEDDING_CACHE_BACKEND', 'file') or None
+EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH', '.cache/embeddings.sqlite3')
+EMBEDDING_CACHE_COLLECTION_NAME = 'embedding_cache'
+EMBEDDING_CACHE_MAX_BYTES = 256 * 1024 * 1024
+EMBEDDING_CACHE_MEMORY_ENTRIES = 10000
+
+# Checkpoint storage: store channel deltas between periodic full snapshots
+CHECKPOINT_COLLECTION_NAME = 'checkpoints_collection'
+CHECKPOINT_DELTA = True
+CHECKPOINT_SNAPSHOT_INTERVAL = 20
+# "json" or "compressed" (JSON compressed with zstd or zlib, see mongodb/serde.py)
+CHECKPOINT_SERIALIZER = 'json'
+# Retention (None keeps everything): checkpoints kept per thread, days before an idle thread is dropped,
+# seconds between compactions
+CHECKPOINT_KEEP_LAST = None
+CHECKPOINT_THREAD_TTL_DAYS = None
+CHECKPOINT_COMPACTION_INTERVAL = 3600
+# Write-behind durability: None writes every checkpoint immediately, "run" flushes at the end of each
+# chat turn, "interval" flushes every CHECKPOINT_FLUSH_INTERVAL_MS milliseconds. Buffered checkpoints
+# are lost if the process dies before they are flushed
+CHECKPOINT_WRITE_BEHIND = os.environ.get('CHECKPOINT_WRITE_BEHIND') or None
+CHECKPOINT_FLUSH_INTERVAL_MS = 100
+# Latest checkpoint per thread kept deserialized in memory. Use "version" validation when several
+# app processes can write the same thread, None when each thread lives in a single process
+CHECKPOINT_CACHE_SIZE = 1024
+CHECKPOINT_CACHE_VALIDATION = os.environ.get('CHECKPOINT_CACHE_VALIDATION') or None
+
+# Server-side time limit (maxTimeMS) for the MongoDB tools' queries; tools accept a per-call override
+TOOL_MAX_TIME_MS = 5000
+# Size bound for one tool result (see tools/formatting.py): records are rendered one compact line
+# each, and results past the budget are left for the next page with a continuation hint
+TOOL_RESULT_TOKEN_BUDGET = 1500
+TOOL_PAGE_SIZE = 20
+# Atlas Search index for fuzzy name matching (see mongodb/name_search.py). When set, name lookups that
+# find nothing by prefix are retried with up to one typo; leave it unset on deployments without Atlas Search
+NAME_SEARCH_INDEX = os.environ.get('NAME_SEARCH_INDEX') or None
+
+# Prompt size bound enforced before each LLM call (see context_window.py): older turns are folded
+# into a rolling summary once the prompt would exceed the budget, earlier tool outputs are trimmed
+CONTEXT_TOKEN_BUDGET = 12000
+CONTEXT_TOOL_RESULT_TOKENS = 300
+CONTEXT_SUMMARY_WORDS = 250
+
+# Chat UI streaming: tokens are coalesced into one frame per STREAM_WINDOW_MS or STREAM_MAX_BYTES,
+# and the LLM stream waits for slow clients once STREAM_MAX_BUFFER_BYTES are pending
+STREAM_WINDOW_MS = 50
+STREAM_MAX_BYTES = 1024
+STREAM_MAX_BUFFER_BYTES = 16384
@@ -0,0 +1,188 @@
+import json
+from typing import Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+# Tags the summarizer's runs, so streaming UIs can leave its tokens out of the answer
+SUMMARY_TAG = "context_summary"
+
+SUMMARY_PROMPT = (
+    "You maintain the running summary of a conversation between a user and an HR chatbot."
+    " Update the summary with the new messages below. Keep names, employee ids, companies, dates"
+    " and any open requests; drop small talk. Answer with the updated summary only, in at most"
+    " {max_words} words."
+)
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """Cheap token estimate (about 4 characters per token), close enough to enforce a budget."""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tokens = len(content) // 4 + 4
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += len(json.dumps(tool_call.get("args", {}))) // 4 + 8
+    return tokens
+
+
+def _turn_starts(messages: Sequence[BaseMessage]) -> List[int]:
+    # A turn starts at a human message, so cutting there never splits a tool call from its results
+    return [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+
+
+def _render(messages: Sequence[BaseMessage], max_chars: int = 2000) -> str:
+    lines = []
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        if isinstance(message, ToolMessage):
+            lines.append(f"Tool {message.name} returned: {content[:max_chars]}")
+        elif isinstance(message, AIMessage) and message.tool_calls and not content:
+            calls = ", ".join(f"{call['name']}({json.dumps(call['args'])})" for call in message.tool_calls)
+            lines.append(f"Assistant called {calls}")
+        else:
+            role = "User" if isinstance(message, HumanMessage) else "Assistant"
+            lines.append(f"{role}: {content[:max_chars]}")
+    return "\n".join(lines)
+
+
+class ContextWindowManager:
+    """
+    Keeps the messages sent to the LLM under `token_budget` tokens.
+
+    The graph state keeps the full history (the messages reducer only appends); this manager
+    decides what the model sees. Its `update` node runs before each LLM call and, once the prompt
+    would exceed the budget, folds the oldest turns into a rolling summary stored in the state
+    ("summary", with "summarized" counting the folded messages), so it is checkpointed with the
+    thread. `prompt_messages` then builds the prompt: the summary, the remaining turns, and tool
+    results of earlier turns cut to `tool_result_tokens`. Tool calls and their results are only
+    ever dropped together, since whole turns are folded.
+
+    Without a `summarizer` (a chat model), folded turns are dropped instead of summarized.
+    The numbers for each LLM call are stored in the state as "context_stats"; `stats()` sums them up.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 12000,
+        tool_result_tokens: int = 300,
+        summarizer=None,
+        summary_words: int = 250,
+        token_counter: Callable[[BaseMessage], int] = estimate_tokens,
+    ):
+        self.token_budget = token_budget
+        self.tool_result_tokens = tool_result_tokens
+        self.summarizer = summarizer
+        self.summary_words = summary_words
+        self.token_counter = token_counter
+        self.model_calls = 0
+        self.summaries = 0
+        self.history_tokens = 0
+        self.prompt_tokens = 0
+
+    def prompt_messages(self, state) -> List[BaseMessage]:
+        """The messages to send to the LLM for this state."""
+        return self._view(state.get("summary"), list(state["messages"])[state.get("summarized") or 0:])
+
+    def _view(self, summary: Optional[str], messages: List[BaseMessage]) -> List[BaseMessage]:
+        starts = _turn_starts(messages)
+        current_turn = starts[-1] if starts else 0
+        view = [self._trim(message) if i < current_turn else message for i, message in enumerate(messages)]
+        if summary:
+            view.insert(0, SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+        return view
+
+    def _trim(self, message: BaseMessage) -> BaseMessage:
+        if not isinstance(message, ToolMessage) or not isinstance(message.content, str):
+            return message
+        tokens = self.token_counter(message)
+        if tokens <= self.tool_result_tokens:
+            return message
+        # Same ToolMessage (name, tool_call_id), shorter content
+        keep = self.tool_result_tokens * 4
+        content = f"{message.content[:keep]}... [{tokens - self.tool_result_tokens} tokens of earlier tool output trimmed]"
+        return message.copy(update={"content": content})
+
+    def _count(self, messages: Sequence[BaseMessage]) -> int:
+        return sum(self.token_counter(message) for message in messages)
+
+    def _plan(self, state):
+        """Returns (messages to fold into the summary, new summarized count)."""
+        messages = list(state["messages"])
+        summarized = state.get("summarized") or 0
+        recent = messages[summarized:]
+        # Room for the summary the fold will produce
+        summary_tokens = self.summary_words * 2 if (self.summarizer or state.get("summary")) else 0
+        if self._count(self._view(state.get("summary"), recent)) <= self.token_budget:
+            return [], summarized
+
+        # Fold the fewest whole turns that bring the prompt under budget; the current turn always stays
+        starts = _turn_starts(recent)
+        cut = starts[-1] if starts else 0
+        for start in starts[1:]:
+            if self._count(self._view(None, recent[start:])) + summary_tokens <= self.token_budget:
+                cut = start
+                break
+        return recent[:cut], summarized + cut
+
+    def _summary_request(self, summary: Optional[str], folded: Sequence[BaseMessage]) -> List[BaseMessage]:
+        transcript = _render(folded)
+        if summary:
+            transcript = f"Current summary: {summary}\n\nNew messages:\n{transcript}"
+        return [
+            SystemMessage(content=SUMMARY_PROMPT.format(max_words=self.summary_words)),
+            HumanMessage(content=transcript),
+        ]
+
+    def _result(self, state, summary: Optional[str], summarized: int) -> Dict:
+        messages = list(state["messages"])
+        history_tokens = self._count(messages)
+        prompt_tokens = self._count(self._view(summary, messages[summarized:]))
+        stats = {
+            "history_tokens": history_tokens,
+            "prompt_tokens": prompt_tokens,
+            "tokens_saved": max(history_tokens - prompt_tokens, 0),
+            "summarized_messages": summarized,
+        }
+        self.model_calls += 1
+        self.history_tokens += history_tokens
+        self.prompt_tokens += prompt_tokens
+        update = {"context_stats": stats}
+        # Unchanged channels aren't written, so delta checkpoints don't store them again
+        if summarized != (state.get("summarized") or 0):
+            update["summary"] = summary
+            update["summarized"] = summarized
+        return update
+
+    def update(self, state) -> Dict:
+        folded, summarized = self._plan(state)
+        summary = state.get("summary")
+        if folded and self.summarizer is not None:
+            try:
+                request = self._summary_request(summary, folded)
+                summary = self.summarizer.invoke(request, {"tags": [SUMMARY_TAG]}).content
+                self.summaries += 1
+            except Exception as e:
+                # The turn goes on over budget rather than losing the folded turns
+                print(f"Failed to summarize the conversation: {e}")
+                summarized = state.get("summarized") or 0
+        return self._result(state, summary, summarized)
+
+    async def aupdate(self, state) -> Dict:
+        folded, summarized = self._plan(state)
+        summary = state.get("summary")
+        if folded and self.summarizer is not None:
+            try:
+                request = self._summary_request(summary, folded)
+                summary = (await self.summarizer.ainvoke(request, {"tags": [SUMMARY_TAG]})).content
+                self.summaries += 1
+            except Exception as e:
+                print(f"Failed to summarize the conversation: {e}")
+                summarized = state.get("summarized") or 0
+        return self._result(state, summary, summarized)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "model_calls": self.model_calls,
+            "summaries": self.summaries,
+            "history_tokens": self.history_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "tokens_saved": max(self.history_tokens - self.prompt_tokens, 0),
+        }
@@ -1,21 +1,67 @@
+import argparse
+import codecs
+import hashlib
 import json
 import os
 import sys
-from tqdm import tqdm
 
 # Ensure the mongodb directory is in the sys.path
 script_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(script_dir)
 sys.path.append(parent_dir)
 
-from mongodb.connect import get_mongo_client
-from utilities import get_embedding
+from pymongo import ReplaceOne
+from mongodb.connect import get_mongo_client, registry
+from mongodb.availability import AVAILABILITY_FIELD, add_availability, ensure_availability_index
+from mongodb.pagination import ensure_sort_indexes
+from mongodb.local_index import bump_version
+from mongodb.vector_search import (
+    FILTERS_FIELD,
+    add_employee_filters,
+    employee_vector_index_definition,
+    ensure_employee_filters,
+    ensure_search_index,
+)
+from mongodb.hybrid_search import employee_text_index_definition
+from mongodb.quantization import (
+    QUANTIZED_FIELDS,
+    QUANTIZED_SIMILARITY,
+    add_quantized_embedding,
+    ensure_quantized_embeddings,
+)
+from mongodb.name_search import NAME_FIELDS, add_name_fields, create_name_search_indexes, ensure_name_indexes
+from config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CONCURRENCY,
+    SYNC_CHUNK_SIZE,
+    STREAM_READ_SIZE,
+    NAME_SEARCH_INDEX,
+    ATLAS_VECTOR_SEARCH_INDEX,
+    EMPLOYEE_TEXT_SEARCH_INDEX,
+    OPEN_AI_EMBEDDING_MODEL_DIMENSION,
+    EMBEDDING_QUANTIZATION,
+)
+from embedding_cache import get_embedding_cache
+from embeddings import get_embeddings
 
 MONGO_URI = os.environ.get("MONGO_URI")
 DATABASE_NAME = 'demo_company_employees'
 company_collection_name = 'companies'
 workforce_collection_name = 'workforce'
 employee_collection_name= 'employees'
+progress_collection_name = 'ingestion_progress'
+
+# Natural key of each collection, used to upsert records in sync mode
+NATURAL_KEYS = {
+    company_collection_name: 'company_name',
+    workforce_collection_name: 'email',
+    employee_collection_name: 'employee_id',
+}
+
+# Fields added during ingestion rather than read from the JSON exports
+DERIVED_FIELDS = {'_id', 'content_hash', 'employee_string', 'embedding', AVAILABILITY_FIELD, FILTERS_FIELD} | {
+    normalized for fields in NAME_FIELDS.values() for normalized in fields.values()
+} | set(QUANTIZED_FIELDS.values())
 
 # Function to create a string representation of the employee's key attributes for embedding
 def create_employee_string(employee):
@@ -29,45 +75,327 @@ def create_employee_string(employee):
     return f"{basic_info}. Job: {job_details}. Skills: {skills}. Reviews: {performance_reviews}. Location: {work_location}. Notes: {notes}"
 
 
-# Read JSON data from files
-with open('data/companies.json', 'r') as f:
-    companies_data = json.load(f)
+def add_derived_fields(collection_name, record):
+    """Query fields computed from a record's source fields: normalized names, availability, vector search filters."""
+    record = add_availability(collection_name, add_name_fields(collection_name, record))
+    return add_employee_filters(collection_name, record)
+
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def embed_employees(employee_data, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY, client=None,
+                    quantization=None):
+    """
+    Embed employees in batches and attach `employee_string` and `embedding` to each record in place.
+    With a `quantization`, the embedding is packed as float32 next to its quantized copy.
+    """
+    employee_strings = [create_employee_string(employee) for employee in employee_data]
+    embeddings = get_embeddings(employee_strings, batch_size=batch_size, concurrency=concurrency,
+                                client=client, cache=get_embedding_cache())
+    for employee, employee_string, embedding in zip(employee_data, employee_strings, embeddings):
+        if embedding:
+            employee['employee_string'] = employee_string
+            employee['embedding'] = embedding
+            if quantization:
+                add_quantized_embedding(employee, quantization)
+    return employee_data
+
+
+class JsonArrayReader:
+    """
+    Iterates the elements of a top-level JSON array without loading the whole file.
+
+    The file is read in `read_size` blocks and each element is decoded as soon as it is complete.
+    `offset` is the byte offset just past the last element yielded; passing it back as `start`
+    resumes reading from the following element.
+    """
+
+    def __init__(self, path, start=0, read_size=STREAM_READ_SIZE):
+        self.path = path
+        self.offset = start
+        self.read_size = read_size
+
+    def __iter__(self):
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        # At offset 0 we expect the opening bracket, otherwise the separator after a committed element
+        state = "open" if self.offset == 0 else "separator"
+        buffer = ""
+        eof = False
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+
+            def fill():
+                nonlocal buffer, eof
+                block = f.read(self.read_size)
+                eof = not block
+                buffer += utf8.decode(block, final=eof)
+
+            def consume(count):
+                nonlocal buffer
+                self.offset += len(buffer[:count].encode("utf-8"))
+                buffer = buffer[count:]
+
+            while True:
+                stripped = len(buffer) - len(buffer.lstrip())
+                if stripped:
+                    consume(stripped)
+                if not buffer:
+                    if eof:
+                        raise ValueError(f"Unexpected end of JSON array in {self.path}")
+                    fill()
+                    continue
+
+                if state == "open":
+                    if buffer[0] != "[":
+                        raise ValueError(f"{self.path} does not contain a JSON array")
+                    consume(1)
+                    state = "first"
+                elif state in ("first", "separator") and buffer[0] == "]":
+                    return
+                elif state == "separator":
+                    if buffer[0] != ",":
+                        raise ValueError(f"Expected ',' or ']' at byte {self.offset} of {self.path}")
+                    consume(1)
+                    state = "value"
+                else:
+                    try:
+                        value, end = decoder.raw_decode(buffer)
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                        fill()
+                        continue
+                    if end == len(buffer) and not eof:
+                        # A bare number may continue in the next block
+                        fill()
+                        continue
+                    consume(end)
+                    state = "separator"
+                    yield value
+
+
+def content_hash(record):
+    """Stable hash of a record's source fields, used to detect changes between syncs."""
+    source = {key: value for key, value in record.items() if key not in DERIVED_FIELDS}
+    return hashlib.sha256(json.dumps(source, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def chunked(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def sync_collection(collection, records, key_field, prepare=None, chunk_size=SYNC_CHUNK_SIZE, on_commit=None):
+    """
+    Upserts records keyed on their natural key, skipping records whose content hash is unchanged.
+
+    `prepare` is called with the changed records of each chunk before they are written,
+    e.g. to embed them, and `on_commit` after each chunk has been written.
+    Returns counts of unchanged, inserted and updated records.
+    """
+    collection.create_index(key_field, unique=True)
+    stats = {"unchanged": 0, "inserted": 0, "updated": 0}
+
+    for chunk in chunked(records, chunk_size):
+        hashes = [content_hash(record) for record in chunk]
+        existing = {
+            doc[key_field]: doc.get('content_hash')
+            for doc in collection.find(
+                {key_field: {"$in": [record[key_field] for record in chunk]}},
+                {key_field: 1, 'content_hash': 1, '_id': 0},
+            )
+        }
+
+        changed = []
+        for record, record_hash in zip(chunk, hashes):
+            if existing.get(record[key_field]) == record_hash:
+                stats["unchanged"] += 1
+            else:
+                record['content_hash'] = record_hash
+                changed.append(record)
+
+        if changed:
+            if prepare:
+                prepare(changed)
+
+            requests = [
+                ReplaceOne({key_field: record[key_field]},
+                           {k: v for k, v in add_derived_fields(collection.name, record).items() if k != '_id'},
+                           upsert=True)
+                for record in changed
+            ]
+            result = collection.bulk_write(requests, ordered=False)
+            stats["inserted"] += result.upserted_count
+            stats["updated"] += result.modified_count
+
+        if on_commit:
+            on_commit(chunk)
+
+    return stats
+
+
+def stream_collection(db, path, collection_name, prepare=None, chunk_size=SYNC_CHUNK_SIZE, resume=False):
+    """
+    Streams a JSON export into a collection chunk by chunk, keeping memory flat regardless of file size.
+
+    After every committed chunk the byte offset reached in the file is saved to the
+    ingestion_progress collection. With `resume`, a previous run over the same file
+    continues from that offset; upserts make replaying a partially written chunk harmless.
+    """
+    progress = db[progress_collection_name]
+    stat = os.stat(path)
+    fingerprint = {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+    start = 0
+    saved = progress.find_one({"_id": collection_name}) if resume else None
+    if saved and all(saved.get(key) == value for key, value in fingerprint.items()):
+        start = saved["offset"]
+        print(f"Resuming {collection_name} from byte {start} of {path}")
+
+    reader = JsonArrayReader(path, start=start)
+
+    def on_commit(chunk):
+        progress.update_one({"_id": collection_name}, {"$set": {**fingerprint, "offset": reader.offset}}, upsert=True)
+
+    stats = sync_collection(db[collection_name], reader, NATURAL_KEYS[collection_name],
+                            prepare=prepare, chunk_size=chunk_size, on_commit=on_commit)
+    progress.delete_one({"_id": collection_name})
+    return stats
+
+
+def embed_changed_employees(employees, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY,
+                            quantization=None):
+    """sync_collection hook: embed changed employees, leaving failures unhashed so the next sync retries them."""
+    embed_employees(employees, batch_size=batch_size, concurrency=concurrency, quantization=quantization)
+    for employee in employees:
+        if 'embedding' not in employee:
+            employee.pop('content_hash', None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest the HR JSON data into MongoDB.")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE,
+                        help="Number of employees embedded per API request")
+    parser.add_argument("--concurrency", type=int, default=EMBEDDING_CONCURRENCY,
+                        help="Maximum number of embedding requests in flight")
+    parser.add_argument("--sync", action="store_true",
+                        help="Upsert on natural keys and only re-embed records that changed since the last run")
+    parser.add_argument("--chunk-size", type=int, default=SYNC_CHUNK_SIZE,
+                        help="Number of records compared and written per bulk_write in sync and stream modes")
+    parser.add_argument("--stream", action="store_true",
+                        help="Parse the JSON exports incrementally and embed and upsert them chunk by chunk")
+    parser.add_argument("--resume", action="store_true",
+                        help="With --stream, continue an interrupted run from its last committed chunk")
+    parser.add_argument("--search-index", action="store_true",
+                        help="Also create the Atlas Search indexes: fuzzy name lookups (NAME_SEARCH_INDEX) and the "
+                             "employees vector index with its filter fields (ATLAS_VECTOR_SEARCH_INDEX) and full-text "
+                             "index (EMPLOYEE_TEXT_SEARCH_INDEX)")
+    parser.add_argument("--quantization", choices=sorted(QUANTIZED_FIELDS), default=EMBEDDING_QUANTIZATION or None,
+                        help="Store employee embeddings as packed float32 plus an int8 or binary quantized copy, "
+                             "which the vector index searches (set EMBEDDING_QUANTIZATION to match)")
+    args = parser.parse_args(argv)
+
+    # Streaming reads the files chunk by chunk once connected
+    if not args.stream:
+        # Read JSON data from files
+        companies_data = load_json('data/companies.json')
+        workforce_data = load_json('data/workforce.json')
+        employee_data = load_json('data/employees.json')
+
+    if not args.sync and not args.stream:
+        # Generate Embeddings for employee data to utilise of vector search functionalities
+        print("Generating embeddings for employees...")
+        embed_employees(employee_data, batch_size=args.batch_size, concurrency=args.concurrency,
+                        quantization=args.quantization)
+
+    # Connect to MongoDB
+    mongo_client = get_mongo_client(mongo_uri=MONGO_URI)
+
+    if mongo_client:
+        # Pymongo client of database and collection
+        db = mongo_client.get_database(DATABASE_NAME)
+    else:
+        print("Failed to connect to MongoDB. Exiting...")
+        exit(1)
 
-with open('data/workforce.json', 'r') as f:
-    workforce_data = json.load(f)
+    # Insert data into MongoDB
+    company_collection = db[company_collection_name]
+    workforce_collection = db[workforce_collection_name]
+    employee_collection = db[employee_collection_name]
 
-with open('data/employees.json', 'r') as f:
-    employee_data = json.load(f)
+    def embed(employees):
+        embed_changed_employees(employees, batch_size=args.batch_size, concurrency=args.concurrency,
+                                quantization=args.quantization)
 
-# Generate Embeddings for employee data to utilise of vector search functionalities
-print("Generating embeddings for employees...")
-for employee in tqdm(employee_data):
-    employee_string = create_employee_string(employee)
-    embedding = get_embedding(employee_string)
-    if embedding:
-        employee['employee_string'] = employee_string
-        employee['embedding'] = embedding
+    if args.stream:
+        streams = [
+            ('data/companies.json', company_collection_name, None),
+            ('data/workforce.json', workforce_collection_name, None),
+            ('data/employees.json', employee_collection_name, embed),
+        ]
+        for path, collection_name, prepare in streams:
+            stats = stream_collection(db, path, collection_name, prepare=prepare,
+                                      chunk_size=args.chunk_size, resume=args.resume)
+            print(f"Streamed {collection_name}: {stats}")
+    elif args.sync:
+        syncs = [
+            (company_collection, companies_data, None),
+            (workforce_collection, workforce_data, None),
+            (employee_collection, employee_data, embed),
+        ]
+        for collection, records, prepare in syncs:
+            stats = sync_collection(collection, records, NATURAL_KEYS[collection.name],
+                                    prepare=prepare, chunk_size=args.chunk_size)
+            print(f"Synced {collection.name}: {stats}")
+    else:
+        company_collection.insert_many([add_derived_fields(company_collection_name, c) for c in companies_data])
+        workforce_collection.insert_many([add_derived_fields(workforce_collection_name, w) for w in workforce_data])
+        employee_collection.insert_many([add_derived_fields(employee_collection_name, e) for e in employee_data])
 
-# Connect to MongoDB
-mongo_client = get_mongo_client(mongo_uri=MONGO_URI)
+    # Indexed name and availability lookups for search_company / search_workforce (also backfills older
+    # documents), and the sort indexes list_companies pages on
+    ensure_name_indexes(db)
+    ensure_availability_index(db, workforce_collection_name)
+    ensure_sort_indexes(db)
+    ensure_employee_filters(employee_collection)
+    if args.quantization:
+        # Employees embedded by earlier runs, or quantized differently
+        ensure_quantized_embeddings(employee_collection, args.quantization)
+    # Local vector indexes (EMPLOYEE_VECTOR_INDEX = "local") rebuild on their next refresh
+    bump_version(db, employee_collection_name)
+    if args.search_index:
+        create_name_search_indexes(db, NAME_SEARCH_INDEX or 'name_search')
+        if args.quantization:
+            vector_definition = employee_vector_index_definition(
+                QUANTIZED_FIELDS[args.quantization], OPEN_AI_EMBEDDING_MODEL_DIMENSION,
+                QUANTIZED_SIMILARITY[args.quantization],
+            )
+        else:
+            vector_definition = employee_vector_index_definition('embedding', OPEN_AI_EMBEDDING_MODEL_DIMENSION)
+        ensure_search_index(employee_collection, ATLAS_VECTOR_SEARCH_INDEX, vector_definition, "vectorSearch")
+        text_definition = employee_text_index_definition()
+        ensure_search_index(employee_collection, EMPLOYEE_TEXT_SEARCH_INDEX, text_definition, "search")
 
-if mongo_client:
-    # Pymongo client of database and collection
-    db = mongo_client.get_database(DATABASE_NAME)
-else:
-    print("Failed to connect to MongoDB. Exiting...")
-    exit(1)
+    print("Data has been successfully ingested into MongoDB")
 
-# Insert data into MongoDB
-company_collection = db[company_collection_name]
-workforce_collection = db[workforce_collection_name]
-employee_collection = db[employee_collection_name]
+    cache = get_embedding_cache()
+    if cache is not None:
+        print(f"Embedding cache: {cache.stats()}")
 
-company_collection.insert_many(companies_data)
-workforce_collection.insert_many(workforce_data)
-employee_collection.insert_many(employee_data)
+    # Close the connections, including the embedding cache's when it lives in MongoDB
+    registry.close()
 
-print("Data has been successfully ingested into MongoDB")
 
-# Close the connection
-mongo_client.close()
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
-from mongodb.connect import get_mongo_client
+from mongodb.connect import get_mongo_client, registry
 from config import MONGO_URI, DATABASE_NAME, COMPANY_COLLECTION_NAME, WORKFORCE_COLLECTION_NAME
 
 mongo_client = get_mongo_client(MONGO_URI)
 db = mongo_client.get_database(DATABASE_NAME)
 companies_collection = db.get_collection(COMPANY_COLLECTION_NAME)
-workforce_collection = db.get_collection(WORKFORCE_COLLECTION_NAME)
\ No newline at end of file
+workforce_collection = db.get_collection(WORKFORCE_COLLECTION_NAME)
+
+# Shared by the async tools and the checkpointer; it connects on first use, on the server's event loop
+async_mongo_client = registry.get_async_client(MONGO_URI)
+async_db = async_mongo_client.get_database(DATABASE_NAME)
+async_companies_collection = async_db.get_collection(COMPANY_COLLECTION_NAME)
+async_workforce_collection = async_db.get_collection(WORKFORCE_COLLECTION_NAME)
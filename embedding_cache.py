@@ -0,0 +1,358 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+import config
+
+
+def cache_key(text: str, model: str = config.OPEN_AI_EMBEDDING_MODEL,
+              dimensions: int = config.OPEN_AI_EMBEDDING_MODEL_DIMENSION) -> str:
+    """Content address of an embedding: the model, its dimensions and a hash of the text."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{dimensions}:{digest}"
+
+
+# Reads only note which entries they used; the persistent stores write those last_used stamps in
+# batches, at the latest before the next eviction, so a cache hit doesn't cost a write
+TOUCH_BATCH_SIZE = 1000
+
+
+# Vectors are stored as float64, so a persistent hit returns exactly what the API (and the LRU) returned
+def _pack(vector: Sequence[float]) -> bytes:
+    return array("d", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vector = array("d")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class FileEmbeddingStore:
+    """Persistent tier backed by a local SQLite file, evicting least recently used rows above max_bytes."""
+
+    def __init__(self, path: str, max_bytes: int = config.EMBEDDING_CACHE_MAX_BYTES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        # key -> time of its latest read, not yet written
+        self._touched: Dict[str, float] = {}
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = list(keys[i:i + 500])
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update((key, _unpack(blob)) for key, blob in rows)
+            now = time.time()
+            self._touched.update((key, now) for key in found)
+            if len(self._touched) >= TOUCH_BATCH_SIZE:
+                self._write_touches()
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, Sequence[float]]) -> None:
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = _pack(vector)
+            rows.append((key, blob, len(blob), now))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._write_touches()
+            self._evict()
+            self._conn.commit()
+
+    def _write_touches(self) -> None:
+        touched, self._touched = self._touched, {}
+        self._conn.executemany("UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE key = ?",
+                               [(used, key) for key, used in touched.items()])
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_used"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", stale)
+
+    def close(self) -> None:
+        with self._lock:
+            self._write_touches()
+            self._conn.commit()
+            self._conn.close()
+
+
+class MongoEmbeddingStore:
+    """
+    Persistent tier backed by a MongoDB collection, evicting the least recently used entries (by an
+    indexed last_used stamp) above max_bytes of stored vectors.
+    """
+
+    def __init__(self, database, collection_name: str = config.EMBEDDING_CACHE_COLLECTION_NAME,
+                 max_bytes: int = config.EMBEDDING_CACHE_MAX_BYTES):
+        self.collection = database[collection_name]
+        self.max_bytes = max_bytes
+        self.collection.create_index("last_used")
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        # Entry count as of the last write; eviction only looks at the collection once it passes the bound
+        self._count = self.collection.estimated_document_count()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found = {doc["_id"]: _unpack(doc["vector"]) for doc in self.collection.find({"_id": {"$in": list(keys)}})}
+        now = time.time()
+        with self._lock:
+            self._touched.update((key, now) for key in found)
+            flush = len(self._touched) >= TOUCH_BATCH_SIZE
+        if flush:
+            self._write_touches()
+        return found
+
+    def put_many(self, items: Dict[str, Sequence[float]]) -> None:
+        from pymongo import ReplaceOne
+
+        now = time.time()
+        requests = [ReplaceOne({"_id": key}, {"_id": key, "vector": _pack(vector), "last_used": now}, upsert=True)
+                    for key, vector in items.items()]
+        if requests:
+            result = self.collection.bulk_write(requests, ordered=False)
+            self._write_touches()
+            self._count += result.upserted_count
+            self._evict(len(_pack(next(iter(items.values())))))
+
+    def _write_touches(self) -> None:
+        from pymongo import UpdateOne
+
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            self.collection.bulk_write(
+                [UpdateOne({"_id": key}, {"$max": {"last_used": used}}) for key, used in touched.items()], ordered=False
+            )
+
+    def _evict(self, entry_bytes: int) -> None:
+        # Every entry has the same dimensions, so the size bound is a bound on the number of entries
+        limit = self.max_bytes // max(entry_bytes, 1)
+        if self._count <= limit:
+            return
+        # Other processes write the same collection: check the real count before deleting
+        self._count = self.collection.estimated_document_count()
+        excess = self._count - limit
+        if excess > 0:
+            stale = [doc["_id"] for doc in self.collection.find({}, {"_id": 1}).sort("last_used", 1).limit(excess)]
+            self._count -= self.collection.delete_many({"_id": {"$in": stale}}).deleted_count
+
+    def close(self) -> None:
+        self._write_touches()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model, dimensions, text hash).
+
+    Lookups go to an in-process LRU first and then to the optional persistent store;
+    persistent hits are promoted into the LRU.
+    """
+
+    def __init__(self, store=None, max_entries: int = config.EMBEDDING_CACHE_MEMORY_ENTRIES,
+                 model: str = config.OPEN_AI_EMBEDDING_MODEL,
+                 dimensions: int = config.OPEN_AI_EMBEDDING_MODEL_DIMENSION):
+        self.store = store
+        self.max_entries = max_entries
+        self.model = model
+        self.dimensions = dimensions
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return cache_key(text, self.model, self.dimensions)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Returns the cached embedding for each text, or None where it is not cached."""
+        results, missing = self._get_from_memory(texts)
+        if missing and self.store is not None:
+            self._use_store_hits(results, missing, self._read_store(list(missing)))
+        self.misses += sum(len(positions) for positions in missing.values())
+        return results
+
+    async def aget_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """get_many for the event loop: the persistent store is read in a worker thread."""
+        results, missing = self._get_from_memory(texts)
+        if missing and self.store is not None:
+            self._use_store_hits(results, missing, await asyncio.to_thread(self._read_store, list(missing)))
+        self.misses += sum(len(positions) for positions in missing.values())
+        return results
+
+    def _get_from_memory(self, texts: Sequence[str]):
+        # Cached vectors in the LRU, and key -> positions of the texts it doesn't hold
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = self.key(text)
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+        return results, missing
+
+    def _read_store(self, keys: List[str]) -> Dict[str, List[float]]:
+        try:
+            return self.store.get_many(keys)
+        except Exception as e:
+            print(f"Error reading embedding cache: {e}")
+            return {}
+
+    def _use_store_hits(self, results, missing, found: Dict[str, List[float]]) -> None:
+        for key, vector in found.items():
+            for i in missing.pop(key):
+                results[i] = vector
+                self.store_hits += 1
+        self._remember(found)
+
+    def get(self, text: str) -> Optional[List[float]]:
+        return self.get_many([text])[0]
+
+    def put_many(self, texts: Iterable[str], vectors: Iterable[Optional[Sequence[float]]]) -> None:
+        items = {self.key(text): list(vector) for text, vector in zip(texts, vectors) if vector}
+        if not items:
+            return
+        self._remember(items)
+        if self.store is not None:
+            self._write_store(items)
+
+    async def aput_many(self, texts: Iterable[str], vectors: Iterable[Optional[Sequence[float]]]) -> None:
+        """put_many for the event loop: the persistent store is written in a worker thread."""
+        items = {self.key(text): list(vector) for text, vector in zip(texts, vectors) if vector}
+        if not items:
+            return
+        self._remember(items)
+        if self.store is not None:
+            await asyncio.to_thread(self._write_store, items)
+
+    def _write_store(self, items: Dict[str, List[float]]) -> None:
+        try:
+            self.store.put_many(items)
+        except Exception as e:
+            print(f"Error writing embedding cache: {e}")
+
+    def put(self, text: str, vector: Sequence[float]) -> None:
+        self.put_many([text], [vector])
+
+    def _remember(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            for key, vector in items.items():
+                self._lru[key] = vector
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "hits": self.memory_hits + self.store_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._lru),
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper that answers from an EmbeddingCache before calling the wrapped model."""
+
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache):
+        self.underlying = underlying
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.underlying.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+            self.cache.put_many([texts[i] for i in missing], computed)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(text)
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self.cache.put(text, vector)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = await self.cache.aget_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = await self.underlying.aembed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+            await self.cache.aput_many([texts[i] for i in missing], computed)
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = (await self.cache.aget_many([text]))[0]
+        if vector is None:
+            vector = await self.underlying.aembed_query(text)
+            await self.cache.aput_many([text], [vector])
+        return vector
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Returns the process-wide embedding cache configured in config.py, or None if caching is disabled."""
+    global _default_cache
+    if config.EMBEDDING_CACHE_BACKEND is None:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            if config.EMBEDDING_CACHE_BACKEND == "mongodb":
+                from mongodb.connect import get_mongo_client
+
+                client = get_mongo_client(config.MONGO_URI)
+                store = MongoEmbeddingStore(client[config.DATABASE_NAME]) if client else None
+            elif config.EMBEDDING_CACHE_BACKEND == "file":
+                store = FileEmbeddingStore(config.EMBEDDING_CACHE_PATH)
+            else:
+                store = None
+            _default_cache = EmbeddingCache(store=store)
+        return _default_cache
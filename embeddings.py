@@ -0,0 +1,135 @@
+import asyncio
+import random
+import time
+from typing import List, Optional, Sequence
+
+import openai
+from tqdm import tqdm
+
+import config
+
+
+class ThroughputMeter:
+    """Tracks records/s and tokens/s for a batched embedding run."""
+
+    def __init__(self, total: int, progress: bool = True):
+        self.records = 0
+        self.tokens = 0
+        self.started = time.perf_counter()
+        self.bar = tqdm(total=total, unit="rec", disable=not progress)
+
+    def update(self, records: int, tokens: int) -> None:
+        self.records += records
+        self.tokens += tokens
+        self.bar.update(records)
+        self.bar.set_postfix_str(self.summary(), refresh=False)
+
+    def elapsed(self) -> float:
+        return max(time.perf_counter() - self.started, 1e-9)
+
+    def summary(self) -> str:
+        elapsed = self.elapsed()
+        return f"{self.records / elapsed:.1f} records/s, {self.tokens / elapsed:.1f} tokens/s"
+
+    def close(self) -> None:
+        self.bar.close()
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Honour the server's retry-after hint, otherwise back off exponentially with jitter."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after-ms")
+        if retry_after:
+            return float(retry_after) / 1000
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return min(2 ** attempt, 60) * (0.5 + random.random() / 2)
+
+
+async def _embed_batch(client, texts: List[str], max_retries: int):
+    """Embed one batch, retrying on rate limits and transient API errors."""
+    attempt = 0
+    while True:
+        try:
+            response = await client.embeddings.create(
+                input=texts,
+                model=config.OPEN_AI_EMBEDDING_MODEL,
+                dimensions=config.OPEN_AI_EMBEDDING_MODEL_DIMENSION,
+            )
+        except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+            if attempt >= max_retries:
+                raise
+            await asyncio.sleep(_retry_delay(e, attempt))
+            attempt += 1
+            continue
+
+        # The API returns one item per input, tagged with the input's index
+        embeddings = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        tokens = response.usage.total_tokens if response.usage else 0
+        return embeddings, tokens
+
+
+async def aget_embeddings(
+    texts: Sequence[str],
+    *,
+    batch_size: int = config.EMBEDDING_BATCH_SIZE,
+    concurrency: int = config.EMBEDDING_CONCURRENCY,
+    max_retries: int = config.EMBEDDING_MAX_RETRIES,
+    client=None,
+    cache=None,
+    progress: bool = True,
+) -> List[Optional[List[float]]]:
+    """
+    Embeds many texts by sending them in batches, with at most `concurrency` requests in flight.
+
+    Returns one embedding per input text, in input order. Invalid inputs (empty or non-string)
+    and batches that keep failing after `max_retries` map to None, like get_embedding.
+    When an EmbeddingCache is given, cached texts are answered from it and only misses are sent.
+    """
+    client = client or openai.AsyncOpenAI(max_retries=0)
+    results: List[Optional[List[float]]] = [None] * len(texts)
+
+    # Only valid texts are sent; remember where each one came from
+    positions = [i for i, text in enumerate(texts) if text and isinstance(text, str)]
+    if cache is not None and positions:
+        cached = cache.get_many([texts[i] for i in positions])
+        for i, embedding in zip(positions, cached):
+            results[i] = embedding
+        positions = [i for i in positions if results[i] is None]
+    batches = [positions[i:i + batch_size] for i in range(0, len(positions), batch_size)]
+
+    semaphore = asyncio.Semaphore(concurrency)
+    meter = ThroughputMeter(total=len(positions), progress=progress)
+
+    async def run(batch: List[int]) -> None:
+        async with semaphore:
+            try:
+                embeddings, tokens = await _embed_batch(client, [texts[i] for i in batch], max_retries)
+            except Exception as e:
+                print(f"Error in aget_embeddings: {e}")
+                meter.update(len(batch), 0)
+                return
+        for i, embedding in zip(batch, embeddings):
+            results[i] = embedding
+        if cache is not None:
+            cache.put_many([texts[i] for i in batch], embeddings)
+        meter.update(len(batch), tokens)
+
+    try:
+        await asyncio.gather(*(run(batch) for batch in batches))
+    finally:
+        meter.close()
+
+    if progress:
+        print(f"Embedded {meter.records} records in {meter.elapsed():.1f}s ({meter.summary()})")
+    return results
+
+
+def get_embeddings(texts: Sequence[str], **kwargs) -> List[Optional[List[float]]]:
+    """Synchronous wrapper around aget_embeddings for scripts."""
+    return asyncio.run(aget_embeddings(texts, **kwargs))
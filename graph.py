@@ -1,10 +1,11 @@
 from langgraph.prebuilt import ToolNode
 from langgraph.prebuilt import tools_condition
 from langgraph.graph import END, StateGraph
+from langgraph.utils import RunnableCallable
 from utilities import sanitize_name
 from langchain_core.messages import AIMessage, ToolMessage
 from langchain_core.messages import BaseMessage
-from typing import Annotated, Sequence, TypedDict
+from typing import Annotated, Optional, Sequence, TypedDict
 import functools
 import operator
 
@@ -12,10 +13,28 @@ import operator
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
     sender: str
+    # Maintained by the context node (see context_window.py), checkpointed with the thread
+    summary: Optional[str]
+    summarized: int
+    context_stats: dict
 
 
-def agent_node(state, config, agent, name):
-    result = agent.invoke(state, config)
+def agent_node(state, config, agent, name, context_manager=None):
+    return _agent_update(agent.invoke(_agent_input(state, context_manager), config), name)
+
+
+async def aagent_node(state, config, agent, name, context_manager=None):
+    # Awaits the LLM call so other sessions' turns run while this one waits on the model
+    return _agent_update(await agent.ainvoke(_agent_input(state, context_manager), config), name)
+
+
+def _agent_input(state, context_manager):
+    if context_manager is None:
+        return state
+    return {**state, "messages": context_manager.prompt_messages(state)}
+
+
+def _agent_update(result, name):
     if isinstance(result, ToolMessage):
         result.name = sanitize_name(result.name)
     else:
@@ -25,8 +44,14 @@ def agent_node(state, config, agent, name):
         "sender": sanitize_name(name),
     }
 
-def create_workflow(chatbot_agent, tools):
-    chatbot_node = functools.partial(agent_node, agent=chatbot_agent, name="HR Chatbot")
+def create_workflow(chatbot_agent, tools, context_manager=None):
+    # Async runs (ainvoke, astream_events) use aagent_node; agent_node keeps graph.invoke working
+    chatbot_node = RunnableCallable(
+        functools.partial(agent_node, agent=chatbot_agent, name="HR Chatbot", context_manager=context_manager),
+        functools.partial(aagent_node, agent=chatbot_agent, name="HR Chatbot", context_manager=context_manager),
+        name="chatbot",
+        trace=False,
+    )
     tool_node = ToolNode(tools, name="tools")
 
     workflow = StateGraph(AgentState)
@@ -34,13 +59,22 @@ def create_workflow(chatbot_agent, tools):
     workflow.add_node("chatbot", chatbot_node)
     workflow.add_node("tools", tool_node)
 
-    workflow.set_entry_point("chatbot")
+    # With a context manager, every LLM call is preceded by the "context" node bounding the prompt
+    model_entry = "chatbot"
+    if context_manager is not None:
+        workflow.add_node(
+            "context", RunnableCallable(context_manager.update, context_manager.aupdate, name="context", trace=False)
+        )
+        workflow.add_edge("context", "chatbot")
+        model_entry = "context"
+
+    workflow.set_entry_point(model_entry)
     workflow.add_conditional_edges(
         "chatbot",
         tools_condition,
         {"tools": "tools", END: END}
     )
 
-    workflow.add_edge("tools", "chatbot")
+    workflow.add_edge("tools", model_entry)
 
     return workflow
\ No newline at end of file
@@ -0,0 +1,114 @@
+import re
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MINUTES_PER_DAY = 24 * 60
+
+# {"day": 0-6 (Monday first), "start": minute, "end": minute} per available interval, end exclusive.
+# Queries use $elemMatch so the bounds on day, start and end all apply to the same interval
+AVAILABILITY_FIELD = "availability"
+AVAILABILITY_INDEX = [
+    (f"{AVAILABILITY_FIELD}.day", 1),
+    (f"{AVAILABILITY_FIELD}.start", 1),
+    (f"{AVAILABILITY_FIELD}.end", 1),
+]
+
+TIME_PATTERN = re.compile(r"^(\d{1,2})(?::(\d{2}))?\s*(am|pm)?$")
+
+
+def parse_time(text: str) -> int:
+    """"9:00am", "2pm", "14:30", "noon", "midnight" -> minutes since midnight."""
+    text = str(text).strip().lower().replace(".", "")
+    if text in ("noon", "midday"):
+        return 12 * 60
+    if text == "midnight":
+        return 0
+    match = TIME_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Unrecognized time '{text}'. Use a time like 9:00am, 2pm or 14:30.")
+    hours, minutes, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hours <= 12:
+            raise ValueError(f"Unrecognized time '{text}'. Use a time like 9:00am, 2pm or 14:30.")
+        hours = hours % 12 + (12 if meridiem == "pm" else 0)
+    if hours > 24 or minutes > 59 or hours * 60 + minutes > MINUTES_PER_DAY:
+        raise ValueError(f"Unrecognized time '{text}'. Use a time like 9:00am, 2pm or 14:30.")
+    return hours * 60 + minutes
+
+
+def parse_day(text: str) -> int:
+    """"Monday", "mon", "TUE" -> 0-6."""
+    prefix = str(text).strip().lower()[:3]
+    for index, day in enumerate(DAYS):
+        if len(prefix) == 3 and day.lower().startswith(prefix):
+            return index
+    raise ValueError(f"Unrecognized day '{text}'. Use a weekday such as Monday.")
+
+
+def availability_intervals(record: dict) -> List[dict]:
+    """
+    Intervals for a workforce record's availability_day ({"Monday": {"start": "9:00am", "close": "6:00pm"}}).
+    Shifts that close at or before they start run past midnight and are split across the two days.
+    """
+    intervals = []
+    for day, hours in (record.get("availability_day") or {}).items():
+        index = parse_day(day)
+        start, end = parse_time(hours["start"]), parse_time(hours["close"])
+        if end > start:
+            intervals.append({"day": index, "start": start, "end": end})
+        else:
+            intervals.append({"day": index, "start": start, "end": MINUTES_PER_DAY})
+            if end:
+                intervals.append({"day": (index + 1) % 7, "start": 0, "end": end})
+    return sorted(intervals, key=lambda interval: (interval["day"], interval["start"]))
+
+
+def add_availability(collection_name: str, record: dict) -> dict:
+    """Sets the availability intervals of a workforce record about to be written."""
+    if collection_name == "workforce" and "availability_day" in record:
+        try:
+            record[AVAILABILITY_FIELD] = availability_intervals(record)
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Skipping availability of workforce record {record.get('email')}: {e}")
+    return record
+
+
+def availability_query(day: Optional[str] = None, time: Optional[str] = None, until: Optional[str] = None) -> dict:
+    """
+    Filter for people available on `day` (any day if omitted) at `time`, or for the whole of
+    `time`-`until` when both are given. Raises ValueError for days or times it can't read.
+    """
+    if until and not time:
+        raise ValueError("Give a start time along with the end time.")
+    condition = {"day": parse_day(day) if day else {"$in": list(range(len(DAYS)))}}
+    if time:
+        start = parse_time(time)
+        end = parse_time(until) if until else start + 1
+        if end <= start:
+            raise ValueError("Overnight ranges aren't supported; search each day separately.")
+        condition["start"] = {"$lte": start}
+        condition["end"] = {"$gte": end}
+    return {AVAILABILITY_FIELD: {"$elemMatch": condition}}
+
+
+def ensure_availability_index(db, collection_name: str = "workforce", batch_size: int = 1000) -> None:
+    """Computes intervals for documents written before they existed, then creates the index. Idempotent."""
+    collection = db[collection_name]
+    updates = []
+    for document in collection.find(
+        {AVAILABILITY_FIELD: {"$exists": False}, "availability_day": {"$exists": True}}, {"availability_day": 1}
+    ):
+        try:
+            intervals = availability_intervals(document)
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Skipping availability of workforce document {document['_id']}: {e}")
+            continue
+        updates.append(UpdateOne({"_id": document["_id"]}, {"$set": {AVAILABILITY_FIELD: intervals}}))
+        if len(updates) == batch_size:
+            collection.bulk_write(updates, ordered=False)
+            updates = []
+    if updates:
+        collection.bulk_write(updates, ordered=False)
+    collection.create_index(AVAILABILITY_INDEX)
@@ -1,7 +1,10 @@
+import asyncio
 import pickle
+from collections import OrderedDict
 from contextlib import AbstractContextManager
+from datetime import datetime, timedelta, timezone
 from types import TracebackType
-from typing import Any, Dict, Optional, AsyncIterator
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, AsyncIterator, Sequence, Tuple
 
 from langchain_core.runnables import RunnableConfig
 from typing_extensions import Self
@@ -14,7 +17,8 @@ from langgraph.checkpoint.base import (
     SerializerProtocol,
 )
 from langgraph.serde.jsonplus import JsonPlusSerializer
-from pymongo import AsyncMongoClient
+from pymongo import AsyncMongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
 
 class JsonPlusSerializerCompat(JsonPlusSerializer):
     def loads(self, data: bytes) -> Any:
@@ -22,7 +26,172 @@ class JsonPlusSerializerCompat(JsonPlusSerializer):
             return pickle.loads(data)
         return super().loads(data)
 
+def diff_checkpoint(parent: Checkpoint, checkpoint: Checkpoint) -> Dict[str, Any]:
+    """
+    Describes `checkpoint` relative to `parent`: only channels whose version changed are kept,
+    and list channels that only grew (e.g. messages) store just their new tail.
+    """
+    parent_values = parent["channel_values"]
+    parent_versions = parent["channel_versions"]
+    changes = {}
+    for channel, value in checkpoint["channel_values"].items():
+        if channel in parent_values and parent_versions.get(channel) == checkpoint["channel_versions"].get(channel):
+            continue
+        previous = parent_values.get(channel)
+        if (
+            isinstance(value, list)
+            and isinstance(previous, list)
+            and len(previous) <= len(value)
+            and all(a is b or a == b for a, b in zip(previous, value))
+        ):
+            changes[channel] = {"append": value[len(previous):]}
+        else:
+            changes[channel] = {"set": value}
+
+    delta = {key: value for key, value in checkpoint.items() if key != "channel_values"}
+    delta["channel_changes"] = changes
+    delta["channel_removed"] = [channel for channel in parent_values if channel not in checkpoint["channel_values"]]
+    return delta
+
+
+def apply_delta(parent: Checkpoint, delta: Dict[str, Any]) -> Checkpoint:
+    """Inverse of diff_checkpoint: rebuilds a checkpoint from its parent and its delta."""
+    removed = set(delta["channel_removed"])
+    values = {channel: value for channel, value in parent["channel_values"].items() if channel not in removed}
+    for channel, change in delta["channel_changes"].items():
+        if "append" in change:
+            values[channel] = list(values.get(channel) or []) + list(change["append"])
+        else:
+            values[channel] = change["set"]
+
+    checkpoint = {key: value for key, value in delta.items() if key not in ("channel_changes", "channel_removed")}
+    checkpoint["channel_values"] = values
+    return checkpoint
+
+
+def _queryable_metadata(metadata: CheckpointMetadata) -> Dict[str, Any]:
+    # The scalar metadata fields (source, step, score) stored as a plain subdocument for alist filters
+    return {
+        key: value
+        for key, value in metadata.items()
+        if value is None or isinstance(value, (str, int, float, bool))
+    }
+
+
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    # In-memory equivalent of the alist query, for checkpoints still waiting to be flushed
+    for key, value in query.items():
+        if key == "thread_ts":
+            if "$lt" in value and not doc["thread_ts"] < value["$lt"]:
+                return False
+            if "$gt" in value and not doc["thread_ts"] > value["$gt"]:
+                return False
+        elif key.startswith("meta."):
+            if doc["meta"].get(key[len("meta."):]) != value:
+                return False
+        elif doc.get(key) != value:
+            return False
+    return True
+
+
+def _copy_values(checkpoint: Checkpoint) -> Checkpoint:
+    # Lists are copied so later in-place changes can't alter what we diff against
+    values = {
+        channel: list(value) if isinstance(value, list) else value
+        for channel, value in checkpoint["channel_values"].items()
+    }
+    return {**checkpoint, "channel_values": values}
+
+
+class LazyCheckpointTuple(CheckpointTuple):
+    """
+    CheckpointTuple returned by MongoDBSaver.alist: the checkpoint and metadata blobs are only
+    deserialized when the fields are first read, so walking a history for its configs stays cheap.
+    """
+
+    def __new__(
+        cls,
+        config: RunnableConfig,
+        parent_config: Optional[RunnableConfig],
+        load_checkpoint: Callable[[], Optional[Checkpoint]],
+        load_metadata: Callable[[], CheckpointMetadata],
+    ) -> "LazyCheckpointTuple":
+        self = super().__new__(cls, config, None, None, parent_config)
+        self._loaders = {"checkpoint": load_checkpoint, "metadata": load_metadata}
+        self._loaded = {}
+        return self
+
+    def _load(self, field: str) -> Any:
+        if field not in self._loaded:
+            self._loaded[field] = self._loaders.pop(field)()
+        return self._loaded[field]
+
+    @property
+    def checkpoint(self) -> Optional[Checkpoint]:
+        return self._load("checkpoint")
+
+    @property
+    def metadata(self) -> CheckpointMetadata:
+        return self._load("metadata")
+
+    def __iter__(self):
+        return iter((self.config, self.checkpoint, self.metadata, self.parent_config))
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return getattr(self, self._fields[index])
+        return tuple(self)[index]
+
+    def __repr__(self) -> str:
+        return f"LazyCheckpointTuple(config={self.config!r}, parent_config={self.parent_config!r})"
+
+
+class _Head(NamedTuple):
+    # Latest checkpoint of a thread, deserialized, as kept in MongoDBSaver's LRU
+    thread_ts: str
+    checkpoint: Checkpoint
+    metadata: CheckpointMetadata
+    parent_ts: Optional[str]
+    depth: int
+    base_ts: str
+
+
+class _InFlight(NamedTuple):
+    # A checkpoint aput is writing. `head` resolves to (checkpoint, depth, base_ts, doc) once its
+    # document is built, or None if that failed; `stored` to whether it was stored (or queued)
+    head: asyncio.Future
+    stored: asyncio.Future
+
+
 class MongoDBSaver(AbstractContextManager, BaseCheckpointSaver):
+    """
+    Async LangGraph checkpointer storing one document per checkpoint.
+
+    With `delta=True`, a checkpoint is stored as the channel changes since its parent
+    ("kind": "delta"), with a full snapshot every `snapshot_interval` checkpoints along a chain.
+    Reads replay deltas from the nearest snapshot. Documents without "kind" are full snapshots,
+    so existing collections keep loading. LangGraph saves a run's checkpoints concurrently: a
+    checkpoint still being written is used as the parent of the next one, whose delta is only
+    inserted after it.
+
+    With `write_behind="run"` or `"interval"`, aput buffers checkpoints in memory and aflush()
+    writes them with a single insert_many: callers flush at the end of each run, or a background
+    task flushes every `flush_interval_ms`. Reads see a thread's pending checkpoints before they
+    are flushed, but they are lost if the process dies first.
+
+    The latest checkpoint of up to `cache_size` threads is kept deserialized in an LRU, filled by
+    aput and by reads, so a thread's next run starts without a database read. With several
+    processes writing the same threads, use `cache_validation="version"`: a hit is then confirmed
+    by reading only the newest thread_ts from the index. `invalidate()` drops entries explicitly.
+
+    Call `setup()` once to create the indexes reads rely on. Retention is opt-in: `keep_last`
+    bounds the checkpoints kept per thread and `thread_ttl` drops threads with no new checkpoint
+    for that long. Both are applied by `compact()`, which `start_compaction()` runs periodically.
+    With either set, each thread's last write is also kept in "<collection_name>_threads", and
+    threads written since their last trim are flagged there, so compaction finds idle and grown
+    threads on an index instead of by scanning the checkpoints.
+    """
+
     serde = JsonPlusSerializerCompat()
 
     client: AsyncMongoClient
@@ -36,12 +205,50 @@ class MongoDBSaver(AbstractContextManager, BaseCheckpointSaver):
         collection_name: str,
         *,
         serde: Optional[SerializerProtocol] = None,
+        delta: bool = False,
+        snapshot_interval: int = 20,
+        cache_size: int = 1024,
+        cache_validation: Optional[str] = None,
+        keep_last: Optional[int] = None,
+        thread_ttl: Optional[timedelta] = None,
+        metadata_index_keys: Sequence[str] = ("source", "step"),
+        write_behind: Optional[str] = None,
+        flush_interval_ms: int = 100,
+        max_pending: int = 100,
     ) -> None:
+        if write_behind not in (None, "run", "interval"):
+            raise ValueError(f"Unsupported write_behind mode: {write_behind}")
+        if cache_validation not in (None, "version"):
+            raise ValueError(f"Unsupported cache_validation mode: {cache_validation}")
         super().__init__(serde=serde)
         self.client = client
         self.db_name = db_name
         self.collection_name = collection_name
         self.collection = client[db_name][collection_name]
+        # thread_id -> time of the thread's newest checkpoint and whether keep_last may need applying,
+        # maintained when retention is enabled
+        self.threads = client[db_name][f"{collection_name}_threads"]
+        self.delta = delta
+        self.snapshot_interval = snapshot_interval
+        self.cache_size = cache_size
+        self.cache_validation = cache_validation
+        # thread_id -> latest checkpoint of the thread; also spares delta writes reading their parent back
+        self._heads: "OrderedDict[str, _Head]" = OrderedDict()
+        # thread_id -> thread_ts -> checkpoints whose aput hasn't finished
+        self._in_flight: Dict[str, Dict[str, _InFlight]] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.keep_last = keep_last
+        self.thread_ttl = thread_ttl
+        self.metadata_index_keys = metadata_index_keys
+        self._compaction_task: Optional[asyncio.Task] = None
+        self.write_behind = write_behind
+        self.flush_interval_ms = flush_interval_ms
+        self.max_pending = max_pending
+        # thread_id -> checkpoint documents not yet written, oldest first
+        self._pending: Dict[str, list] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
 
     def __enter__(self) -> Self:
         return self
@@ -62,24 +269,29 @@ class MongoDBSaver(AbstractContextManager, BaseCheckpointSaver):
             }
         else:
             query = {"thread_id": config["configurable"]["thread_id"]}
-        
-        doc = await self.collection.find_one(query, sort=[("thread_ts", -1)])
-        if doc:
+
+        head = await self._cached_head(query["thread_id"], query.get("thread_ts"))
+        if head is not None:
+            self.cache_hits += 1
             return CheckpointTuple(
-                config,
-                self.serde.loads(doc["checkpoint"]),
-                self.serde.loads(doc["metadata"]),
-                (
-                    {
-                        "configurable": {
-                            "thread_id": doc["thread_id"],
-                            "thread_ts": doc["parent_ts"],
-                        }
-                    }
-                    if doc.get("parent_ts")
-                    else None
-                ),
+                {"configurable": {"thread_id": query["thread_id"], "thread_ts": head.thread_ts}},
+                _copy_values(head.checkpoint),
+                dict(head.metadata),
+                {"configurable": {"thread_id": query["thread_id"], "thread_ts": head.parent_ts}} if head.parent_ts else None,
             )
+        self.cache_misses += 1
+
+        doc = self._find_pending(query["thread_id"], query.get("thread_ts"))
+        if doc is None:
+            doc = await self.collection.find_one(query, sort=[("thread_ts", -1)])
+        if doc:
+            checkpoint_tuple = await self._to_tuple(doc)
+            if "thread_ts" not in query:
+                self._remember_head(
+                    doc["thread_id"], doc["thread_ts"], checkpoint_tuple.checkpoint, checkpoint_tuple.metadata,
+                    doc.get("parent_ts"), doc.get("depth", 0), doc.get("base_ts", doc["thread_ts"]),
+                )
+            return checkpoint_tuple
         return None
 
     async def alist(
@@ -88,42 +300,82 @@ class MongoDBSaver(AbstractContextManager, BaseCheckpointSaver):
         *,
         filter: Optional[Dict[str, Any]] = None,
         before: Optional[RunnableConfig] = None,
+        after: Optional[RunnableConfig] = None,
         limit: Optional[int] = None,
+        include_checkpoint: bool = True,
     ) -> AsyncIterator[CheckpointTuple]:
+        """
+        Yields matching checkpoints newest first, as LazyCheckpointTuples.
+
+        Only the fields the tuples need are read. `before` and `after` bound thread_ts exclusively,
+        which alist_page uses to page through a history. With `include_checkpoint=False` the
+        checkpoint blobs aren't read at all and each tuple's checkpoint is None.
+        """
         query = {}
         if config is not None:
             query["thread_id"] = config["configurable"]["thread_id"]
         if filter:
             for key, value in filter.items():
-                query[f"metadata.{key}"] = value
-        if before is not None:
-            query["thread_ts"] = {"$lt": before["configurable"]["thread_ts"]}
-        
-        cursor = self.collection.find(query).sort("thread_ts", -1)
+                query[f"meta.{key}"] = value
+        if before is not None or after is not None:
+            query["thread_ts"] = {}
+            if before is not None:
+                query["thread_ts"]["$lt"] = before["configurable"]["thread_ts"]
+            if after is not None:
+                query["thread_ts"]["$gt"] = after["configurable"]["thread_ts"]
+
+        projection = {"_id": 0, "thread_id": 1, "thread_ts": 1, "parent_ts": 1, "metadata": 1}
+        if include_checkpoint:
+            projection.update({"checkpoint": 1, "kind": 1, "base_ts": 1})
+        cursor = self.collection.find(query, projection).sort("thread_ts", -1)
         if limit:
             cursor = cursor.limit(limit)
-        
+
+        # Pending checkpoints are merged into the stored ones, newest first
+        pending = sorted(
+            (doc for docs in self._pending.values() for doc in docs if _matches(doc, query)),
+            key=lambda doc: doc["thread_ts"],
+        )
+        # thread_id -> (base_ts, ancestors) of the delta chain segment last listed in that thread
+        segments: Dict[str, tuple] = {}
+        count = 0
         async for doc in cursor:
-            yield CheckpointTuple(
-                {
-                    "configurable": {
-                        "thread_id": doc["thread_id"],
-                        "thread_ts": doc["thread_ts"],
-                    }
-                },
-                self.serde.loads(doc["checkpoint"]),
-                self.serde.loads(doc["metadata"]),
-                (
-                    {
-                        "configurable": {
-                            "thread_id": doc["thread_id"],
-                            "thread_ts": doc["parent_ts"],
-                        }
-                    }
-                    if doc.get("parent_ts")
-                    else None
-                ),
-            )
+            while pending and pending[-1]["thread_ts"] > doc["thread_ts"]:
+                if limit and count >= limit:
+                    return
+                yield await self._lazy_tuple(pending.pop(), include_checkpoint, segments)
+                count += 1
+            if limit and count >= limit:
+                return
+            yield await self._lazy_tuple(doc, include_checkpoint, segments)
+            count += 1
+        while pending and not (limit and count >= limit):
+            yield await self._lazy_tuple(pending.pop(), include_checkpoint, segments)
+            count += 1
+
+    async def alist_page(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        limit: int,
+        cursor: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        include_checkpoint: bool = True,
+    ) -> Tuple[List[CheckpointTuple], Optional[str]]:
+        """
+        Returns one page of checkpoints, newest first, and the cursor of the next page (None on the
+        last page). Pages are ranges of thread_ts, so they stay stable while new checkpoints arrive.
+        """
+        before = {"configurable": {"thread_ts": cursor}} if cursor else None
+        page = []
+        async for checkpoint_tuple in self.alist(
+            config, filter=filter, before=before, limit=limit + 1, include_checkpoint=include_checkpoint
+        ):
+            page.append(checkpoint_tuple)
+        if len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        return page, page[-1].config["configurable"]["thread_ts"]
 
     async def aput(
         self,
@@ -131,15 +383,73 @@ class MongoDBSaver(AbstractContextManager, BaseCheckpointSaver):
         checkpoint: Checkpoint,
         metadata: CheckpointMetadata,
     ) -> RunnableConfig:
-        doc = {
-            "thread_id": config["configurable"]["thread_id"],
-            "thread_ts": checkpoint["id"],
-            "checkpoint": self.serde.dumps(checkpoint),
-            "metadata": self.serde.dumps(metadata),
-        }
-        if config["configurable"].get("thread_ts"):
-            doc["parent_ts"] = config["configurable"]["thread_ts"]
-        await self.collection.insert_one(doc)
+        thread_id = config["configurable"]["thread_id"]
+        parent_ts = config["configurable"].get("thread_ts")
+        # LangGraph saves a run's checkpoints in concurrent background tasks. This one is registered
+        # before the first await, so the next aput finds it as its parent while it is being written
+        loop = asyncio.get_running_loop()
+        entry = _InFlight(loop.create_future(), loop.create_future())
+        self._in_flight.setdefault(thread_id, {})[checkpoint["id"]] = entry
+        try:
+            doc = {
+                "thread_id": thread_id,
+                "thread_ts": checkpoint["id"],
+                "metadata": self.serde.dumps(metadata),
+                "meta": _queryable_metadata(metadata),
+                "created_at": datetime.now(timezone.utc),
+            }
+            if parent_ts:
+                doc["parent_ts"] = parent_ts
+
+            if self.delta:
+                parent_entry = self._in_flight.get(thread_id, {}).get(parent_ts)
+                parent = await self._get_head(thread_id, parent_ts) if parent_ts else None
+                if parent is not None and parent_entry is not None and not await asyncio.shield(parent_entry.stored):
+                    # The parent's write failed, so a delta on it could never be rebuilt
+                    parent = None
+                if parent is not None and parent[1] + 1 < self.snapshot_interval:
+                    parent_checkpoint, parent_depth, base_ts = parent
+                    doc["kind"] = "delta"
+                    doc["checkpoint"] = self.serde.dumps(diff_checkpoint(parent_checkpoint, checkpoint))
+                    doc["depth"] = parent_depth + 1
+                    doc["base_ts"] = base_ts
+                else:
+                    doc["kind"] = "snapshot"
+                    doc["checkpoint"] = self.serde.dumps(checkpoint)
+                    doc["depth"] = 0
+                    doc["base_ts"] = checkpoint["id"]
+            else:
+                doc["checkpoint"] = self.serde.dumps(checkpoint)
+            entry.head.set_result((checkpoint, doc.get("depth", 0), doc.get("base_ts", checkpoint["id"]), doc))
+
+            # The head is cached once the checkpoint is stored or queued, never for a failed insert
+            if self.write_behind:
+                pending = self._pending.setdefault(thread_id, [])
+                pending.append(doc)
+                self._remember_head(
+                    thread_id, checkpoint["id"], checkpoint, metadata, parent_ts, doc.get("depth", 0), doc.get("base_ts", checkpoint["id"])
+                )
+                entry.stored.set_result(True)
+                if len(pending) >= self.max_pending:
+                    await self.aflush(thread_id)
+                elif self.write_behind == "interval" and (self._flush_task is None or self._flush_task.done()):
+                    self._flush_task = asyncio.create_task(self._flush_periodically())
+            else:
+                await self.collection.insert_one(doc)
+                self._remember_head(
+                    thread_id, checkpoint["id"], checkpoint, metadata, parent_ts, doc.get("depth", 0), doc.get("base_ts", checkpoint["id"])
+                )
+                entry.stored.set_result(True)
+                await self._record_writes([doc])
+        finally:
+            if not entry.head.done():
+                entry.head.set_result(None)
+            if not entry.stored.done():
+                entry.stored.set_result(False)
+            in_flight = self._in_flight.get(thread_id, {})
+            in_flight.pop(checkpoint["id"], None)
+            if not in_flight:
+                self._in_flight.pop(thread_id, None)
         return {
             "configurable": {
                 "thread_id": config["configurable"]["thread_id"],
@@ -147,6 +457,369 @@ class MongoDBSaver(AbstractContextManager, BaseCheckpointSaver):
             }
         }
 
+    async def aflush(self, thread_id: Optional[str] = None) -> int:
+        """Writes the pending checkpoints of one thread, or of all threads, in one insert_many."""
+        async with self._flush_lock:
+            if thread_id is not None:
+                docs = self._pending.pop(thread_id, [])
+            else:
+                docs = [doc for thread_docs in self._pending.values() for doc in thread_docs]
+                self._pending.clear()
+            if not docs:
+                return 0
+
+            try:
+                await self.collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # Checkpoints written by an earlier, partially failed flush are duplicates: ignore them
+                failed = [error["index"] for error in e.details["writeErrors"] if error["code"] != 11000]
+                if failed:
+                    for index in sorted(failed, reverse=True):
+                        doc = docs[index]
+                        self._pending.setdefault(doc["thread_id"], []).insert(0, doc)
+                    raise
+            except Exception:
+                for doc in reversed(docs):
+                    self._pending.setdefault(doc["thread_id"], []).insert(0, doc)
+                raise
+            await self._record_writes(docs)
+            return len(docs)
+
+    async def _record_writes(self, docs: List[Dict[str, Any]]) -> None:
+        # Moves each thread's last write forward and flags it for trimming; compact() reads both
+        if self.thread_ttl is None and self.keep_last is None:
+            return
+        last_write: Dict[str, datetime] = {}
+        for doc in docs:
+            last_write[doc["thread_id"]] = max(doc["created_at"], last_write.get(doc["thread_id"], doc["created_at"]))
+        flags = {"$set": {"untrimmed": True}} if self.keep_last is not None else {}
+        await self.threads.bulk_write(
+            [
+                UpdateOne({"_id": thread_id}, {"$max": {"last_write": ts}, **flags}, upsert=True)
+                for thread_id, ts in last_write.items()
+            ],
+            ordered=False,
+        )
+
+    async def _flush_periodically(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.flush_interval_ms / 1000)
+            try:
+                await self.aflush()
+            except Exception as e:
+                print(f"Checkpoint flush failed: {e}")
+
+    def _find_pending(self, thread_id: str, thread_ts: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if thread_ts is not None:
+            for doc in self._writing_docs(thread_id):
+                if doc["thread_ts"] == thread_ts:
+                    return doc
+        docs = self._pending.get(thread_id)
+        if not docs:
+            return None
+        if thread_ts is None:
+            return max(docs, key=lambda doc: doc["thread_ts"])
+        for doc in docs:
+            if doc["thread_ts"] == thread_ts:
+                return doc
+        return None
+
+    def _writing_docs(self, thread_id: str) -> List[Dict[str, Any]]:
+        # Documents of the thread's in-flight checkpoints that are built but not yet stored
+        return [
+            entry.head.result()[3]
+            for entry in self._in_flight.get(thread_id, {}).values()
+            if entry.head.done() and entry.head.result() is not None
+        ]
+
+    async def _to_tuple(self, doc: Dict[str, Any]) -> CheckpointTuple:
+        return CheckpointTuple(
+            self._doc_config(doc),
+            await self._load_checkpoint(doc),
+            self.serde.loads(doc["metadata"]),
+            self._parent_config(doc),
+        )
+
+    async def _lazy_tuple(
+        self, doc: Dict[str, Any], include_checkpoint: bool, segments: Dict[str, tuple]
+    ) -> LazyCheckpointTuple:
+        if not include_checkpoint:
+            load_checkpoint = lambda: None
+        elif doc.get("kind") != "delta":
+            load_checkpoint = lambda: self.serde.loads(doc["checkpoint"])
+        else:
+            # Decoding can't query the database, so the chain segment is read up front. Deltas are
+            # small and the listing is newest first, so one range query covers the rest of the segment.
+            segment = segments.get(doc["thread_id"])
+            if segment is None or segment[0] != doc["base_ts"] or doc.get("parent_ts") not in segment[1]:
+                segment = (doc["base_ts"], await self._fetch_ancestors(doc))
+                segments[doc["thread_id"]] = segment
+            ancestors = segment[1]
+            load_checkpoint = lambda: self._replay(doc, ancestors)
+
+        return LazyCheckpointTuple(
+            self._doc_config(doc),
+            self._parent_config(doc),
+            load_checkpoint,
+            lambda: self.serde.loads(doc["metadata"]),
+        )
+
+    @staticmethod
+    def _doc_config(doc: Dict[str, Any]) -> RunnableConfig:
+        return {
+            "configurable": {
+                "thread_id": doc["thread_id"],
+                "thread_ts": doc["thread_ts"],
+            }
+        }
+
+    @staticmethod
+    def _parent_config(doc: Dict[str, Any]) -> Optional[RunnableConfig]:
+        if not doc.get("parent_ts"):
+            return None
+        return {
+            "configurable": {
+                "thread_id": doc["thread_id"],
+                "thread_ts": doc["parent_ts"],
+            }
+        }
+
+    async def setup(self) -> None:
+        """Creates the indexes used by aget_tuple, alist and compaction. Safe to call repeatedly."""
+        from pymongo import ASCENDING, DESCENDING, IndexModel
+
+        indexes = [
+            IndexModel([("thread_id", ASCENDING), ("thread_ts", DESCENDING)], name="thread_id_thread_ts", unique=True),
+            IndexModel([("thread_id", ASCENDING), ("created_at", DESCENDING)], name="thread_id_created_at"),
+        ]
+        for key in self.metadata_index_keys:
+            indexes.append(
+                IndexModel(
+                    [("thread_id", ASCENDING), (f"meta.{key}", ASCENDING), ("thread_ts", DESCENDING)],
+                    name=f"thread_id_meta_{key}_thread_ts",
+                )
+            )
+        await self.collection.create_indexes(indexes)
+
+        if self.thread_ttl is not None or self.keep_last is not None:
+            await self.threads.create_indexes([
+                IndexModel([("last_write", ASCENDING)], name="last_write"),
+                IndexModel([("untrimmed", ASCENDING)], name="untrimmed", sparse=True),
+            ])
+            if await self.threads.estimated_document_count() == 0:
+                # One-off backfill for threads written before retention was enabled
+                await self.collection.aggregate([
+                    {"$group": {"_id": "$thread_id", "last_write": {"$max": "$created_at"}, "untrimmed": {"$max": True}}},
+                    {"$merge": {"into": self.threads.name, "whenMatched": "keepExisting"}},
+                ])
+
+    async def compact(self, thread_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Applies the retention policy to one thread, or to every thread when thread_id is None.
+
+        Threads whose newest checkpoint is older than `thread_ttl` are deleted entirely. Other threads
+        keep their `keep_last` newest checkpoints; only threads written since they were last trimmed
+        are looked at. Kept deltas whose parent is removed are rewritten as snapshots first, so every
+        remaining checkpoint can still be rebuilt.
+        """
+        stats = {"threads_expired": 0, "checkpoints_deleted": 0}
+
+        if self.thread_ttl is not None:
+            idle = {"last_write": {"$lt": datetime.now(timezone.utc) - self.thread_ttl}}
+            if thread_id is not None:
+                idle["_id"] = thread_id
+            expired = [doc["_id"] async for doc in self.threads.find(idle, {"_id": 1})]
+            if expired:
+                result = await self.collection.delete_many({"thread_id": {"$in": expired}})
+                await self.threads.delete_many({"_id": {"$in": expired}, "last_write": idle["last_write"]})
+                stats["threads_expired"] += len(expired)
+                stats["checkpoints_deleted"] += result.deleted_count
+                for expired_thread in expired:
+                    self._heads.pop(expired_thread, None)
+
+        if self.keep_last is not None:
+            if thread_id is not None:
+                stats["checkpoints_deleted"] += await self._trim_thread(thread_id)
+            else:
+                async for thread in self.threads.find({"untrimmed": True}, {"last_write": 1}):
+                    stats["checkpoints_deleted"] += await self._trim_thread(thread["_id"])
+                    # A write since the find moved last_write and keeps the flag for the next run
+                    await self.threads.update_one(
+                        {"_id": thread["_id"], "last_write": thread.get("last_write")}, {"$unset": {"untrimmed": ""}}
+                    )
+
+        return stats
+
+    async def _trim_thread(self, thread_id: str) -> int:
+        # Probe the (thread_id, thread_ts) index for a checkpoint beyond the kept ones before reading any
+        beyond = await self.collection.find_one(
+            {"thread_id": thread_id}, {"_id": 1}, sort=[("thread_ts", -1)], skip=self.keep_last
+        )
+        if beyond is None:
+            return 0
+
+        kept = [
+            doc
+            async for doc in self.collection.find(
+                {"thread_id": thread_id},
+                {"thread_ts": 1, "parent_ts": 1, "kind": 1},
+                sort=[("thread_ts", -1)],
+                limit=self.keep_last,
+            )
+        ]
+        if len(kept) < self.keep_last:
+            return 0
+
+        kept_ts = {doc["thread_ts"] for doc in kept}
+        for doc in kept:
+            if doc.get("kind") == "delta" and doc.get("parent_ts") not in kept_ts:
+                full = await self.collection.find_one({"_id": doc["_id"]})
+                checkpoint = await self._load_checkpoint(full)
+                await self.collection.update_one(
+                    {"_id": doc["_id"]},
+                    {"$set": {
+                        "kind": "snapshot",
+                        "checkpoint": self.serde.dumps(checkpoint),
+                        "depth": 0,
+                        "base_ts": doc["thread_ts"],
+                    }},
+                )
+
+        result = await self.collection.delete_many(
+            {"thread_id": thread_id, "thread_ts": {"$lt": kept[-1]["thread_ts"]}}
+        )
+        return result.deleted_count
+
+    def start_compaction(self, interval: float) -> asyncio.Task:
+        """Runs compact() every `interval` seconds in the background until stop_compaction()."""
+
+        async def run() -> None:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.compact()
+                except Exception as e:
+                    print(f"Checkpoint compaction failed: {e}")
+
+        if self._compaction_task is None or self._compaction_task.done():
+            self._compaction_task = asyncio.create_task(run())
+        return self._compaction_task
+
+    async def stop_compaction(self) -> None:
+        if self._compaction_task is not None:
+            self._compaction_task.cancel()
+            try:
+                await self._compaction_task
+            except asyncio.CancelledError:
+                pass
+            self._compaction_task = None
+
+    async def _load_checkpoint(self, doc: Dict[str, Any]) -> Checkpoint:
+        if doc.get("kind") != "delta":
+            return self.serde.loads(doc["checkpoint"])
+        return self._replay(doc, await self._fetch_ancestors(doc))
+
+    async def _fetch_ancestors(self, doc: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        # Fetch everything between the snapshot and this checkpoint in one query; _replay then
+        # follows parent_ts links back to the snapshot so sibling branches are ignored
+        cursor = self.collection.find(
+            {
+                "thread_id": doc["thread_id"],
+                "thread_ts": {"$gte": doc["base_ts"], "$lt": doc["thread_ts"]},
+            },
+            {"thread_ts": 1, "parent_ts": 1, "kind": 1, "checkpoint": 1},
+        )
+        ancestors = {ancestor["thread_ts"]: ancestor async for ancestor in cursor}
+        for pending in self._pending.get(doc["thread_id"], []) + self._writing_docs(doc["thread_id"]):
+            if pending["thread_ts"] < doc["thread_ts"]:
+                ancestors.setdefault(pending["thread_ts"], pending)
+        return ancestors
+
+    def _replay(self, doc: Dict[str, Any], ancestors: Dict[str, Dict[str, Any]]) -> Checkpoint:
+        chain = [doc]
+        while chain[-1].get("kind") == "delta":
+            parent = ancestors.get(chain[-1].get("parent_ts"))
+            if parent is None:
+                raise ValueError(
+                    f"Checkpoint {doc['thread_ts']} of thread {doc['thread_id']} is missing its ancestor "
+                    f"{chain[-1].get('parent_ts')}"
+                )
+            chain.append(parent)
+
+        checkpoint = self.serde.loads(chain[-1]["checkpoint"])
+        for delta_doc in reversed(chain[:-1]):
+            checkpoint = apply_delta(checkpoint, self.serde.loads(delta_doc["checkpoint"]))
+        return checkpoint
+
+    async def _get_head(self, thread_id: str, thread_ts: str) -> Optional[tuple]:
+        """Returns (checkpoint, depth, base_ts) of a stored checkpoint, from memory when it was just written."""
+        head = self._heads.get(thread_id)
+        if head is not None and head.thread_ts == thread_ts:
+            self._heads.move_to_end(thread_id)
+            return head.checkpoint, head.depth, head.base_ts
+
+        entry = self._in_flight.get(thread_id, {}).get(thread_ts)
+        if entry is not None:
+            # Still being written by another aput: wait for its document rather than read the collection
+            written = await asyncio.shield(entry.head)
+            if written is not None:
+                return written[:3]
+
+        doc = self._find_pending(thread_id, thread_ts)
+        if doc is None:
+            doc = await self.collection.find_one({"thread_id": thread_id, "thread_ts": thread_ts})
+        if doc is None:
+            return None
+        checkpoint = await self._load_checkpoint(doc)
+        return checkpoint, doc.get("depth", 0), doc.get("base_ts", doc["thread_ts"])
+
+    async def _cached_head(self, thread_id: str, thread_ts: Optional[str]) -> Optional[_Head]:
+        head = self._heads.get(thread_id)
+        if head is None or (thread_ts is not None and head.thread_ts != thread_ts):
+            return None
+
+        if self.cache_validation == "version" and thread_ts is None and not self._pending.get(thread_id):
+            # Another process may have written a newer checkpoint; only the index is read to find out
+            latest = await self.collection.find_one(
+                {"thread_id": thread_id},
+                {"thread_ts": 1, "_id": 0},
+                sort=[("thread_ts", -1)],
+            )
+            if latest is None or latest["thread_ts"] != head.thread_ts:
+                self._heads.pop(thread_id, None)
+                return None
+
+        self._heads.move_to_end(thread_id)
+        return head
+
+    def _remember_head(
+        self,
+        thread_id: str,
+        thread_ts: str,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        parent_ts: Optional[str],
+        depth: int,
+        base_ts: str,
+    ) -> None:
+        if self.cache_size <= 0:
+            return
+        head = self._heads.get(thread_id)
+        if head is not None and head.thread_ts > thread_ts:
+            # Concurrent writes can finish out of order: the head only moves forward
+            return
+        self._heads[thread_id] = _Head(thread_ts, _copy_values(checkpoint), dict(metadata), parent_ts, depth, base_ts)
+        self._heads.move_to_end(thread_id)
+        while len(self._heads) > self.cache_size:
+            self._heads.popitem(last=False)
+
+    def invalidate(self, thread_id: Optional[str] = None) -> None:
+        """Drops the cached latest checkpoint of one thread, or of all threads."""
+        if thread_id is None:
+            self._heads.clear()
+        else:
+            self._heads.pop(thread_id, None)
+
     # Implement synchronous methods as well for compatibility
     def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
         raise NotImplementedError("Use aget_tuple for asynchronous operations")
@@ -1,4 +1,6 @@
+import atexit
 import os
+import threading
 from dotenv import load_dotenv
 from pymongo.mongo_client import MongoClient
 from langchain_mongodb.chat_message_histories import MongoDBChatMessageHistory
@@ -8,12 +10,96 @@ load_dotenv()
 
 MONGO_URI = os.environ.get("MONGO_URI")
 DATABASE_NAME = "demo_company_employees"
+APP_NAME = "devrel.showcase.hr_agent.python"
+
+# Connections per client, shared by every chat session of the process
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+
+
+class MongoClientRegistry:
+    """
+    Owns at most one MongoClient and one AsyncMongoClient per URI for the whole process.
+
+    The tools, vector stores, checkpointer and chat history all get their clients here, so the
+    number of connection pools doesn't grow with the number of chat sessions.
+    """
+
+    def __init__(self, max_pool_size: int = MONGO_MAX_POOL_SIZE, min_pool_size: int = MONGO_MIN_POOL_SIZE):
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self._clients = {}
+        self._async_clients = {}
+        self._lock = threading.Lock()
+
+    def _options(self):
+        return {"appname": APP_NAME, "maxPoolSize": self.max_pool_size, "minPoolSize": self.min_pool_size}
+
+    def get_client(self, uri: str) -> MongoClient:
+        with self._lock:
+            client = self._clients.get(uri)
+            if client is None:
+                client = self._clients[uri] = MongoClient(uri, **self._options())
+            return client
+
+    def get_async_client(self, uri: str):
+        # Imported here so sync-only consumers (the ingestion script) don't need the async driver
+        from pymongo import AsyncMongoClient
+
+        with self._lock:
+            client = self._async_clients.get(uri)
+            if client is None:
+                # An AsyncMongoClient connects on first use and stays bound to that event loop
+                client = self._async_clients[uri] = AsyncMongoClient(uri, **self._options())
+            return client
+
+    def discard(self, uri: str, client: MongoClient) -> None:
+        """Drops `client` from the registry and closes it, unless another client replaced it already."""
+        with self._lock:
+            if self._clients.get(uri) is client:
+                del self._clients[uri]
+        try:
+            client.close()
+        except Exception as e:
+            print(f"Error closing MongoDB client: {e}")
+
+    def get_collection(self, uri: str, database_name: str, collection_name: str):
+        return self.get_client(uri)[database_name][collection_name]
+
+    def close(self) -> None:
+        """Closes the sync clients. Async clients must be closed with aclose() on their event loop."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            # One failing client must not keep the others open at shutdown
+            try:
+                client.close()
+            except Exception as e:
+                print(f"Error closing MongoDB client: {e}")
+
+    async def aclose(self) -> None:
+        """Closes every client; call it on the event loop the async clients were used on."""
+        with self._lock:
+            async_clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        for client in async_clients:
+            try:
+                await client.close()
+            except Exception as e:
+                print(f"Error closing MongoDB client: {e}")
+        self.close()
+
+
+registry = MongoClientRegistry()
+atexit.register(registry.close)
+
 
 def get_mongo_client(mongo_uri):
-    """Establish connection to the MongoDB and ping the database."""
+    """Return the process-wide client for `mongo_uri` after pinging the database."""
 
     # gateway to interacting with a MongoDB database cluster
-    client = MongoClient(mongo_uri, appname="devrel.showcase.hr_agent.python")
+    client = registry.get_client(mongo_uri)
 
     # Ping the database to ensure the connection is successful
     try:
@@ -21,10 +107,40 @@ def get_mongo_client(mongo_uri):
         print("Connection to MongoDB successful")
     except Exception as e:
         print(f"Error connecting to MongoDB: {e}")
+        # Otherwise the failed client would be handed out for this URI until the process exits
+        registry.discard(mongo_uri, client)
         return None
 
     return client
 
 
+class PooledMongoDBChatMessageHistory(MongoDBChatMessageHistory):
+    """MongoDBChatMessageHistory on the registry's client, instead of a new client per history."""
+
+    _indexed = set()
+
+    def __init__(self, session_id: str, database_name: str, collection_name: str, client: MongoClient):
+        self.connection_string = None
+        self.session_id = session_id
+        self.database_name = database_name
+        self.collection_name = collection_name
+        self.client = client
+
+    @property
+    def db(self):
+        return self.client[self.database_name]
+
+    @property
+    def collection(self):
+        collection = self.db[self.collection_name]
+        # The SessionId index is created once per process rather than for every history
+        if (self.database_name, self.collection_name) not in self._indexed:
+            collection.create_index("SessionId")
+            self._indexed.add((self.database_name, self.collection_name))
+        return collection
+
+
 def get_session_history(session_id: str) -> MongoDBChatMessageHistory:
-  return MongoDBChatMessageHistory(MONGO_URI, session_id, database_name=DATABASE_NAME, collection_name="history")
+  return PooledMongoDBChatMessageHistory(
+      session_id, database_name=DATABASE_NAME, collection_name="history", client=registry.get_client(MONGO_URI)
+  )
@@ -0,0 +1,76 @@
+from typing import Dict, List, Optional
+
+# Fields matched by the lexical side of hybrid search. employee_string has skills, names and job
+# details; employee_id is indexed as a single keyword so "E123456" matches exactly
+EMPLOYEE_TEXT_PATHS = ["employee_string", "employee_id", "last_name"]
+
+# Reciprocal rank fusion constant; $rankFusion uses the same
+RRF_K = 60
+
+
+def employee_text_index_definition() -> dict:
+    return {
+        "mappings": {
+            "dynamic": False,
+            "fields": {
+                "employee_string": {"type": "string"},
+                "employee_id": {"type": "string", "analyzer": "lucene.keyword"},
+                "last_name": {"type": "string"},
+            },
+        }
+    }
+
+
+def text_search_pipeline(index_name: str, query: str, k: int, pre_filter: Optional[dict] = None) -> List[dict]:
+    """Full-text ($search) counterpart of a vector search: best k lexical matches of `query` passing `pre_filter`."""
+    pipeline = [{"$search": {"index": index_name, "text": {"query": query, "path": EMPLOYEE_TEXT_PATHS}}}]
+    if pre_filter:
+        # The vector pre-filter only uses $and/$eq/$gte/$lte, so it is a valid $match as well
+        pipeline.append({"$match": pre_filter})
+    pipeline.append({"$limit": k})
+    return pipeline
+
+
+def rank_fusion_pipeline(
+    pipelines: Dict[str, List[dict]], weights: Dict[str, float], limit: int, projection: Optional[dict] = None
+) -> List[dict]:
+    """
+    One aggregation running every ranked pipeline and merging them by reciprocal rank fusion on the
+    server ($rankFusion, MongoDB 8.1+). The fused score is exposed as `score`.
+    """
+    pipeline = [
+        {
+            "$rankFusion": {
+                "input": {"pipelines": pipelines},
+                "combination": {"weights": {name: weights.get(name, 1) for name in pipelines}},
+            }
+        },
+        {"$limit": limit},
+        {"$set": {"score": {"$meta": "score"}}},
+    ]
+    if projection:
+        pipeline.append({"$project": projection})
+    return pipeline
+
+
+def reciprocal_rank_fusion(
+    ranked: Dict[str, List[dict]],
+    key: str,
+    weights: Optional[Dict[str, float]] = None,
+    limit: Optional[int] = None,
+    k: int = RRF_K,
+) -> List[dict]:
+    """
+    Client-side equivalent of $rankFusion: each document scores sum(weight / (k + rank)) over the
+    result lists it appears in (rank starting at 1), documents being identified by `key`.
+    """
+    scores: Dict[object, float] = {}
+    documents: Dict[object, dict] = {}
+    for name, results in ranked.items():
+        weight = (weights or {}).get(name, 1)
+        for rank, document in enumerate(results, 1):
+            identity = document[key]
+            scores[identity] = scores.get(identity, 0) + weight / (k + rank)
+            documents.setdefault(identity, document)
+    order = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [{**documents[identity], "score": scores[identity]} for identity in order]
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from mongodb.quantization import decode_vector
+
+# One {_id: <collection name>, version: <int>} document per indexed collection, bumped by ingestion
+# whenever it writes that collection; local indexes rebuild when the version they were built from changes
+VERSIONS_COLLECTION = "index_versions"
+
+
+def bump_version(db, collection_name: str) -> None:
+    db[VERSIONS_COLLECTION].update_one({"_id": collection_name}, {"$inc": {"version": 1}}, upsert=True)
+
+
+def current_version(db, collection_name: str) -> int:
+    document = db[VERSIONS_COLLECTION].find_one({"_id": collection_name})
+    return (document or {}).get("version", 0)
+
+
+class LocalVectorIndex:
+    """
+    In-process exact vector index over a collection's embeddings.
+
+    The vectors are normalized and stored as one contiguous float32 matrix in a memory-mapped .npy
+    file (with the document _ids next to it), so top-k is a single matrix-vector product and a
+    restart reopens the file instead of reading the collection again. Scores use Atlas's cosine
+    scale, (1 + cosine) / 2.
+
+    refresh() compares the version stamp ingestion keeps in VERSIONS_COLLECTION with the one the
+    file was built from, at most every `refresh_interval` seconds, and rebuilds when they differ.
+    """
+
+    def __init__(self, db, collection_name: str, path: str, dimensions: int, embedding_key: str = "embedding",
+                 refresh_interval: float = 30, batch_size: int = 1000):
+        self.db = db
+        self.collection_name = collection_name
+        self.path = path
+        self.dimensions = dimensions
+        self.embedding_key = embedding_key
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.version = None
+        # (matrix, _ids, row of each _id), replaced as a whole so searches never see a mix of two builds
+        self._state = (np.zeros((0, dimensions), dtype=np.float32), [], {})
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._state[1])
+
+    def refresh(self, force: bool = False) -> None:
+        """Loads or rebuilds the index if ingestion changed the collection since it was built."""
+        if not force and time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            self._checked_at = time.monotonic()
+            version = current_version(self.db, self.collection_name)
+            if version == self.version and not force:
+                return
+            if force or not self._load(version):
+                self._build(version)
+
+    def search(self, query_vector: Iterable[float], k: int,
+               allowed_ids: Optional[Iterable] = None) -> List[Tuple[object, float]]:
+        """(_id, score) of the k nearest documents, best first, among `allowed_ids` if given."""
+        matrix, ids, rows = self._state
+        if not ids or k <= 0:
+            return []
+        query = np.array(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1
+        scores = matrix @ query
+        if allowed_ids is not None:
+            candidates = np.fromiter((rows[i] for i in allowed_ids if i in rows), dtype=np.int64)
+            if not len(candidates):
+                return []
+            subset = scores[candidates]
+            top = np.argsort(-subset, kind="stable")[:k] if len(subset) <= k else _top_k(subset, k)
+            chosen = candidates[top]
+        else:
+            chosen = np.argsort(-scores, kind="stable")[:k] if len(scores) <= k else _top_k(scores, k)
+        return [(ids[row], float((1 + scores[row]) / 2)) for row in chosen]
+
+    def _load(self, version) -> bool:
+        try:
+            with open(self.path + ".json") as f:
+                meta = json.load(f)
+            if meta["version"] != version or meta["dimensions"] != self.dimensions:
+                return False
+            matrix = np.load(self.path + ".npy", mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return False
+        self._swap(matrix, [_decode_id(i) for i in meta["ids"]], version)
+        return True
+
+    def _build(self, version) -> None:
+        collection = self.db[self.collection_name]
+        query = {self.embedding_key: {"$exists": True}}
+        count = collection.count_documents(query)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        # Written to a temporary file, then renamed over the old one, which searches may still be reading
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npy"
+        matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(count, self.dimensions))
+        ids = []
+        cursor = collection.find(query, {self.embedding_key: 1}).batch_size(self.batch_size)
+        for document in cursor:
+            vector = document.get(self.embedding_key)
+            if vector is not None:
+                # BSON arrays, or packed float32 after quantized ingestion
+                vector = decode_vector(vector)
+            if len(ids) == count or vector is None or len(vector) != self.dimensions:
+                continue
+            matrix[len(ids)] = vector
+            ids.append(document["_id"])
+        rows = matrix[: len(ids)]
+        rows /= np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+        matrix.flush()
+        del matrix
+
+        if len(ids) < count:
+            # Documents deleted (or without a usable vector) while building: keep only the rows written
+            np.save(tmp_path, np.load(tmp_path)[: len(ids)])
+        os.replace(tmp_path, self.path + ".npy")
+        with open(tmp_path + ".json", "w") as f:
+            json.dump({"version": version, "dimensions": self.dimensions, "ids": [_encode_id(i) for i in ids]}, f)
+        os.replace(tmp_path + ".json", self.path + ".json")
+        self._swap(np.load(self.path + ".npy", mmap_mode="r"), ids, version)
+
+    def _swap(self, matrix, ids, version) -> None:
+        self._state = (matrix, ids, {i: row for row, i in enumerate(ids)})
+        self.version = version
+
+
+def _top_k(scores, k):
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _encode_id(value):
+    return {"$oid": str(value)} if isinstance(value, ObjectId) else value
+
+
+def _decode_id(value):
+    return ObjectId(value["$oid"]) if isinstance(value, dict) and "$oid" in value else value
@@ -0,0 +1,99 @@
+import re
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+# Name fields looked up by the tools, with the normalized copy stored next to each
+NAME_FIELDS = {
+    "companies": {"company_name": "company_name_lower"},
+    "workforce": {"first_name": "first_name_lower", "last_name": "last_name_lower"},
+}
+
+# Prefix lookups on the normalized fields are index range scans. The workforce compound index
+# serves last name and last + first name lookups; first name alone has its own
+NAME_INDEXES = {
+    "companies": [[("company_name_lower", 1)]],
+    "workforce": [[("last_name_lower", 1), ("first_name_lower", 1)], [("first_name_lower", 1)]],
+}
+
+
+def normalize_name(name) -> str:
+    # Python's full Unicode case folding ("Straße" and "STRASSE" both give "strasse"); Mongo's $toLower
+    # only lowercases ASCII, so backfills use this too
+    return str(name).strip().casefold()
+
+
+def add_name_fields(collection_name: str, record: dict) -> dict:
+    """Sets the normalized name fields of a record about to be written to `collection_name`."""
+    for field, normalized in NAME_FIELDS.get(collection_name, {}).items():
+        if isinstance(record.get(field), str):
+            record[normalized] = normalize_name(record[field])
+    return record
+
+
+def name_prefix_query(collection_name: str, field: str, name: str) -> dict:
+    """
+    Case-insensitive "starts with" filter on a name field that can use its index.
+
+    The input is escaped, so it is matched literally rather than as a regex, and the anchored,
+    case-sensitive regex on the lowercase copy gives the planner tight index bounds.
+    """
+    normalized = NAME_FIELDS[collection_name][field]
+    return {normalized: {"$regex": "^" + re.escape(normalize_name(name))}}
+
+
+def fuzzy_name_stage(index_name: str, names: Dict[str, str]) -> dict:
+    """$search stage matching every given name field with up to one typo, for an Atlas Search index."""
+    return {
+        "$search": {
+            "index": index_name,
+            "compound": {
+                "must": [
+                    {"text": {"query": value, "path": field, "fuzzy": {"maxEdits": 1}}}
+                    for field, value in names.items()
+                ]
+            },
+        }
+    }
+
+
+def ensure_name_indexes(db, collection_names: Optional[List[str]] = None, batch_size: int = 1000) -> None:
+    """
+    Backfills the normalized name fields of documents written before they existed, or normalized
+    with plain lowercasing, and creates their indexes. Both steps are idempotent, so ingestion runs
+    them every time.
+    """
+    for collection_name in collection_names or list(NAME_FIELDS):
+        collection = db[collection_name]
+        for field, normalized in NAME_FIELDS[collection_name].items():
+            updates = []
+            # Lowercasing and case folding only differ on non-ASCII names, so only those are rechecked
+            stale = {"$or": [{normalized: {"$exists": False}}, {normalized: {"$regex": "[^\\x00-\\x7f]"}}]}
+            for document in collection.find({**stale, field: {"$type": "string"}}, {field: 1, normalized: 1}):
+                value = normalize_name(document[field])
+                if document.get(normalized) == value:
+                    continue
+                updates.append(UpdateOne({"_id": document["_id"]}, {"$set": {normalized: value}}))
+                if len(updates) == batch_size:
+                    collection.bulk_write(updates, ordered=False)
+                    updates = []
+            if updates:
+                collection.bulk_write(updates, ordered=False)
+        for keys in NAME_INDEXES[collection_name]:
+            collection.create_index(keys)
+
+
+def create_name_search_indexes(db, index_name: str, collection_names: Optional[List[str]] = None) -> None:
+    """Creates the Atlas Search indexes used for fuzzy name matching. Needs an Atlas cluster."""
+    for collection_name in collection_names or list(NAME_FIELDS):
+        definition = {
+            "mappings": {
+                "dynamic": False,
+                "fields": {field: {"type": "string"} for field in NAME_FIELDS[collection_name]},
+            }
+        }
+        try:
+            db[collection_name].create_search_index({"name": index_name, "definition": definition})
+        except OperationFailure as e:
+            print(f"Could not create search index {index_name} on {collection_name}: {e}")
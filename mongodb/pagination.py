@@ -0,0 +1,61 @@
+import base64
+import binascii
+from typing import List, Optional, Tuple
+
+from bson import json_util
+
+# Sort fields each collection can be paged by, with their supporting index. _id breaks ties, so
+# the (sort key, _id) of the last document on a page identifies where the next page starts
+SORT_INDEXES = {
+    "companies": {"company_name": [("company_name", 1), ("_id", 1)]},
+}
+
+
+def sort_index(collection_name: str, sort_by: str) -> List[Tuple[str, int]]:
+    """Index keys supporting `sort_by`; raises ValueError for fields that have none."""
+    indexes = SORT_INDEXES.get(collection_name, {})
+    if sort_by not in indexes:
+        raise ValueError(f"Cannot sort by '{sort_by}'. Sortable fields: {', '.join(indexes)}.")
+    return indexes[sort_by]
+
+
+def encode_cursor(sort_by: str, sort_order: int, document: dict) -> str:
+    """Opaque token for the page after `document`."""
+    payload = {"s": sort_by, "o": sort_order, "v": document.get(sort_by), "id": document["_id"]}
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort_by: str, sort_order: int) -> Tuple[object, object]:
+    """(last sort value, last _id) of a token made by encode_cursor for the same sort; raises ValueError otherwise."""
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        last = payload["v"], payload["id"]
+        same_sort = (payload["s"], payload["o"]) == (sort_by, sort_order)
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor. Start again without a cursor.")
+    if not same_sort:
+        raise ValueError("This cursor belongs to a different sort. Use the same sort_by and sort_order.")
+    return last
+
+
+def keyset_filter(sort_by: str, sort_order: int, cursor: Optional[str]) -> dict:
+    """Filter for the documents after the cursor's position in (sort_by, _id) order; {} for the first page."""
+    if not cursor:
+        return {}
+    value, last_id = decode_cursor(cursor, sort_by, sort_order)
+    after, at_or_after = ("$gt", "$gte") if sort_order == 1 else ("$lt", "$lte")
+    # The top-level range gives the index scan a tight bound on sort_by; the $or only breaks ties
+    return {
+        sort_by: {at_or_after: value},
+        "$or": [{sort_by: {after: value}}, {sort_by: value, "_id": {after: last_id}}],
+    }
+
+
+def keyset_sort(sort_by: str, sort_order: int) -> List[Tuple[str, int]]:
+    return [(sort_by, sort_order), ("_id", sort_order)]
+
+
+def ensure_sort_indexes(db) -> None:
+    for collection_name, indexes in SORT_INDEXES.items():
+        for keys in indexes.values():
+            db[collection_name].create_index(keys)
@@ -0,0 +1,85 @@
+from typing import Iterable, List
+
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype
+from pymongo import UpdateOne
+
+# Quantized copy of each employee's embedding, by quantization, stored as a packed BSON vector and
+# indexed for $vectorSearch instead of `embedding`. `embedding` itself is kept, as packed float32,
+# to rescore the candidates the quantized search returns
+QUANTIZED_FIELDS = {"int8": "embedding_int8", "binary": "embedding_binary"}
+# Atlas compares int1 (binary) vectors by Hamming distance, declared as euclidean similarity
+QUANTIZED_SIMILARITY = {"int8": "cosine", "binary": "euclidean"}
+
+
+def quantize_int8(vectors) -> np.ndarray:
+    """Each vector scaled so its largest component is +-127, then rounded. Keeps cosine similarity close."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scale = 127 / np.maximum(np.abs(vectors).max(axis=-1, keepdims=True), 1e-12)
+    return np.round(vectors * scale).astype(np.int8)
+
+
+def quantize_binary(vectors) -> np.ndarray:
+    """One bit per dimension, set when the component is positive, packed 8 per byte."""
+    return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+
+def quantized_vector(vector, quantization: str) -> Binary:
+    if quantization == "int8":
+        return Binary.from_vector(quantize_int8(vector).tolist(), BinaryVectorDtype.INT8)
+    if quantization == "binary":
+        padding = -len(vector) % 8
+        return Binary.from_vector(quantize_binary(vector).tolist(), BinaryVectorDtype.PACKED_BIT, padding)
+    raise ValueError(f"Unknown quantization '{quantization}'. Use one of: {', '.join(QUANTIZED_FIELDS)}.")
+
+
+def float32_vector(vector) -> Binary:
+    return Binary.from_vector(np.asarray(vector, dtype=np.float32).tolist(), BinaryVectorDtype.FLOAT32)
+
+
+def decode_vector(value) -> np.ndarray:
+    """float32 array of an embedding stored either as a BSON array or as a packed float32 vector."""
+    if isinstance(value, Binary):
+        value = value.as_vector().data
+    return np.asarray(value, dtype=np.float32)
+
+
+def add_quantized_embedding(record: dict, quantization: str) -> dict:
+    """Packs the embedding of a record about to be written as float32 and adds its quantized copy."""
+    vector = decode_vector(record["embedding"])
+    record["embedding"] = float32_vector(vector)
+    record[QUANTIZED_FIELDS[quantization]] = quantized_vector(vector, quantization)
+    return record
+
+
+def rescore(query_vector: Iterable[float], documents: List[dict], k: int, field: str = "embedding") -> List[dict]:
+    """
+    The k documents closest to the query by the full-precision vectors in `field` (removed from the
+    results), scored like Atlas cosine: (1 + cosine) / 2. Documents without one keep their search score.
+    """
+    query = np.asarray(query_vector, dtype=np.float32)
+    query /= np.linalg.norm(query) or 1
+    for document in documents:
+        vector = document.pop(field, None)
+        if vector is not None:
+            vector = decode_vector(vector)
+            document["score"] = float((1 + vector @ query / (np.linalg.norm(vector) or 1)) / 2)
+    return sorted(documents, key=lambda document: document.get("score", 0), reverse=True)[:k]
+
+
+def ensure_quantized_embeddings(collection, quantization: str, batch_size: int = 1000) -> None:
+    """
+    Packs and quantizes the embeddings of documents written without `quantization`, dropping quantized
+    copies of another kind. Idempotent.
+    """
+    field = QUANTIZED_FIELDS[quantization]
+    others = {other: "" for other in QUANTIZED_FIELDS.values() if other != field}
+    updates = []
+    for document in collection.find({"embedding": {"$exists": True}, field: {"$exists": False}}, {"embedding": 1}):
+        record = add_quantized_embedding({"embedding": document["embedding"]}, quantization)
+        updates.append(UpdateOne({"_id": document["_id"]}, {"$set": record, "$unset": others}))
+        if len(updates) == batch_size:
+            collection.bulk_write(updates, ordered=False)
+            updates = []
+    if updates:
+        collection.bulk_write(updates, ordered=False)
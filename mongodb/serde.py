@@ -0,0 +1,90 @@
+import json
+import zlib
+from typing import Any, Optional
+
+from langgraph.serde.jsonplus import JsonPlusSerializer
+
+from mongodb.checkpointer import JsonPlusSerializerCompat
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+# Every blob written by CompressedSerializer starts with MAGIC, a format version and a codec byte.
+# The NUL byte can't start a JSON document, so plain JSON blobs are told apart reliably.
+MAGIC = b"\x00HRC"
+FORMAT_VERSION = 1
+
+CODEC_NONE = b"n"
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+
+
+class CompressedSerializer(JsonPlusSerializer):
+    """
+    JsonPlus checkpoints, compressed above `compress_threshold` bytes.
+
+    A conversation's checkpoint repeats the same message structure turn after turn, so it
+    compresses to a few percent of its JSON size for about a millisecond of zlib. The encoding
+    is JsonPlusSerializer's, so loading a checkpoint never unpickles anything.
+    `compression` is "zstd", "zlib" or None; "zstd" falls back to zlib when the zstandard
+    package isn't installed. Blobs without the MAGIC header (plain JSON written by
+    JsonPlusSerializerCompat) are still loaded, so existing checkpoints keep working.
+    """
+
+    def __init__(self, compression: Optional[str] = "zstd", compress_threshold: int = 1024, level: Optional[int] = None):
+        if compression == "zstd" and zstandard is None:
+            compression = "zlib"
+        if compression not in ("zstd", "zlib", None):
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self.level = level
+        if compression == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level if level is not None else 3)
+
+    def _object_hook(self, value: dict) -> Any:
+        # Only LangChain-encoded objects carry "lc"; every other dict would come back from the reviver unchanged
+        return self._reviver(value) if "lc" in value else value
+
+    def dumps(self, obj: Any) -> bytes:
+        payload = super().dumps(obj)
+        codec = CODEC_NONE
+        if self.compression and len(payload) >= self.compress_threshold:
+            if self.compression == "zstd":
+                payload = self._compressor.compress(payload)
+                codec = CODEC_ZSTD
+            else:
+                payload = zlib.compress(payload, self.level if self.level is not None else 1)
+                codec = CODEC_ZLIB
+        return MAGIC + bytes([FORMAT_VERSION]) + codec + payload
+
+    def loads(self, data: bytes) -> Any:
+        if not data.startswith(MAGIC):
+            return super().loads(data)
+
+        version = data[len(MAGIC)]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported checkpoint format version: {version}")
+        codec = data[len(MAGIC) + 1:len(MAGIC) + 2]
+        payload = data[len(MAGIC) + 2:]
+
+        if codec == CODEC_ZLIB:
+            payload = zlib.decompress(payload)
+        elif codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise ValueError("Checkpoint is zstd-compressed but the zstandard package is not installed")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        elif codec != CODEC_NONE:
+            raise ValueError(f"Unknown checkpoint codec: {codec!r}")
+        return json.loads(payload, object_hook=self._object_hook)
+
+
+def get_serializer(name: str):
+    """Serializer for the CHECKPOINT_SERIALIZER setting: "json" (JsonPlus with pickle fallback) or "compressed"."""
+    if name == "compressed":
+        return CompressedSerializer()
+    if name == "json":
+        return JsonPlusSerializerCompat()
+    raise ValueError(f"Unknown checkpoint serializer: {name}")
@@ -0,0 +1,137 @@
+from typing import List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+from pymongo.operations import SearchIndexModel
+
+# Lowercased copies of the employee fields lookup_employees filters on, kept by ingestion so the
+# agent's "python" or "Paris" match regardless of case. Indexed as filter fields in the vector index
+FILTERS_FIELD = "search_filters"
+EMPLOYEE_FILTER_PATHS = ["department", "nearest_office", "is_remote", "skills", "salary"]
+
+# Atlas accepts at most 10,000 candidates per $vectorSearch
+MAX_NUM_CANDIDATES = 10000
+
+
+def normalize_office(office) -> str:
+    # "Paris Office", "paris" -> "paris"
+    office = str(office).strip().lower()
+    return office[: -len(" office")] if office.endswith(" office") else office
+
+
+def employee_filters(employee: dict) -> dict:
+    job_details = employee.get("job_details") or {}
+    work_location = employee.get("work_location") or {}
+    return {
+        "department": str(job_details.get("department", "")).strip().lower(),
+        "nearest_office": normalize_office(work_location.get("nearest_office", "")),
+        "is_remote": bool(work_location.get("is_remote")),
+        "skills": [str(skill).strip().lower() for skill in employee.get("skills") or []],
+        "salary": job_details.get("salary"),
+    }
+
+
+def add_employee_filters(collection_name: str, record: dict) -> dict:
+    """Sets the vector search filter fields of an employee record about to be written."""
+    if collection_name == "employees":
+        record[FILTERS_FIELD] = employee_filters(record)
+    return record
+
+
+def employee_pre_filter(
+    department: Optional[str] = None,
+    nearest_office: Optional[str] = None,
+    is_remote: Optional[bool] = None,
+    skills: Optional[List[str]] = None,
+    min_salary: Optional[float] = None,
+    max_salary: Optional[float] = None,
+) -> dict:
+    """$vectorSearch filter for the given criteria (all must hold, every skill must be listed); {} for none."""
+    conditions = []
+    if department:
+        conditions.append({f"{FILTERS_FIELD}.department": {"$eq": department.strip().lower()}})
+    if nearest_office:
+        conditions.append({f"{FILTERS_FIELD}.nearest_office": {"$eq": normalize_office(nearest_office)}})
+    if is_remote is not None:
+        conditions.append({f"{FILTERS_FIELD}.is_remote": {"$eq": bool(is_remote)}})
+    for skill in skills or []:
+        # Equality on an array field matches any element; one clause per skill requires them all
+        conditions.append({f"{FILTERS_FIELD}.skills": {"$eq": skill.strip().lower()}})
+    if min_salary is not None:
+        conditions.append({f"{FILTERS_FIELD}.salary": {"$gte": min_salary}})
+    if max_salary is not None:
+        conditions.append({f"{FILTERS_FIELD}.salary": {"$lte": max_salary}})
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def num_candidates(k: int, factor: int, minimum: int = 0) -> int:
+    return min(max(k * factor, minimum, k), MAX_NUM_CANDIDATES)
+
+
+def vector_search_stage(
+    index_name: str,
+    path: str,
+    query_vector: List[float],
+    k: int,
+    candidates: int,
+    pre_filter: Optional[dict] = None,
+) -> dict:
+    search = {"index": index_name, "path": path, "queryVector": query_vector, "numCandidates": candidates, "limit": k}
+    if pre_filter:
+        search["filter"] = pre_filter
+    return {"$vectorSearch": search}
+
+
+def vector_search_pipeline(
+    index_name: str,
+    path: str,
+    query_vector: List[float],
+    k: int,
+    candidates: int,
+    pre_filter: Optional[dict] = None,
+    projection: Optional[dict] = None,
+) -> List[dict]:
+    """$vectorSearch for the k nearest documents matching `pre_filter`, with the score as `score`."""
+    pipeline = [
+        vector_search_stage(index_name, path, query_vector, k, candidates, pre_filter),
+        {"$set": {"score": {"$meta": "vectorSearchScore"}}},
+    ]
+    if projection:
+        pipeline.append({"$project": projection})
+    return pipeline
+
+
+def employee_vector_index_definition(path: str, dimensions: int, similarity: str = "cosine") -> dict:
+    fields = [{"type": "vector", "path": path, "numDimensions": dimensions, "similarity": similarity}]
+    fields += [{"type": "filter", "path": f"{FILTERS_FIELD}.{field}"} for field in EMPLOYEE_FILTER_PATHS]
+    return {"fields": fields}
+
+
+def ensure_search_index(collection, index_name: str, definition: dict, index_type: str = "vectorSearch") -> None:
+    """
+    Creates an Atlas Search ("search") or Vector Search ("vectorSearch") index, or updates it when
+    its definition changed. Needs an Atlas cluster.
+    """
+    try:
+        existing = next(iter(collection.list_search_indexes(index_name)), None)
+        if existing is None:
+            collection.create_search_index(SearchIndexModel(definition, name=index_name, type=index_type))
+        elif existing.get("latestDefinition") != definition:
+            collection.update_search_index(index_name, definition)
+    except OperationFailure as e:
+        print(f"Could not create or update search index {index_name} on {collection.name}: {e}")
+
+
+def ensure_employee_filters(collection, batch_size: int = 1000) -> None:
+    """Sets the filter fields on employees written before they existed. Idempotent."""
+    updates = []
+    projection = {"job_details": 1, "work_location": 1, "skills": 1}
+    for document in collection.find({FILTERS_FIELD: {"$exists": False}}, projection):
+        updates.append(UpdateOne({"_id": document["_id"]}, {"$set": {FILTERS_FIELD: employee_filters(document)}}))
+        if len(updates) == batch_size:
+            collection.bulk_write(updates, ordered=False)
+            updates = []
+    if updates:
+        collection.bulk_write(updates, ordered=False)
@@ -0,0 +1,88 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+
+class TokenStreamer:
+    """
+    Coalesces LLM tokens into fewer, larger frames for a streaming UI.
+
+    Tokens are buffered and sent by `send` (e.g. cl.Message.stream_token) once `window_ms` has
+    passed since the first buffered token, or as soon as the buffer reaches `max_bytes`. Frames
+    are sent one at a time and in order. While a frame is in flight to a slow client, tokens keep
+    coalescing, so frames grow as the client falls behind; once `max_buffer_bytes` are waiting,
+    push() blocks until the client catches up, which slows the producer down instead of
+    buffering without bound. Call flush() before anything that must appear after the text (a
+    tool step, the end of the message).
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[None]],
+        window_ms: float = 50,
+        max_bytes: int = 1024,
+        max_buffer_bytes: int = 16384,
+    ):
+        self.send = send
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self.max_buffer_bytes = max(max_buffer_bytes, max_bytes)
+        self._buffer: List[str] = []
+        self._size = 0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Background sends; the lock keeps frames in order. A queued send hasn't taken the buffer
+        # yet, so tokens pushed meanwhile join its frame and no second send is needed.
+        self._sends: List[asyncio.Task] = []
+        self._queued = 0
+        self.tokens = 0
+        self.frames = 0
+        self.bytes = 0
+
+    async def push(self, token: str) -> None:
+        if not token:
+            return
+        self._buffer.append(token)
+        self._size += len(token.encode())
+        self.tokens += 1
+
+        if self._size >= self.max_buffer_bytes:
+            # The client is too far behind: wait for it
+            await self._send_buffer()
+        elif self._size >= self.max_bytes and not self._lock.locked():
+            self._send_in_background()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._send_in_background)
+
+    async def flush(self) -> None:
+        """Sends everything buffered so far, waiting for frames already in flight."""
+        await self._send_buffer()
+        # Also surfaces errors of frames sent in the background
+        sends, self._sends = self._sends, []
+        await asyncio.gather(*sends)
+
+    def _send_in_background(self) -> None:
+        self._timer = None
+        if self._queued:
+            return
+        self._queued += 1
+        self._sends = [send for send in self._sends if not send.done() or send.exception()]
+        self._sends.append(asyncio.ensure_future(self._send_buffer(queued=True)))
+
+    async def _send_buffer(self, queued: bool = False) -> None:
+        async with self._lock:
+            if queued:
+                self._queued -= 1
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._buffer:
+                return
+            frame = "".join(self._buffer)
+            self._buffer = []
+            self._size = 0
+            await self.send(frame)
+            self.frames += 1
+            self.bytes += len(frame.encode())
+
+    def stats(self):
+        return {"tokens": self.tokens, "frames": self.frames, "bytes": self.bytes}
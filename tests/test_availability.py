@@ -0,0 +1,56 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mongodb.availability import add_availability, availability_intervals, availability_query, parse_time
+
+
+class AvailabilityTest(unittest.TestCase):
+    def test_times_are_minutes_since_midnight(self):
+        self.assertEqual(parse_time("9:00am"), 540)
+        self.assertEqual(parse_time("10am"), 600)
+        self.assertEqual(parse_time("12:00am"), 0)
+        self.assertEqual(parse_time("12:30 PM"), 750)
+        self.assertEqual(parse_time("17:45"), 1065)
+        self.assertEqual(parse_time("noon"), 720)
+        # "10:00am" < "9:00am" as strings, which made the old string comparison wrong
+        self.assertLess(parse_time("9:00am"), parse_time("10:00am"))
+        for text in ("13pm", "9:75am", "tea time"):
+            with self.assertRaises(ValueError):
+                parse_time(text)
+
+    def test_intervals_per_weekday_with_overnight_shifts_split(self):
+        record = {
+            "availability_day": {
+                "Tuesday": {"start": "9:00am", "close": "6:00pm"},
+                "Sunday": {"start": "10:00pm", "close": "6:00am"},
+            }
+        }
+        self.assertEqual(
+            availability_intervals(record),
+            [
+                {"day": 0, "start": 0, "end": 360},
+                {"day": 1, "start": 540, "end": 1080},
+                {"day": 6, "start": 1320, "end": 1440},
+            ],
+        )
+        self.assertNotIn("availability", add_availability("companies", dict(record)))
+        self.assertIn("availability", add_availability("workforce", dict(record)))
+
+    def test_queries_match_one_interval(self):
+        self.assertEqual(
+            availability_query("tue", "10am"),
+            {"availability": {"$elemMatch": {"day": 1, "start": {"$lte": 600}, "end": {"$gte": 601}}}},
+        )
+        self.assertEqual(
+            availability_query(None, "9am", "5pm"),
+            {"availability": {"$elemMatch": {"day": {"$in": list(range(7))}, "start": {"$lte": 540}, "end": {"$gte": 1020}}}},
+        )
+        with self.assertRaises(ValueError):
+            availability_query("Monday", "5pm", "9am")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from mongodb.checkpointer import JsonPlusSerializerCompat, LazyCheckpointTuple, MongoDBSaver, apply_delta, diff_checkpoint
+
+
+def make_checkpoint(id, values, versions):
+    return {
+        "v": 1,
+        "id": id,
+        "ts": "2024-07-01T00:00:00+00:00",
+        "channel_values": values,
+        "channel_versions": versions,
+        "versions_seen": {"chatbot": dict(versions)},
+        "pending_sends": [],
+    }
+
+
+class DeltaCheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.history = [HumanMessage(content="hi"), AIMessage(content="hello")]
+        self.parent = make_checkpoint(
+            "1",
+            {"messages": list(self.history), "sender": "HR_Chatbot", "chatbot": "chatbot"},
+            {"messages": 3, "sender": 3, "chatbot": 3},
+        )
+        self.child = make_checkpoint(
+            "2",
+            {"messages": self.history + [HumanMessage(content="who knows Kubernetes?")], "sender": "HR_Chatbot",
+             "__start__": {"messages": []}},
+            {"messages": 4, "sender": 3, "chatbot": 3, "__start__": 4},
+        )
+
+    def test_growing_list_stores_only_its_tail(self):
+        delta = diff_checkpoint(self.parent, self.child)
+
+        self.assertEqual(delta["channel_changes"]["messages"], {"append": [HumanMessage(content="who knows Kubernetes?")]})
+        self.assertEqual(delta["channel_changes"]["__start__"], {"set": {"messages": []}})
+        self.assertNotIn("sender", delta["channel_changes"])
+        self.assertEqual(delta["channel_removed"], ["chatbot"])
+
+    def test_replaced_list_is_stored_whole(self):
+        child = make_checkpoint("2", {"messages": [AIMessage(content="reset")]}, {"messages": 4})
+        delta = diff_checkpoint(self.parent, child)
+        self.assertEqual(delta["channel_changes"]["messages"], {"set": [AIMessage(content="reset")]})
+
+    def test_round_trip_through_serializer(self):
+        serde = JsonPlusSerializerCompat()
+        delta = serde.loads(serde.dumps(diff_checkpoint(self.parent, self.child)))
+        parent = serde.loads(serde.dumps(self.parent))
+
+        rebuilt = apply_delta(parent, delta)
+
+        self.assertEqual(rebuilt["channel_values"], self.child["channel_values"])
+        self.assertEqual(rebuilt["channel_versions"], self.child["channel_versions"])
+        self.assertEqual(rebuilt["id"], "2")
+        # The parent is left untouched
+        self.assertEqual(len(parent["channel_values"]["messages"]), 2)
+
+
+class LazyCheckpointTupleTest(unittest.TestCase):
+    def test_decodes_each_field_once_on_access(self):
+        calls = []
+        config = {"configurable": {"thread_id": "1", "thread_ts": "2"}}
+
+        def load_checkpoint():
+            calls.append("checkpoint")
+            return make_checkpoint("2", {}, {})
+
+        checkpoint_tuple = LazyCheckpointTuple(config, None, load_checkpoint, lambda: {"step": 1})
+        self.assertEqual(checkpoint_tuple.config, config)
+        self.assertEqual(calls, [])
+
+        config_, checkpoint, metadata, parent_config = checkpoint_tuple
+        self.assertEqual(checkpoint["id"], "2")
+        self.assertIs(checkpoint_tuple[1], checkpoint)
+        self.assertEqual(metadata, {"step": 1})
+        self.assertIsNone(parent_config)
+        self.assertEqual(calls, ["checkpoint"])
+
+
+class FailingCollection:
+    async def insert_one(self, doc):
+        raise ConnectionError("primary stepped down")
+
+    async def find_one(self, query, sort=None):
+        return None
+
+
+class FailingDb(dict):
+    def __missing__(self, name):
+        return FailingCollection()
+
+
+class LatestCheckpointCacheTest(unittest.TestCase):
+    def test_failed_write_is_not_cached(self):
+        saver = MongoDBSaver({"db": FailingDb()}, "db", "checkpoints")
+        config = {"configurable": {"thread_id": "1"}}
+
+        async def scenario():
+            with self.assertRaises(ConnectionError):
+                await saver.aput(config, make_checkpoint("1", {"messages": []}, {"messages": 1}), {"step": 1})
+            return await saver.aget_tuple(config)
+
+        self.assertIsNone(asyncio.run(scenario()))
+        self.assertEqual(saver.cache_hits, 0)
+
+    def test_out_of_order_inserts_keep_the_newest_head(self):
+        # The first checkpoint's insert finishes after the second's
+        collection = MemoryCollection(delays={"1": 0.03})
+        saver = MongoDBSaver({"db": MemoryDb(collection)}, "db", "checkpoints")
+
+        asyncio.run(put_concurrently(saver, conversation(2)))
+        latest = asyncio.run(saver.aget_tuple({"configurable": {"thread_id": "t"}}))
+
+        self.assertEqual([doc["thread_ts"] for doc in collection.docs], ["2", "1"])
+        self.assertEqual(saver.cache_hits, 1)
+        self.assertEqual(latest.config["configurable"]["thread_ts"], "2")
+
+
+
+class MemoryCollection:
+    """Checkpoint collection in memory; inserts of the given thread_ts are slowed down or fail."""
+
+    def __init__(self, delays=None, failing=()):
+        self.docs = []
+        self.delays = delays or {}
+        self.failing = failing
+
+    async def insert_one(self, doc):
+        await asyncio.sleep(self.delays.get(doc["thread_ts"], 0))
+        if doc["thread_ts"] in self.failing:
+            raise ConnectionError("primary stepped down")
+        self.docs.append(dict(doc))
+
+    async def find_one(self, query, projection=None, sort=None):
+        matches = [doc for doc in self.docs if all(doc.get(key) == value for key, value in query.items())]
+        return max(matches, key=lambda doc: doc["thread_ts"]) if matches else None
+
+    async def find(self, query, projection=None):
+        for doc in self.docs:
+            bounds = query["thread_ts"]
+            if doc["thread_id"] == query["thread_id"] and bounds["$gte"] <= doc["thread_ts"] < bounds["$lt"]:
+                yield doc
+
+
+class MemoryDb(dict):
+    def __init__(self, checkpoints):
+        super().__init__(checkpoints=checkpoints)
+
+    def __missing__(self, name):
+        return MemoryCollection()
+
+
+def conversation(turns):
+    # Checkpoints "1".."turns" of one thread, each adding a message
+    messages = []
+    for i in range(1, turns + 1):
+        messages = messages + [HumanMessage(content=f"message {i}")]
+        yield make_checkpoint(str(i), {"messages": messages}, {"messages": i})
+
+
+async def put_concurrently(saver, checkpoints):
+    # Like LangGraph's background saves: one task per checkpoint, each config naming the previous one
+    config = {"configurable": {"thread_id": "t"}}
+    tasks = []
+    for checkpoint in checkpoints:
+        tasks.append(asyncio.create_task(saver.aput(config, checkpoint, {"step": int(checkpoint["id"])})))
+        config = {"configurable": {"thread_id": "t", "thread_ts": checkpoint["id"]}}
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class ConcurrentPutTest(unittest.TestCase):
+    def test_concurrent_puts_still_store_deltas(self):
+        # Earlier inserts are the slow ones, so each parent is still being written when its child arrives
+        collection = MemoryCollection(delays={"1": 0.04, "2": 0.03, "3": 0.02, "4": 0.01})
+        saver = MongoDBSaver({"db": MemoryDb(collection)}, "db", "checkpoints", delta=True, snapshot_interval=10)
+        checkpoints = list(conversation(5))
+
+        asyncio.run(put_concurrently(saver, checkpoints))
+
+        kinds = [doc["kind"] for doc in sorted(collection.docs, key=lambda doc: doc["thread_ts"])]
+        self.assertEqual(kinds, ["snapshot", "delta", "delta", "delta", "delta"])
+        reader = MongoDBSaver({"db": MemoryDb(collection)}, "db", "checkpoints", delta=True)
+        latest = asyncio.run(reader.aget_tuple({"configurable": {"thread_id": "t"}}))
+        self.assertEqual(latest.checkpoint["channel_values"], checkpoints[-1]["channel_values"])
+
+    def test_child_of_a_failed_write_is_stored_as_a_snapshot(self):
+        collection = MemoryCollection(delays={"2": 0.02}, failing={"2"})
+        saver = MongoDBSaver({"db": MemoryDb(collection)}, "db", "checkpoints", delta=True, snapshot_interval=10)
+        checkpoints = list(conversation(3))
+
+        results = asyncio.run(put_concurrently(saver, checkpoints))
+
+        self.assertIsInstance(results[1], ConnectionError)
+        self.assertEqual({doc["thread_ts"]: doc["kind"] for doc in collection.docs}, {"1": "snapshot", "3": "snapshot"})
+        reader = MongoDBSaver({"db": MemoryDb(collection)}, "db", "checkpoints", delta=True)
+        latest = asyncio.run(reader.aget_tuple({"configurable": {"thread_id": "t"}}))
+        self.assertEqual(latest.checkpoint["channel_values"], checkpoints[-1]["channel_values"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+from langgraph.checkpoint import MemorySaver
+
+from context_window import SUMMARY_TAG, ContextWindowManager, estimate_tokens
+from graph import create_workflow
+
+
+def tool_turn(i, output_size=2000):
+    """A turn where the chatbot calls a tool with a bulky result before answering."""
+    return [
+        HumanMessage(content=f"Who knows Kubernetes in office {i}?"),
+        AIMessage(content="", tool_calls=[{"name": "lookup_employees", "args": {"query": f"k8s {i}"}, "id": f"call_{i}"}]),
+        ToolMessage(content="x" * output_size, name="lookup_employees", tool_call_id=f"call_{i}"),
+        AIMessage(content=f"Answer {i}"),
+    ]
+
+
+class FakeSummarizer(Runnable):
+    def __init__(self):
+        self.requests = []
+
+    def invoke(self, messages, config=None, **kwargs):
+        self.requests.append((messages, config))
+        return AIMessage(content=f"summary {len(self.requests)}")
+
+
+class ContextWindowManagerTest(unittest.TestCase):
+    def assert_tool_pairs_consistent(self, messages):
+        calls = {call["id"] for m in messages if isinstance(m, AIMessage) for call in m.tool_calls}
+        results = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+        self.assertEqual(calls, results)
+
+    def test_short_history_is_sent_unchanged(self):
+        manager = ContextWindowManager(token_budget=10000)
+        state = {"messages": tool_turn(0, output_size=100)}
+
+        update = manager.update(state)
+
+        self.assertEqual(manager.prompt_messages(state), state["messages"])
+        self.assertNotIn("summary", update)
+        self.assertEqual(update["context_stats"]["tokens_saved"], 0)
+
+    def test_earlier_tool_results_are_trimmed(self):
+        manager = ContextWindowManager(token_budget=100000, tool_result_tokens=50)
+        messages = tool_turn(0) + tool_turn(1)
+        view = manager.prompt_messages({"messages": messages})
+
+        self.assertLess(estimate_tokens(view[2]), 100)
+        self.assertEqual(view[2].tool_call_id, "call_0")
+        self.assertIn("trimmed", view[2].content)
+        # The current turn keeps its full tool output
+        self.assertEqual(view[6].content, messages[6].content)
+        self.assert_tool_pairs_consistent(view)
+
+    def test_old_turns_are_folded_into_the_summary(self):
+        summarizer = FakeSummarizer()
+        manager = ContextWindowManager(token_budget=600, tool_result_tokens=50, summarizer=summarizer, summary_words=50)
+        messages = [m for i in range(6) for m in tool_turn(i)] + [HumanMessage(content="And in Paris?")]
+        state = {"messages": messages}
+
+        update = manager.update(state)
+        state.update(update)
+        view = manager.prompt_messages(state)
+
+        self.assertEqual(update["summary"], "summary 1")
+        self.assertEqual(update["summarized"] % 4, 0)
+        self.assertIsInstance(view[0], SystemMessage)
+        self.assertIn("summary 1", view[0].content)
+        self.assertIsInstance(view[1], HumanMessage)
+        self.assertLessEqual(sum(estimate_tokens(m) for m in view), 600)
+        self.assert_tool_pairs_consistent(view)
+        self.assertEqual(update["context_stats"]["prompt_tokens"], sum(estimate_tokens(m) for m in view))
+        self.assertGreater(update["context_stats"]["tokens_saved"], 0)
+
+        request, config = summarizer.requests[0]
+        self.assertIn("Who knows Kubernetes in office 0?", request[-1].content)
+        self.assertEqual(config["tags"], [SUMMARY_TAG])
+
+    def test_graph_checkpoints_the_summary_and_bounds_prompts(self):
+        prompt_sizes = []
+
+        def agent(state):
+            prompt_sizes.append(sum(estimate_tokens(m) for m in state["messages"]))
+            return AIMessage(content="y" * 800)
+
+        manager = ContextWindowManager(token_budget=1000, summarizer=FakeSummarizer(), summary_words=50)
+        app = create_workflow(RunnableLambda(agent), [], context_manager=manager).compile(checkpointer=MemorySaver())
+        config = {"configurable": {"thread_id": "1"}}
+
+        async def chat():
+            for turn in range(12):
+                await app.ainvoke({"messages": [HumanMessage(content=f"Question {turn}")]}, config)
+            return (await app.aget_state(config)).values
+
+        values = asyncio.run(chat())
+
+        self.assertEqual(len(values["messages"]), 24)
+        self.assertTrue(values["summary"].startswith("summary"))
+        self.assertGreater(values["summarized"], 0)
+        self.assertLessEqual(max(prompt_sizes), 1000)
+        self.assertEqual(manager.stats()["model_calls"], 12)
+        self.assertGreater(manager.stats()["tokens_saved"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache, FileEmbeddingStore, cache_key
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0]
+
+
+class RecordingStore:
+    """In-memory persistent tier noting the thread of every call."""
+
+    def __init__(self):
+        self.vectors = {}
+        self.threads = []
+
+    def get_many(self, keys):
+        self.threads.append(threading.get_ident())
+        return {key: self.vectors[key] for key in keys if key in self.vectors}
+
+    def put_many(self, items):
+        self.threads.append(threading.get_ident())
+        self.vectors.update(items)
+
+
+class EmbeddingCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "embeddings.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_model_and_dimensions(self):
+        self.assertNotEqual(cache_key("a", "m1", 256), cache_key("a", "m2", 256))
+        self.assertNotEqual(cache_key("a", "m1", 256), cache_key("a", "m1", 512))
+        self.assertEqual(cache_key("a", "m1", 256), cache_key("a", "m1", 256))
+
+    def test_lru_tier_evicts_least_recently_used(self):
+        cache = EmbeddingCache(max_entries=2)
+        cache.put("a", [1.0])
+        cache.put("b", [2.0])
+        cache.get("a")
+        cache.put("c", [3.0])
+
+        self.assertEqual(cache.get_many(["a", "b", "c"]), [[1.0], None, [3.0]])
+        self.assertEqual(cache.stats()["memory_hits"], 3)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_file_store_survives_restart(self):
+        store = FileEmbeddingStore(self.path)
+        EmbeddingCache(store=store).put("who knows Kubernetes", [0.5, 0.25])
+        store.close()
+
+        cache = EmbeddingCache(store=FileEmbeddingStore(self.path))
+        self.assertEqual(cache.get("who knows Kubernetes"), [0.5, 0.25])
+        self.assertEqual(cache.stats()["store_hits"], 1)
+        # Promoted to the in-process tier
+        cache.get("who knows Kubernetes")
+        self.assertEqual(cache.stats()["memory_hits"], 1)
+
+    def test_store_hits_match_the_computed_vector(self):
+        vector = [0.1, -0.0123456789012345, 1 / 3]
+        EmbeddingCache(store=FileEmbeddingStore(self.path)).put("python", vector)
+
+        self.assertEqual(EmbeddingCache(store=FileEmbeddingStore(self.path)).get("python"), vector)
+
+    def test_file_store_evicts_by_size(self):
+        # Each 4-float vector packs to 32 bytes
+        store = FileEmbeddingStore(self.path, max_bytes=80)
+        store.put_many({"a": [1.0] * 4})
+        store.put_many({"b": [2.0] * 4})
+        store.put_many({"c": [3.0] * 4})
+
+        self.assertEqual(set(store.get_many(["a", "b", "c"])), {"b", "c"})
+
+    def test_file_store_reads_are_not_writes_but_count_for_eviction(self):
+        store = FileEmbeddingStore(self.path, max_bytes=80)
+        store.put_many({"a": [1.0] * 4})
+        store.put_many({"b": [2.0] * 4})
+        last_used = "SELECT last_used FROM embeddings WHERE key = 'a'"
+        before = store._conn.execute(last_used).fetchone()
+        store.get_many(["a"])
+        self.assertEqual(store._conn.execute(last_used).fetchone(), before)
+
+        store.put_many({"c": [3.0] * 4})
+        self.assertEqual(set(store.get_many(["a", "b", "c"])), {"a", "c"})
+
+    def test_cached_embeddings_skip_underlying_model(self):
+        underlying = CountingEmbeddings()
+        embeddings = CachedEmbeddings(underlying, EmbeddingCache())
+
+        first = embeddings.embed_query("who knows Kubernetes")
+        second = embeddings.embed_query("who knows Kubernetes")
+        documents = embeddings.embed_documents(["who knows Kubernetes", "python"])
+
+        self.assertEqual(first, second)
+        self.assertEqual(documents[0], first)
+        self.assertEqual(underlying.calls, 2)
+
+    def test_async_embeddings_use_the_store_off_the_event_loop(self):
+        store = RecordingStore()
+        embeddings = CachedEmbeddings(CountingEmbeddings(), EmbeddingCache(store=store))
+
+        async def run():
+            await embeddings.aembed_query("who knows Kubernetes")
+            await embeddings.aembed_documents(["python", "who knows Kubernetes"])
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+        self.assertEqual(len(store.threads), 4)
+        self.assertNotIn(loop_thread, store.threads)
+        self.assertIn(cache_key("python"), store.vectors)
+
+
+if __name__ == "__main__":
+    unittest.main()
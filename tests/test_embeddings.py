@@ -0,0 +1,115 @@
+import asyncio
+import json
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import openai
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from embedding_cache import EmbeddingCache
+from embeddings import aget_embeddings
+
+
+class FakeEmbeddingsHandler(BaseHTTPRequestHandler):
+    """Mimics POST /v1/embeddings: the vector for each input is [len(text), index]."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.requests.append(body["input"])
+            throttle = server.throttle > 0
+            if throttle:
+                server.throttle -= 1
+
+        if throttle:
+            payload = json.dumps({"error": {"message": "Rate limit reached", "type": "requests"}}).encode()
+            self.send_response(429)
+            self.send_header("retry-after", "0")
+        else:
+            data = [
+                {"object": "embedding", "index": i, "embedding": [float(len(text)), float(i)]}
+                for i, text in enumerate(body["input"])
+            ]
+            # Return items out of order to make sure callers rely on "index"
+            data.reverse()
+            tokens = sum(len(text.split()) for text in body["input"])
+            payload = json.dumps({
+                "object": "list",
+                "data": data,
+                "model": body["model"],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class BatchedEmbeddingTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeEmbeddingsHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.throttle = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def embed(self, texts, **kwargs):
+        client = openai.AsyncOpenAI(base_url=self.base_url, api_key="test", max_retries=0)
+        return asyncio.run(aget_embeddings(texts, client=client, progress=False, **kwargs))
+
+    def test_batches_and_preserves_order(self):
+        texts = ["x" * n for n in range(1, 24)]
+        embeddings = self.embed(texts, batch_size=5, concurrency=3)
+
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertTrue(all(len(batch) <= 5 for batch in self.server.requests))
+        self.assertEqual([e[0] for e in embeddings], [float(len(t)) for t in texts])
+
+    def test_invalid_texts_are_skipped(self):
+        embeddings = self.embed(["alpha", "", None, "beta"], batch_size=10)
+
+        self.assertEqual(self.server.requests, [["alpha", "beta"]])
+        self.assertEqual(embeddings[0], [5.0, 0.0])
+        self.assertIsNone(embeddings[1])
+        self.assertIsNone(embeddings[2])
+        self.assertEqual(embeddings[3], [4.0, 1.0])
+
+    def test_retries_after_rate_limit(self):
+        self.server.throttle = 2
+        embeddings = self.embed(["a", "bb", "ccc"], batch_size=3, concurrency=1)
+
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual([e[0] for e in embeddings], [1.0, 2.0, 3.0])
+
+    def test_gives_up_after_max_retries(self):
+        self.server.throttle = 10
+        embeddings = self.embed(["a", "bb"], batch_size=1, concurrency=1, max_retries=1)
+
+        self.assertEqual(embeddings, [None, None])
+
+    def test_cached_texts_skip_the_api(self):
+        cache = EmbeddingCache()
+        self.embed(["a", "bb"], cache=cache)
+        embeddings = self.embed(["a", "bb", "ccc"], cache=cache)
+
+        self.assertEqual(self.server.requests, [["a", "bb"], ["ccc"]])
+        self.assertEqual([e[0] for e in embeddings], [1.0, 2.0, 3.0])
+        self.assertEqual(cache.stats()["hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import sys
+import threading
+import types
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+EMPLOYEES = [
+    {"_id": i, "employee_id": f"E{i}", "first_name": f"P{i}", "last_name": "X", "skills": ["Python"]} for i in range(5)
+]
+# Set when the full-text search reaches the server
+text_search_started = threading.Event()
+# Whether each local index search ran while the full-text search was in flight
+overlapped = []
+
+
+class FakeCursor(list):
+    async def to_list(self, length=None):
+        return list(self)
+
+
+class FakeCollection:
+    """The employees collection: find() by _id, aggregate() answers the full-text search."""
+
+    def __init__(self, text_results):
+        self.text_results = text_results
+
+    def find(self, query, projection=None, **kwargs):
+        ids = query.get("_id", {}).get("$in")
+        return FakeCursor(dict(d) for d in EMPLOYEES if ids is None or d["_id"] in ids)
+
+    def aggregate(self, pipeline, **kwargs):
+        text_search_started.set()
+        return FakeCursor(dict(d) for d in self.text_results)
+
+
+class FakeAsyncCollection(FakeCollection):
+    async def aggregate(self, pipeline, **kwargs):
+        text_search_started.set()
+        return FakeCursor(dict(d) for d in self.text_results)
+
+
+class FakeDb(dict):
+    def __missing__(self, name):
+        return FakeCollection([])
+
+
+class FakeLocalIndex:
+    def refresh(self, force=False):
+        pass
+
+    def search(self, query_vector, k, allowed_ids=None):
+        overlapped.append(text_search_started.wait(1))
+        return [(0, 0.9), (1, 0.8)][:k]
+
+
+def setUpModule():
+    # tools.mongodb_tools connects through db_utils at import; give it in-memory collections instead
+    global tools
+    text_results = [{"employee_id": "E3", "score": 2.0}, {"employee_id": "E1", "score": 1.0}]
+    db_utils = types.ModuleType("db_utils")
+    db_utils.db = FakeDb(employees=FakeCollection(text_results))
+    db_utils.async_db = FakeDb(employees=FakeAsyncCollection(text_results))
+    db_utils.companies_collection = db_utils.workforce_collection = None
+    db_utils.async_companies_collection = db_utils.async_workforce_collection = None
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    sys.modules["db_utils"] = db_utils
+    try:
+        from tools import mongodb_tools as tools
+    finally:
+        # Later imports get the real modules
+        sys.modules.pop("db_utils")
+        sys.modules.pop("tools.mongodb_tools", None)
+
+
+class LocalHybridSearchTest(unittest.TestCase):
+    def search(self, search):
+        queries = []
+        text_search_started.clear()
+        overlapped.clear()
+
+        def text_search_pipeline(index, query, k, pre_filter):
+            queries.append(query)
+            return [{"$limit": k}]
+
+        with patch.object(tools, "text_search_pipeline", text_search_pipeline), \
+                patch.object(tools, "get_local_employee_index", FakeLocalIndex):
+            results = search("kubernetes", [1.0, 0.0], 3, mode="hybrid", vector_index="local")
+        return queries, results
+
+    def test_full_text_search_gets_the_user_query_and_runs_alongside_the_index(self):
+        for search in (tools.search_employees, lambda *a, **kw: asyncio.run(tools.asearch_employees(*a, **kw))):
+            queries, results = self.search(search)
+
+            self.assertEqual(queries, ["kubernetes"])
+            self.assertEqual(overlapped, [True])
+            # E1 is found by both the local vector index and the full-text search
+            self.assertEqual([employee["employee_id"] for employee in results], ["E1", "E0", "E3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
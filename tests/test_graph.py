@@ -0,0 +1,50 @@
+import asyncio
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import Runnable
+
+from graph import create_workflow
+
+
+class RecordingAgent(Runnable):
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, state, config=None, **kwargs):
+        self.calls.append(("invoke", threading.current_thread() is threading.main_thread()))
+        return AIMessage(content="sync")
+
+    async def ainvoke(self, state, config=None, **kwargs):
+        self.calls.append(("ainvoke", threading.current_thread() is threading.main_thread()))
+        await asyncio.sleep(0)
+        return AIMessage(content="async")
+
+
+class WorkflowTest(unittest.TestCase):
+    def test_async_runs_await_the_agent_on_the_event_loop(self):
+        agent = RecordingAgent()
+        graph = create_workflow(agent, []).compile()
+
+        result = asyncio.run(graph.ainvoke({"messages": [HumanMessage(content="hi")]}))
+
+        self.assertEqual(agent.calls, [("ainvoke", True)])
+        self.assertEqual(result["messages"][-1].content, "async")
+        self.assertEqual(result["messages"][-1].name, "HR_Chatbot")
+        self.assertEqual(result["sender"], "HR_Chatbot")
+
+    def test_sync_runs_still_work(self):
+        agent = RecordingAgent()
+        result = create_workflow(agent, []).compile().invoke({"messages": [HumanMessage(content="hi")]})
+
+        self.assertEqual([call[0] for call in agent.calls], ["invoke"])
+        self.assertEqual(result["messages"][-1].content, "sync")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mongodb.hybrid_search import rank_fusion_pipeline, reciprocal_rank_fusion, text_search_pipeline
+
+
+def ranked(*ids):
+    return [{"employee_id": employee_id, "score": 0.5} for employee_id in ids]
+
+
+class HybridSearchTest(unittest.TestCase):
+    def test_documents_found_by_both_searches_rank_first(self):
+        fused = reciprocal_rank_fusion(
+            {"vector": ranked("E1", "E2", "E3"), "text": ranked("E9", "E3")}, "employee_id", limit=3
+        )
+
+        self.assertEqual([doc["employee_id"] for doc in fused], ["E3", "E1", "E9"])
+        self.assertAlmostEqual(fused[0]["score"], 1 / 63 + 1 / 62)
+        self.assertAlmostEqual(fused[1]["score"], 1 / 61)
+
+    def test_weights_favour_one_search(self):
+        fused = reciprocal_rank_fusion(
+            {"vector": ranked("E1"), "text": ranked("E2")}, "employee_id", weights={"vector": 1, "text": 2}
+        )
+        self.assertEqual([doc["employee_id"] for doc in fused], ["E2", "E1"])
+
+    def test_text_search_applies_the_vector_pre_filter(self):
+        pipeline = text_search_pipeline("employee_text", "Django", 5, {"search_filters.department": {"$eq": "it"}})
+
+        self.assertEqual(pipeline[0]["$search"]["text"]["query"], "Django")
+        self.assertEqual(pipeline[1:], [{"$match": {"search_filters.department": {"$eq": "it"}}}, {"$limit": 5}])
+
+    def test_rank_fusion_runs_every_pipeline_in_one_aggregation(self):
+        pipelines = {"vector": [{"$vectorSearch": {}}], "text": [{"$search": {}}, {"$limit": 5}]}
+        pipeline = rank_fusion_pipeline(pipelines, {"vector": 1.0}, 5, {"_id": 0})
+
+        fusion = pipeline[0]["$rankFusion"]
+        self.assertEqual(fusion["input"]["pipelines"], pipelines)
+        self.assertEqual(fusion["combination"]["weights"], {"vector": 1.0, "text": 1})
+        self.assertEqual(pipeline[1:], [{"$limit": 5}, {"$set": {"score": {"$meta": "score"}}}, {"$project": {"_id": 0}}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from data.ingestion import JsonArrayReader, content_hash
+
+
+class JsonArrayReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text):
+        path = os.path.join(self.tmp.name, "export.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_matches_json_load_for_any_block_size(self):
+        path = str(ROOT / "data" / "employees.json")
+        with open(path) as f:
+            expected = json.load(f)
+        for read_size in (1, 17, 4096):
+            self.assertEqual(list(JsonArrayReader(path, read_size=read_size)), expected)
+
+    def test_resumes_from_offset(self):
+        records = [{"name": "Zoë", "pay": "£38"}, 12345, [1, 2], "last"]
+        path = self.write(json.dumps(records, ensure_ascii=False, indent=2))
+
+        reader = JsonArrayReader(path, read_size=3)
+        iterator = iter(reader)
+        head = [next(iterator), next(iterator)]
+        resumed = list(JsonArrayReader(path, start=reader.offset, read_size=3))
+
+        self.assertEqual(head + resumed, records)
+
+    def test_empty_and_invalid_arrays(self):
+        self.assertEqual(list(JsonArrayReader(self.write(" [ ] "))), [])
+        with self.assertRaises(ValueError):
+            list(JsonArrayReader(self.write('{"not": "an array"}')))
+        with self.assertRaises(ValueError):
+            list(JsonArrayReader(self.write('[1, 2')))
+
+
+class ContentHashTest(unittest.TestCase):
+    def test_ignores_key_order_and_derived_fields(self):
+        record = {"employee_id": "E1", "skills": ["SQL"]}
+        derived = {"skills": ["SQL"], "employee_id": "E1", "embedding": [0.1], "content_hash": "x", "embedding_int8": b""}
+        self.assertEqual(content_hash(record), content_hash(derived))
+        self.assertNotEqual(content_hash(record), content_hash({**record, "skills": ["Go"]}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -139,3 +139,425 @@ def test_employee_record_crud(db):
     # Delete
     employees.delete_one({"_id": emp_id})
     assert employees.find_one({"_id": emp_id}) is None
+
+
+def test_mongo_embedding_store_evicts_least_recently_used(db):
+    """MongoEmbeddingStore keeps float64 vectors and drops the entries read or written least recently."""
+    import time
+
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    embedding_cache = pytest.importorskip("embedding_cache")
+
+    # Room for two 4-float vectors
+    store = embedding_cache.MongoEmbeddingStore(db, "embedding_cache_lru", max_bytes=64)
+    store.put_many({"a": [0.1, 0.2, 0.3, 1 / 3]})
+    time.sleep(0.01)
+    store.put_many({"b": [2.0] * 4})
+    time.sleep(0.01)
+    assert store.get_many(["a"]) == {"a": [0.1, 0.2, 0.3, 1 / 3]}
+    time.sleep(0.01)
+    store.put_many({"c": [3.0] * 4})
+
+    assert set(store.get_many(["a", "b", "c"])) == {"a", "c"}
+    store.collection.drop()
+
+
+def test_ingestion_sync_is_idempotent(db):
+    """data/ingestion.py --sync: re-running upserts nothing and only changed records are prepared."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    ingestion = pytest.importorskip("data.ingestion")
+    companies = db["companies_sync"]
+
+    records = [
+        {"company_name": f"Company {i}", "pay": "£20 per hour", "description": "Test"}
+        for i in range(5)
+    ]
+
+    first = ingestion.sync_collection(companies, [dict(r) for r in records], "company_name", chunk_size=2)
+    assert first == {"unchanged": 0, "inserted": 5, "updated": 0}
+
+    second = ingestion.sync_collection(companies, [dict(r) for r in records], "company_name", chunk_size=2)
+    assert second == {"unchanged": 5, "inserted": 0, "updated": 0}
+    assert companies.count_documents({}) == 5
+
+    records[3]["pay"] = "£25 per hour"
+    prepared = []
+    third = ingestion.sync_collection(
+        companies, [dict(r) for r in records], "company_name", prepare=prepared.extend
+    )
+    assert third == {"unchanged": 4, "inserted": 0, "updated": 1}
+    assert [r["company_name"] for r in prepared] == ["Company 3"]
+    assert companies.find_one({"company_name": "Company 3"})["pay"] == "£25 per hour"
+
+    companies.drop()
+
+
+def test_name_lookups_use_the_normalized_index(db):
+    """Name fields are backfilled and prefix lookups on them are index scans, with the input matched literally."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    name_search = pytest.importorskip("mongodb.name_search")
+    workforce = db["workforce"]
+    workforce.insert_many([
+        {"first_name": " Ann ", "last_name": "Lee"},
+        {"first_name": "Annabel", "last_name": "Lee"},
+        {"first_name": "A.nn", "last_name": "Ng"},
+        {"first_name": "ÉLODIE", "last_name": "Öz"},
+        name_search.add_name_fields("workforce", {"first_name": "Bob", "last_name": "Lee-Smith"}),
+    ])
+
+    name_search.ensure_name_indexes(db, ["workforce"])
+    name_search.ensure_name_indexes(db, ["workforce"])
+    assert workforce.count_documents({"first_name_lower": {"$exists": False}}) == 0
+    assert workforce.find_one({"first_name": " Ann "})["first_name_lower"] == "ann"
+    # Backfilled like new records, including non-ASCII letters that $toLower would leave as they are
+    assert workforce.find_one({"first_name": "ÉLODIE"})["first_name_lower"] == "élodie"
+    assert [doc["first_name"] for doc in workforce.find(name_search.name_prefix_query("workforce", "first_name", "élo"))] == ["ÉLODIE"]
+
+    query = name_search.name_prefix_query("workforce", "first_name", "ANN")
+    assert sorted(doc["first_name"] for doc in workforce.find(query)) == [" Ann ", "Annabel"]
+    assert "IXSCAN" in str(workforce.find(query).explain()["queryPlanner"]["winningPlan"])
+
+    query = {**name_search.name_prefix_query("workforce", "last_name", "lee"),
+             **name_search.name_prefix_query("workforce", "first_name", "b")}
+    assert [doc["first_name"] for doc in workforce.find(query)] == ["Bob"]
+    assert "IXSCAN" in str(workforce.find(query).explain()["queryPlanner"]["winningPlan"])
+
+    literal = name_search.name_prefix_query("workforce", "first_name", "a.")
+    assert [doc["first_name"] for doc in workforce.find(literal)] == ["A.nn"]
+    workforce.drop()
+
+
+def test_availability_queries_use_the_interval_index(db):
+    """Availability is backfilled as minute intervals and day/time queries are index scans."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    availability = pytest.importorskip("mongodb.availability")
+    workforce = db["workforce"]
+    nine_to_six = {"start": "9:00am", "close": "6:00pm"}
+    workforce.insert_many([
+        {"email": "weekdays@x", "availability_day": {day: nine_to_six for day in availability.DAYS[:5]}},
+        {"email": "late@x", "availability_day": {"Saturday": {"start": "10:00am", "close": "11:00pm"}}},
+    ])
+
+    availability.ensure_availability_index(db)
+    availability.ensure_availability_index(db)
+    assert workforce.count_documents({"availability": {"$exists": False}}) == 0
+
+    def emails(query):
+        return sorted(doc["email"] for doc in workforce.find(query))
+
+    assert emails(availability.availability_query("Monday", "10:00am")) == ["weekdays@x"]
+    assert emails(availability.availability_query("Monday", "6:00pm")) == []
+    assert emails(availability.availability_query(None, "10:30pm")) == ["late@x"]
+    assert emails(availability.availability_query("Saturday", "10:00am", "11:00pm")) == ["late@x"]
+    query = availability.availability_query("Saturday", "9:00am", "5:00pm")
+    assert emails(query) == []
+    assert "IXSCAN" in str(workforce.find(query).explain()["queryPlanner"]["winningPlan"])
+    workforce.drop()
+
+
+def test_keyset_pages_cover_every_company_once(db):
+    """list_companies' keyset pages walk the sort index, ties included, without a blocking sort."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    pagination = pytest.importorskip("mongodb.pagination")
+    companies = db["companies"]
+    companies.insert_many([{"company_name": f"Company {i // 2:02d}"} for i in range(25)])
+    pagination.ensure_sort_indexes(db)
+
+    for order in (1, -1):
+        seen, cursor = [], None
+        while True:
+            query = pagination.keyset_filter("company_name", order, cursor)
+            find = companies.find(query).sort(pagination.keyset_sort("company_name", order))
+            find = find.hint(pagination.sort_index("companies", "company_name"))
+            page = list(find.limit(4))
+            if not page:
+                break
+            seen += page
+            cursor = pagination.encode_cursor("company_name", order, page[-1])
+
+        assert len({doc["_id"] for doc in seen}) == 25
+        assert [doc["company_name"] for doc in seen] == sorted((doc["company_name"] for doc in seen), reverse=order == -1)
+        plan = str(find.explain()["queryPlanner"]["winningPlan"])
+        assert "IXSCAN" in plan and "'SORT'" not in plan
+    companies.drop()
+
+
+def test_local_vector_index_follows_ingestion_versions(db, tmp_path):
+    """The in-process index is built from the collection, reopened from disk, and rebuilt after a version bump."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    local_index = pytest.importorskip("mongodb.local_index")
+    employees = db["local_index_employees"]
+    employees.insert_many([{"employee_id": f"E{i}", "embedding": [1.0, float(i), 0.0]} for i in range(20)])
+    local_index.bump_version(db, employees.name)
+
+    index = local_index.LocalVectorIndex(db, employees.name, str(tmp_path / "vectors"), 3, refresh_interval=0)
+    index.refresh()
+    nearest = employees.find_one({"_id": index.search([1.0, 19.0, 0.0], 1)[0][0]})
+    assert nearest["employee_id"] == "E19"
+
+    employees.insert_one({"employee_id": "E99", "embedding": [0.0, 0.0, 1.0]})
+    index.refresh()
+    assert len(index) == 20
+    local_index.bump_version(db, employees.name)
+    reopened = local_index.LocalVectorIndex(db, employees.name, str(tmp_path / "vectors"), 3, refresh_interval=0)
+    reopened.refresh()
+    top_id, score = reopened.search([0.0, 0.0, 1.0], 1)[0]
+    assert len(reopened) == 21 and employees.find_one({"_id": top_id})["employee_id"] == "E99"
+    assert score == pytest.approx(1.0)
+    employees.drop()
+    db[local_index.VERSIONS_COLLECTION].drop()
+
+
+def test_quantized_embeddings_backfill_and_switch(db, tmp_path):
+    """Float-array embeddings are packed and quantized in place; switching kinds replaces the quantized copy."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    quantization = pytest.importorskip("mongodb.quantization")
+    local_index = pytest.importorskip("mongodb.local_index")
+    from bson.binary import BinaryVectorDtype
+    employees = db["quantized_employees"]
+    employees.insert_many([{"employee_id": f"E{i}", "embedding": [0.5, -0.25 * i, 0.125]} for i in range(10)])
+
+    quantization.ensure_quantized_embeddings(employees, "int8", batch_size=3)
+    document = employees.find_one({"employee_id": "E2"})
+    assert document["embedding"].as_vector().dtype == BinaryVectorDtype.FLOAT32
+    assert document["embedding"].as_vector().data == [0.5, -0.5, 0.125]
+    assert document["embedding_int8"].as_vector().data == [127, -127, 32]
+
+    quantization.ensure_quantized_embeddings(employees, "binary")
+    document = employees.find_one({"employee_id": "E2"})
+    assert "embedding_int8" not in document
+    assert document["embedding_binary"].as_vector().data == [0b10100000]
+    assert employees.count_documents({"embedding_binary": {"$exists": True}}) == 10
+
+    # The local index reads the packed full-precision vectors
+    index = local_index.LocalVectorIndex(db, employees.name, str(tmp_path / "vectors"), 3, refresh_interval=0)
+    index.refresh()
+    assert len(index) == 10
+    assert employees.find_one({"_id": index.search([0.5, -2.25, 0.125], 1)[0][0]})["employee_id"] == "E9"
+    employees.drop()
+
+
+def test_ingestion_stream_resumes_after_failure(db, tmp_path):
+    """data/ingestion.py --stream: a failed run resumes from its last committed chunk."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    ingestion = pytest.importorskip("data.ingestion")
+    import json
+
+    export = tmp_path / "companies.json"
+    export.write_text(json.dumps([{"company_name": f"Company {i}", "pay": "£20"} for i in range(7)]))
+
+    prepared = []
+
+    def fail_on_second_chunk(records):
+        prepared.append([r["company_name"] for r in records])
+        if len(prepared) == 2:
+            raise RuntimeError("embedding API down")
+
+    with pytest.raises(RuntimeError):
+        ingestion.stream_collection(db, str(export), "companies", prepare=fail_on_second_chunk, chunk_size=3)
+    assert db["companies"].count_documents({}) == 3
+    assert db[ingestion.progress_collection_name].find_one({"_id": "companies"})["offset"] > 0
+
+    prepared.clear()
+    stats = ingestion.stream_collection(db, str(export), "companies", prepare=prepared.extend,
+                                        chunk_size=3, resume=True)
+    assert stats == {"unchanged": 0, "inserted": 4, "updated": 0}
+    assert prepared[0]["company_name"] == "Company 3"
+    assert db["companies"].count_documents({}) == 7
+    assert db[ingestion.progress_collection_name].find_one({"_id": "companies"}) is None
+
+    db["companies"].drop()
+
+
+async def _chat(saver, turns):
+    """Drives the HR chatbot graph with a canned agent for a number of turns."""
+    graph_mod = pytest.importorskip("graph")
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langchain_core.runnables import RunnableLambda
+
+    agent = RunnableLambda(lambda state: AIMessage(content=f"Answer {len(state['messages'])}"))
+    app = graph_mod.create_workflow(agent, []).compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": f"thread_{ObjectId()}"}}
+
+    for turn in range(turns):
+        await app.ainvoke({"messages": [HumanMessage(content=f"Question {turn}")]}, config)
+    return (await app.aget_state(config)).values, [t async for t in saver.alist(config)]
+
+
+def test_delta_checkpoints_rebuild_full_state(db):
+    """MongoDBSaver(delta=True) stores deltas between snapshots and replays them on read."""
+    import asyncio
+
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    checkpointer = pytest.importorskip("mongodb.checkpointer")
+    from pymongo import AsyncMongoClient
+
+    async def scenario():
+        # AsyncMongoClient is bound to the event loop it is first used on
+        client = AsyncMongoClient(MONGODB_URI, serverSelectionTimeoutMS=2000)
+        full = await _chat(checkpointer.MongoDBSaver(client, TEST_DB, "checkpoints_full"), 8)
+        saver = checkpointer.MongoDBSaver(client, TEST_DB, "checkpoints_delta", delta=True, snapshot_interval=5)
+        return full, await _chat(saver, 8)
+
+    (full_values, full_history), (delta_values, delta_history) = asyncio.run(scenario())
+
+    assert len(delta_values["messages"]) == 16
+    assert delta_values == full_values
+    assert [t.checkpoint["channel_values"] for t in delta_history] == [
+        t.checkpoint["channel_values"] for t in full_history
+    ]
+
+    kinds = [doc["kind"] for doc in db["checkpoints_delta"].find().sort("thread_ts", 1)]
+    assert kinds.count("snapshot") == -(-len(kinds) // 5)
+    full_bytes = sum(len(doc["checkpoint"]) for doc in db["checkpoints_full"].find())
+    delta_bytes = sum(len(doc["checkpoint"]) for doc in db["checkpoints_delta"].find())
+    assert delta_bytes < full_bytes
+
+
+def test_checkpoint_indexes_and_retention(db):
+    """MongoDBSaver.setup() creates indexes and compact() applies keep_last and thread_ttl."""
+    import asyncio
+    from datetime import datetime, timedelta, timezone
+
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    checkpointer = pytest.importorskip("mongodb.checkpointer")
+    from pymongo import AsyncMongoClient
+
+    collection = db["checkpoints_retention"]
+
+    async def scenario():
+        client = AsyncMongoClient(MONGODB_URI, serverSelectionTimeoutMS=2000)
+        saver = checkpointer.MongoDBSaver(
+            client, TEST_DB, "checkpoints_retention", delta=True, snapshot_interval=10,
+            keep_last=4, thread_ttl=timedelta(days=30),
+        )
+        await saver.setup()
+        assert "thread_id_thread_ts" in collection.index_information()
+
+        values, history = await _chat(saver, 5)
+        thread_id = history[0].config["configurable"]["thread_id"]
+        _, abandoned_history = await _chat(saver, 1)
+        abandoned = abandoned_history[0].config["configurable"]["thread_id"]
+        assert db["checkpoints_retention_threads"].count_documents({}) == 2
+        db["checkpoints_retention_threads"].update_one(
+            {"_id": abandoned},
+            {"$set": {"last_write": datetime.now(timezone.utc) - timedelta(days=31)}},
+        )
+
+        stats = await saver.compact()
+        # Trimmed threads are not looked at again until they are written to
+        again = await saver.compact()
+        latest = await saver.aget_tuple({"configurable": {"thread_id": thread_id}})
+        return values, thread_id, abandoned, stats, again, latest
+
+    values, thread_id, abandoned, stats, again, latest = asyncio.run(scenario())
+
+    assert stats["threads_expired"] == 1
+    assert collection.count_documents({"thread_id": abandoned}) == 0
+    assert db["checkpoints_retention_threads"].count_documents({"_id": abandoned}) == 0
+    assert db["checkpoints_retention_threads"].count_documents({"untrimmed": True}) == 0
+    assert again == {"threads_expired": 0, "checkpoints_deleted": 0}
+
+    kept = list(collection.find({"thread_id": thread_id}).sort("thread_ts", 1))
+    assert len(kept) == 4
+    assert kept[0]["kind"] == "snapshot"
+    assert latest.checkpoint["channel_values"]["messages"] == values["messages"]
+
+
+def test_write_behind_checkpoints_flush_in_one_batch(db):
+    """MongoDBSaver(write_behind="run") buffers a run's checkpoints until aflush()."""
+    import asyncio
+
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    checkpointer = pytest.importorskip("mongodb.checkpointer")
+    from pymongo import AsyncMongoClient
+
+    collection = db["checkpoints_write_behind"]
+
+    async def scenario():
+        client = AsyncMongoClient(MONGODB_URI, serverSelectionTimeoutMS=2000)
+        saver = checkpointer.MongoDBSaver(client, TEST_DB, "checkpoints_write_behind", delta=True, write_behind="run")
+
+        values, history = await _chat(saver, 3)
+        assert collection.count_documents({}) == 0
+        assert len(values["messages"]) == 6
+        assert len(history) == 9
+
+        assert await saver.aflush() == 9
+        assert collection.count_documents({}) == 9
+
+        reader = checkpointer.MongoDBSaver(client, TEST_DB, "checkpoints_write_behind", delta=True)
+        thread = {"configurable": {"thread_id": history[0].config["configurable"]["thread_id"]}}
+        latest = await reader.aget_tuple(thread)
+        assert latest.checkpoint["channel_values"]["messages"] == values["messages"]
+
+    asyncio.run(scenario())
+
+
+def test_latest_checkpoint_cache_and_version_validation(db):
+    """MongoDBSaver serves a thread's latest checkpoint from memory and revalidates it by version."""
+    import asyncio
+
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    checkpointer = pytest.importorskip("mongodb.checkpointer")
+    from pymongo import AsyncMongoClient
+
+    async def scenario():
+        client = AsyncMongoClient(MONGODB_URI, serverSelectionTimeoutMS=2000)
+        saver = checkpointer.MongoDBSaver(client, TEST_DB, "checkpoints_cache", cache_validation="version")
+        values, history = await _chat(saver, 2)
+        thread = {"configurable": {"thread_id": history[0].config["configurable"]["thread_id"]}}
+
+        hits = saver.cache_hits
+        cached = await saver.aget_tuple(thread)
+        assert saver.cache_hits == hits + 1
+        assert cached.checkpoint["channel_values"]["messages"] == values["messages"]
+        assert cached.config == history[0].config
+
+        # Another process appends a checkpoint to the same thread
+        other = checkpointer.MongoDBSaver(client, TEST_DB, "checkpoints_cache")
+        latest = await other.aget_tuple(thread)
+        checkpoint = {**latest.checkpoint, "id": latest.checkpoint["id"][:-1] + "z"}
+        await other.aput(latest.config, checkpoint, {"source": "update", "step": 99})
+
+        refreshed = await saver.aget_tuple(thread)
+        assert refreshed.config["configurable"]["thread_ts"] == checkpoint["id"]
+        assert saver.cache_misses >= 1
+
+    asyncio.run(scenario())
+
+
+def test_checkpoint_history_pages_and_decodes_lazily(db):
+    """MongoDBSaver.alist_page pages a delta history by thread_ts and decodes checkpoints on access."""
+    import asyncio
+
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    checkpointer = pytest.importorskip("mongodb.checkpointer")
+    from pymongo import AsyncMongoClient
+
+    async def scenario():
+        client = AsyncMongoClient(MONGODB_URI, serverSelectionTimeoutMS=2000)
+        saver = checkpointer.MongoDBSaver(client, TEST_DB, "checkpoints_paged", delta=True, snapshot_interval=4)
+        _, history = await _chat(saver, 5)
+        thread = {"configurable": {"thread_id": history[0].config["configurable"]["thread_id"]}}
+
+        pages, cursor = [], None
+        while True:
+            page, cursor = await saver.alist_page(thread, limit=4, cursor=cursor)
+            pages.append(page)
+            if cursor is None:
+                break
+        configs_only = [t async for t in saver.alist(thread, include_checkpoint=False)]
+        return history, pages, configs_only
+
+    history, pages, configs_only = asyncio.run(scenario())
+
+    paged = [t for page in pages for t in page]
+    assert [len(page) for page in pages[:-1]] == [4] * (len(pages) - 1)
+    assert [t.config for t in paged] == [t.config for t in history]
+    assert isinstance(paged[0], checkpointer.LazyCheckpointTuple)
+    assert [t.checkpoint for t in paged] == [t.checkpoint for t in history]
+
+    assert [t.config for t in configs_only] == [t.config for t in history]
+    assert all(t.checkpoint is None for t in configs_only)
+    assert [t.metadata for t in configs_only] == [t.metadata for t in history]
@@ -0,0 +1,135 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mongodb.local_index import VERSIONS_COLLECTION, LocalVectorIndex, bump_version, current_version
+
+
+class FakeCursor(list):
+    def batch_size(self, size):
+        return self
+
+
+class FakeCollection:
+    """Just enough of a pymongo collection for LocalVectorIndex: documents keyed by _id."""
+
+    def __init__(self):
+        self.documents = {}
+        self.reads = 0
+
+    def find(self, query, projection=None):
+        self.reads += 1
+        key = next(iter(query))
+        return FakeCursor(dict(d) for d in self.documents.values() if key in d)
+
+    def find_one(self, query):
+        return self.documents.get(query["_id"])
+
+    def count_documents(self, query):
+        key = next(iter(query))
+        return sum(key in d for d in self.documents.values())
+
+    def update_one(self, query, update, upsert=False):
+        document = self.documents.setdefault(query["_id"], {"_id": query["_id"]})
+        for field, amount in update["$inc"].items():
+            document[field] = document.get(field, 0) + amount
+
+
+class FakeDb(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+class LocalVectorIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(3)
+        self.db = FakeDb()
+        self.vectors = self.rng.normal(size=(50, 8)).astype(np.float32)
+        for i, vector in enumerate(self.vectors):
+            self.db["employees"].documents[f"e{i}"] = {"_id": f"e{i}", "embedding": vector.tolist()}
+        self.db["employees"].documents["no_vector"] = {"_id": "no_vector"}
+        bump_version(self.db, "employees")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp.name) / "employees")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def index(self, **kwargs):
+        return LocalVectorIndex(self.db, "employees", self.path, 8, refresh_interval=0, **kwargs)
+
+    def exact_top(self, query, k, ids=None):
+        normalized = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        scores = normalized @ (query / np.linalg.norm(query))
+        order = [i for i in np.argsort(-scores) if ids is None or f"e{i}" in ids]
+        return [(f"e{i}", (1 + scores[i]) / 2) for i in order[:k]]
+
+    def test_search_matches_exact_cosine_ranking(self):
+        index = self.index()
+        index.refresh()
+        query = self.rng.normal(size=8)
+
+        self.assertEqual(len(index), 50)
+        for k in (1, 5, 50, 80):
+            hits = index.search(query, k)
+            expected = self.exact_top(query, k)
+            self.assertEqual([i for i, _ in hits], [i for i, _ in expected])
+            np.testing.assert_allclose([s for _, s in hits], [s for _, s in expected], rtol=1e-5)
+
+    def test_allowed_ids_restrict_the_candidates(self):
+        index = self.index()
+        index.refresh()
+        query = self.rng.normal(size=8)
+        allowed = {"e3", "e7", "e11", "e20", "unknown"}
+
+        hits = index.search(query, 3, allowed)
+
+        self.assertEqual([i for i, _ in hits], [i for i, _ in self.exact_top(query, 3, allowed)])
+        self.assertEqual(index.search(query, 3, []), [])
+
+    def test_restart_reopens_the_file_and_version_bumps_rebuild(self):
+        index = self.index()
+        index.refresh()
+        reads = self.db["employees"].reads
+
+        reopened = self.index()
+        reopened.refresh()
+        self.assertEqual(self.db["employees"].reads, reads)
+        self.assertIsInstance(reopened._state[0], np.memmap)
+        self.assertEqual(len(reopened), 50)
+
+        del self.db["employees"].documents["e0"]
+        bump_version(self.db, "employees")
+        reopened.refresh()
+        self.assertEqual(self.db["employees"].reads, reads + 1)
+        self.assertEqual(len(reopened), 49)
+        self.assertEqual(reopened.version, current_version(self.db, "employees"))
+        self.assertNotIn("e0", [i for i, _ in reopened.search(self.vectors[0], 5)])
+
+    def test_checks_are_throttled(self):
+        index = LocalVectorIndex(self.db, "employees", self.path, 8, refresh_interval=3600)
+        index.refresh()
+        bump_version(self.db, "employees")
+        index.refresh()
+
+        self.assertEqual(index.version, 1)
+        index.refresh(force=True)
+        self.assertEqual(index.version, 2)
+        self.assertEqual(self.db[VERSIONS_COLLECTION].documents["employees"]["version"], 2)
+
+    def test_empty_collection(self):
+        index = LocalVectorIndex(FakeDb(), "employees", self.path, 8, refresh_interval=0)
+        index.refresh()
+
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.search(np.ones(8), 5), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
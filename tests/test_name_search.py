@@ -0,0 +1,84 @@
+import re
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mongodb.name_search import add_name_fields, ensure_name_indexes, fuzzy_name_stage, name_prefix_query
+
+
+class NameSearchTest(unittest.TestCase):
+    def test_records_get_normalized_name_fields(self):
+        record = add_name_fields("workforce", {"first_name": "  Élodie ", "last_name": "O'Brien", "email": "e@x"})
+        self.assertEqual(record["first_name_lower"], "élodie")
+        self.assertEqual(record["last_name_lower"], "o'brien")
+        self.assertEqual(add_name_fields("employees", {"first_name": "Ann"}), {"first_name": "Ann"})
+
+    def test_names_are_case_folded(self):
+        record = add_name_fields("companies", {"company_name": "Straße GmbH"})
+        self.assertEqual(record["company_name_lower"], "strasse gmbh")
+        pattern = name_prefix_query("companies", "company_name", "STRASSE")["company_name_lower"]["$regex"]
+        self.assertTrue(re.match(pattern, record["company_name_lower"]))
+
+    def test_prefix_query_is_anchored_and_escapes_the_input(self):
+        query = name_prefix_query("companies", "company_name", " Smith (UK)+ ")
+        pattern = query["company_name_lower"]["$regex"]
+        self.assertEqual(list(query), ["company_name_lower"])
+        self.assertTrue(pattern.startswith("^"))
+        self.assertTrue(re.match(pattern, "smith (uk)+ holdings"))
+        self.assertIsNone(re.match(pattern, "smith uk holdings"))
+        self.assertNotIn("$options", query["company_name_lower"])
+
+    def test_fuzzy_stage_matches_every_name(self):
+        stage = fuzzy_name_stage("name_search", {"first_name": "Jhon", "last_name": "Doe"})
+        self.assertEqual(stage["$search"]["index"], "name_search")
+        self.assertEqual(
+            [clause["text"]["path"] for clause in stage["$search"]["compound"]["must"]], ["first_name", "last_name"]
+        )
+
+
+class FakeCompanies:
+    """The companies collection, answering only the backfill's query."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.indexes = []
+
+    def find(self, query, projection):
+        return [
+            doc for doc in self.documents
+            if isinstance(doc.get("company_name"), str)
+            and ("company_name_lower" not in doc or not doc["company_name_lower"].isascii())
+        ]
+
+    def bulk_write(self, updates, ordered=True):
+        for update in updates:
+            doc = next(doc for doc in self.documents if doc["_id"] == update._filter["_id"])
+            doc.update(update._doc["$set"])
+
+    def create_index(self, keys):
+        self.indexes.append(keys)
+
+
+class EnsureNameIndexesTest(unittest.TestCase):
+    def test_backfill_normalizes_like_new_records(self):
+        companies = FakeCompanies([
+            {"_id": 1, "company_name": " ÉCOLE Öz "},
+            {"_id": 2, "company_name": "Acme", "company_name_lower": "acme"},
+            {"_id": 3, "company_name": None},
+            {"_id": 4, "company_name": "Straße", "company_name_lower": "straße"},
+        ])
+        ensure_name_indexes({"companies": companies}, ["companies"], batch_size=1)
+
+        self.assertEqual(companies.documents[0]["company_name_lower"], "école öz")
+        self.assertEqual(companies.documents[0]["company_name_lower"],
+                         add_name_fields("companies", {"company_name": " ÉCOLE Öz "})["company_name_lower"])
+        self.assertNotIn("company_name_lower", companies.documents[2])
+        # Written when names were only lowercased
+        self.assertEqual(companies.documents[3]["company_name_lower"], "strasse")
+        self.assertEqual(companies.indexes, [[("company_name_lower", 1)]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import sys
+import unittest
+from pathlib import Path
+
+from bson import ObjectId
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mongodb.pagination import decode_cursor, encode_cursor, keyset_filter, keyset_sort, sort_index
+
+
+class KeysetPaginationTest(unittest.TestCase):
+    def test_cursor_round_trips_the_last_sort_key_and_id(self):
+        last_id = ObjectId()
+        token = encode_cursor("company_name", -1, {"_id": last_id, "company_name": "Beck-Lewis", "pay": "£22"})
+
+        self.assertNotIn("Beck", token)
+        self.assertEqual(decode_cursor(token, "company_name", -1), ("Beck-Lewis", last_id))
+
+    def test_invalid_or_mismatched_cursors_are_rejected(self):
+        token = encode_cursor("company_name", 1, {"_id": ObjectId(), "company_name": "A"})
+        with self.assertRaises(ValueError):
+            decode_cursor(token, "company_name", -1)
+        with self.assertRaises(ValueError):
+            decode_cursor("not a cursor", "company_name", 1)
+
+    def test_filter_starts_after_the_cursor_with_id_tiebreak(self):
+        last_id = ObjectId()
+        token = encode_cursor("company_name", 1, {"_id": last_id, "company_name": "Acme"})
+
+        self.assertEqual(keyset_filter("company_name", 1, None), {})
+        self.assertEqual(
+            keyset_filter("company_name", 1, token),
+            {
+                "company_name": {"$gte": "Acme"},
+                "$or": [{"company_name": {"$gt": "Acme"}}, {"company_name": "Acme", "_id": {"$gt": last_id}}],
+            },
+        )
+        token = encode_cursor("company_name", -1, {"_id": last_id, "company_name": "Acme"})
+        self.assertEqual(keyset_filter("company_name", -1, token)["company_name"], {"$lte": "Acme"})
+        self.assertEqual(keyset_sort("company_name", -1), [("company_name", -1), ("_id", -1)])
+
+    def test_only_indexed_sort_fields_are_allowed(self):
+        self.assertEqual(sort_index("companies", "company_name"), [("company_name", 1), ("_id", 1)])
+        with self.assertRaises(ValueError):
+            sort_index("companies", "description")
+
+
+if __name__ == "__main__":
+    unittest.main()
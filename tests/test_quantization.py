@@ -0,0 +1,76 @@
+import sys
+import unittest
+from pathlib import Path
+
+import bson
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mongodb.quantization import (
+    add_quantized_embedding,
+    decode_vector,
+    quantize_binary,
+    quantize_int8,
+    quantized_vector,
+    rescore,
+)
+
+
+def cosine(a, b):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return a @ b / np.linalg.norm(a) / np.linalg.norm(b)
+
+
+class QuantizationTest(unittest.TestCase):
+    def setUp(self):
+        self.vectors = np.random.default_rng(5).normal(scale=0.06, size=(20, 256))
+
+    def test_int8_keeps_cosine_similarity(self):
+        quantized = quantize_int8(self.vectors)
+
+        self.assertEqual(quantized.dtype, np.int8)
+        self.assertEqual(np.abs(quantized).max(axis=1).tolist(), [127] * 20)
+        for a, b in zip(self.vectors[:10], self.vectors[10:]):
+            self.assertAlmostEqual(cosine(a, b), cosine(quantize_int8(a), quantize_int8(b)), delta=0.01)
+
+    def test_binary_packs_the_signs(self):
+        packed = quantize_binary([0.5, -1, 0, 2, -3, 1, 1, -1, 0.1])
+
+        self.assertEqual(packed.tolist(), [0b10010110, 0b10000000])
+        vector = quantized_vector([0.5] * 9, "binary").as_vector()
+        self.assertEqual((vector.dtype, vector.padding, vector.data), (BinaryVectorDtype.PACKED_BIT, 7, [255, 128]))
+        with self.assertRaises(ValueError):
+            quantized_vector([0.5], "int4")
+
+    def test_records_get_packed_vectors(self):
+        vector = self.vectors[0].tolist()
+        record = add_quantized_embedding({"employee_id": "E1", "embedding": vector}, "int8")
+
+        self.assertIsInstance(record["embedding"], Binary)
+        np.testing.assert_allclose(decode_vector(record["embedding"]), vector, rtol=1e-6)
+        self.assertEqual(record["embedding_int8"].as_vector().data, quantize_int8(vector).tolist())
+        # 256 doubles as a BSON array vs packed float32 + int8
+        self.assertGreater(len(bson.encode({"embedding": vector})), 3000)
+        self.assertLess(len(bson.encode(record)), 1400)
+
+    def test_rescore_ranks_by_full_precision_vectors(self):
+        query = self.vectors[0]
+        candidates = [
+            {"employee_id": f"E{i}", "score": 0.9, "embedding": v.tolist()} for i, v in enumerate(self.vectors[1:6])
+        ]
+        # Packed float32, as stored by quantized ingestion
+        candidates[3]["embedding"] = Binary.from_vector(self.vectors[4].tolist(), BinaryVectorDtype.FLOAT32)
+        candidates.append({"employee_id": "no vector", "score": 0.1})
+
+        ranked = rescore(query, candidates, 4)
+
+        expected = sorted(range(5), key=lambda i: -cosine(query, self.vectors[i + 1]))[:4]
+        self.assertEqual([doc["employee_id"] for doc in ranked], [f"E{i}" for i in expected])
+        self.assertAlmostEqual(ranked[0]["score"], (1 + cosine(query, self.vectors[expected[0] + 1])) / 2, places=5)
+        self.assertFalse(any("embedding" in doc for doc in ranked))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -50,20 +50,33 @@ class RuntimeTest(unittest.TestCase):
             def __init__(self, *args, **kwargs):
                 self.admin = GoodAdmin()
 
+            def close(self):
+                pass
+
         class BadAdmin:
             @staticmethod
             def command(_):
                 raise RuntimeError("nope")
 
         class BadClient:
+            closed = []
+
             def __init__(self, *args, **kwargs):
                 self.admin = BadAdmin()
 
+            def close(self):
+                BadClient.closed.append(self)
+
         self.mod.MongoClient = GoodClient
         self.assertIsNotNone(self.mod.get_mongo_client("mongodb://ok"))
 
         self.mod.MongoClient = BadClient
         self.assertIsNone(self.mod.get_mongo_client("mongodb://bad"))
+        # The failed client is closed and not cached, so the next call builds a fresh one
+        self.assertNotIn("mongodb://bad", self.mod.registry._clients)
+        self.assertEqual(len(BadClient.closed), 1)
+        self.assertIsNone(self.mod.get_mongo_client("mongodb://bad"))
+        self.assertEqual(len(BadClient.closed), 2)
 
     def test_get_session_history_contract(self):
         history = self.mod.get_session_history("s1")
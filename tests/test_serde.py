@@ -0,0 +1,55 @@
+import pickle
+import sys
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from mongodb.checkpointer import JsonPlusSerializerCompat
+from mongodb.serde import MAGIC, CompressedSerializer
+
+
+CHECKPOINT = {
+    "v": 1,
+    "id": "1",
+    "channel_values": {"messages": [HumanMessage(content="who knows Kubernetes?"), AIMessage(content="John Doe")]},
+    "channel_versions": {"messages": 2},
+}
+
+
+class CompressedSerializerTest(unittest.TestCase):
+    def test_round_trip_with_each_codec(self):
+        for compression in (None, "zlib", "zstd"):
+            serde = CompressedSerializer(compression=compression, compress_threshold=0)
+            blob = serde.dumps(CHECKPOINT)
+            self.assertTrue(blob.startswith(MAGIC))
+            self.assertEqual(serde.loads(blob), CHECKPOINT)
+
+    def test_decodes_like_jsonplus(self):
+        value = {"ts": datetime(2024, 5, 1, 12, tzinfo=timezone.utc), "tags": {"a", "b"}, "nested": {"lc": 0, "x": [1]}}
+        serde = CompressedSerializer(compress_threshold=0)
+        self.assertEqual(serde.loads(serde.dumps(value)), JsonPlusSerializerCompat().loads(JsonPlusSerializerCompat().dumps(value)))
+
+    def test_small_blobs_are_not_compressed(self):
+        serde = CompressedSerializer(compression="zlib", compress_threshold=1 << 20)
+        self.assertEqual(serde.dumps(CHECKPOINT)[len(MAGIC) + 1:len(MAGIC) + 2], b"n")
+
+    def test_loads_existing_json_blobs(self):
+        self.assertEqual(CompressedSerializer().loads(JsonPlusSerializerCompat().dumps(CHECKPOINT)), CHECKPOINT)
+
+    def test_never_unpickles(self):
+        with self.assertRaises(ValueError):
+            CompressedSerializer().loads(pickle.dumps(CHECKPOINT))
+
+    def test_rejects_unknown_version(self):
+        blob = bytearray(CompressedSerializer().dumps(CHECKPOINT))
+        blob[len(MAGIC)] = 99
+        with self.assertRaises(ValueError):
+            CompressedSerializer().loads(bytes(blob))
+
+
+if __name__ == "__main__":
+    unittest.main()
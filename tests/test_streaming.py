@@ -0,0 +1,89 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from streaming import TokenStreamer
+
+
+class FakeClient:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.frames = []
+
+    async def send(self, frame):
+        await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+
+
+class TokenStreamerTest(unittest.TestCase):
+    def test_coalesces_by_size_and_keeps_order(self):
+        client = FakeClient()
+        tokens = [f"t{i} " for i in range(100)]
+
+        async def run():
+            streamer = TokenStreamer(client.send, window_ms=10000, max_bytes=40)
+            for token in tokens:
+                await streamer.push(token)
+            await streamer.flush()
+            return streamer
+
+        streamer = asyncio.run(run())
+
+        self.assertEqual("".join(client.frames), "".join(tokens))
+        self.assertLess(len(client.frames), 15)
+        self.assertTrue(all(len(frame) >= 40 for frame in client.frames[:-1]))
+        self.assertEqual(streamer.stats()["frames"], len(client.frames))
+
+    def test_time_window_flushes_without_new_tokens(self):
+        client = FakeClient()
+
+        async def run():
+            streamer = TokenStreamer(client.send, window_ms=10, max_bytes=1024)
+            await streamer.push("Hello")
+            await streamer.push(" world")
+            await asyncio.sleep(0.05)
+            sent_before_flush = list(client.frames)
+            await streamer.flush()
+            return sent_before_flush
+
+        self.assertEqual(asyncio.run(run()), ["Hello world"])
+        self.assertEqual(client.frames, ["Hello world"])
+
+    def test_flush_sends_immediately(self):
+        client = FakeClient()
+
+        async def run():
+            streamer = TokenStreamer(client.send, window_ms=10000)
+            await streamer.push("before tool")
+            await streamer.flush()
+            return list(client.frames)
+
+        self.assertEqual(asyncio.run(run()), ["before tool"])
+
+    def test_slow_client_gets_bigger_frames_and_bounded_buffer(self):
+        client = FakeClient(delay=0.02)
+        tokens = ["x" * 10] * 200
+
+        async def run():
+            streamer = TokenStreamer(client.send, window_ms=5, max_bytes=20, max_buffer_bytes=200)
+            sizes = []
+            for token in tokens:
+                await streamer.push(token)
+                sizes.append(streamer._size)
+                await asyncio.sleep(0.001)
+            await streamer.flush()
+            return max(sizes)
+
+        largest_buffer = asyncio.run(run())
+
+        self.assertEqual("".join(client.frames), "".join(tokens))
+        self.assertLess(largest_buffer, 200)
+        self.assertLess(len(client.frames), 100)
+        self.assertGreater(max(len(frame) for frame in client.frames), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.formatting import compact, compact_availability, estimate_tokens, format_results
+
+
+class ToolFormattingTest(unittest.TestCase):
+    def test_compact_flattens_documents_to_one_line(self):
+        self.assertEqual(
+            compact({"street": "1 Main St\nSpringfield", "tags": ["a", "b"], "remote": False}),
+            "street: 1 Main St, Springfield, tags: a, b, remote: False",
+        )
+
+    def test_availability_groups_consecutive_days_with_the_same_hours(self):
+        nine_to_six = {"start": "9:00am", "close": "6:00pm"}
+        days = {day: nine_to_six for day in ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")}
+        days["Saturday"] = {"start": "10:00am", "close": "2:00pm"}
+        days["Monday"] = nine_to_six
+        self.assertEqual(compact_availability(days), "Mon-Fri 9:00am-6:00pm, Sat 10:00am-2:00pm")
+
+        del days["Wednesday"]
+        self.assertEqual(
+            compact_availability(days), "Mon-Tue 9:00am-6:00pm, Thu-Fri 9:00am-6:00pm, Sat 10:00am-2:00pm"
+        )
+        self.assertEqual(compact_availability(None), "no availability listed")
+
+    def test_results_within_budget_are_numbered_from_the_offset(self):
+        output = format_results("Companies:", ["a", "b"], 100, offset=10)
+        self.assertEqual(output, "Companies:\n11. a\n12. b")
+
+    def test_results_over_budget_stop_with_a_continuation_hint(self):
+        lines = [f"record {i} " + "x" * 76 for i in range(50)]
+        output = format_results(
+            "Records:", lines, 200, continuation=lambda next_skip: f"Call the tool with skip={next_skip}."
+        )
+
+        self.assertLessEqual(estimate_tokens(output), 230)
+        shown = output.count("\n") - 1
+        self.assertLess(shown, 50)
+        self.assertTrue(output.endswith(f"(Showing results 1-{shown}. Call the tool with skip={shown}.)"))
+
+    def test_first_result_is_shortened_rather_than_dropped(self):
+        output = format_results("Employee:", ["y" * 10000], 100)
+        self.assertIn("... [truncated]", output)
+        self.assertLess(len(output), 1000)
+
+    def test_hint_for_more_pages_on_the_server(self):
+        output = format_results("Records:", ["a"], 100, offset=20, has_more=True, continuation=lambda n: f"skip={n}")
+        self.assertTrue(output.endswith("(Showing results 21-21. skip=21)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mongodb.vector_search import (
+    add_employee_filters,
+    employee_pre_filter,
+    employee_vector_index_definition,
+    num_candidates,
+    vector_search_pipeline,
+)
+
+EMPLOYEE = {
+    "employee_id": "E123456",
+    "job_details": {"job_title": "Software Engineer", "department": "IT", "salary": 193067},
+    "work_location": {"nearest_office": "Paris Office", "is_remote": False},
+    "skills": ["SQL", "Kubernetes", "Python"],
+}
+
+
+class VectorSearchFilterTest(unittest.TestCase):
+    def test_employees_get_normalized_filter_fields(self):
+        record = add_employee_filters("employees", dict(EMPLOYEE))
+        self.assertEqual(
+            record["search_filters"],
+            {
+                "department": "it",
+                "nearest_office": "paris",
+                "is_remote": False,
+                "skills": ["sql", "kubernetes", "python"],
+                "salary": 193067,
+            },
+        )
+        self.assertNotIn("search_filters", add_employee_filters("companies", {"company_name": "Acme"}))
+
+    def test_pre_filter_requires_every_criterion_and_skill(self):
+        self.assertEqual(employee_pre_filter(), {})
+        self.assertEqual(employee_pre_filter(department=" it "), {"search_filters.department": {"$eq": "it"}})
+        self.assertEqual(
+            employee_pre_filter(nearest_office="Paris Office", is_remote=False, skills=["Python", "sql"],
+                                min_salary=100000, max_salary=200000),
+            {
+                "$and": [
+                    {"search_filters.nearest_office": {"$eq": "paris"}},
+                    {"search_filters.is_remote": {"$eq": False}},
+                    {"search_filters.skills": {"$eq": "python"}},
+                    {"search_filters.skills": {"$eq": "sql"}},
+                    {"search_filters.salary": {"$gte": 100000}},
+                    {"search_filters.salary": {"$lte": 200000}},
+                ]
+            },
+        )
+
+    def test_candidates_are_tunable_and_bounded(self):
+        self.assertEqual(num_candidates(11, 10), 110)
+        self.assertEqual(num_candidates(11, 10, minimum=200), 200)
+        self.assertEqual(num_candidates(50, 1000), 10000)
+
+    def test_pipeline_and_index_definition_cover_the_filters(self):
+        pre_filter = employee_pre_filter(department="IT")
+        pipeline = vector_search_pipeline("vector_index", "embedding", [0.1], 5, 100, pre_filter, {"_id": 0})
+        self.assertEqual(pipeline[0]["$vectorSearch"]["filter"], pre_filter)
+        self.assertEqual(pipeline[0]["$vectorSearch"]["numCandidates"], 100)
+        self.assertEqual(pipeline[-1], {"$project": {"_id": 0}})
+
+        definition = employee_vector_index_definition("embedding", 256)
+        filter_paths = {field["path"] for field in definition["fields"] if field["type"] == "filter"}
+        self.assertEqual(
+            filter_paths,
+            {f"search_filters.{field}" for field in ("department", "nearest_office", "is_remote", "skills", "salary")},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
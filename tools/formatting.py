@@ -0,0 +1,83 @@
+from typing import Callable, Dict, List, Optional, Sequence
+
+DAY_ABBREVIATIONS = {
+    "Monday": "Mon",
+    "Tuesday": "Tue",
+    "Wednesday": "Wed",
+    "Thursday": "Thu",
+    "Friday": "Fri",
+    "Saturday": "Sat",
+    "Sunday": "Sun",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    # About 4 characters per token, like context_window.estimate_tokens
+    return len(text) // 4 + 1
+
+
+def compact(value) -> str:
+    """One-line rendering of a document value: nested fields as "key: value", lists comma-separated."""
+    if isinstance(value, dict):
+        return ", ".join(f"{key}: {compact(item)}" for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return ", ".join(compact(item) for item in value)
+    if isinstance(value, str):
+        return value.replace("\n", ", ")
+    return str(value)
+
+
+def compact_availability(days: Optional[Dict[str, Dict[str, str]]]) -> str:
+    """{"Monday": {"start": "9:00am", "close": "6:00pm"}, ...} -> "Mon-Fri 9:00am-6:00pm", grouping consecutive days."""
+    if not days:
+        return "no availability listed"
+    # [first day, last day, hours, index of last day]
+    groups = []
+    for index, (day, abbreviation) in enumerate(DAY_ABBREVIATIONS.items()):
+        hours = days.get(day)
+        if not hours:
+            continue
+        span = f"{hours.get('start')}-{hours.get('close')}"
+        if groups and groups[-1][2] == span and groups[-1][3] == index - 1:
+            groups[-1][1] = abbreviation
+            groups[-1][3] = index
+        else:
+            groups.append([abbreviation, abbreviation, span, index])
+    return ", ".join(
+        f"{first} {span}" if first == last else f"{first}-{last} {span}" for first, last, span, _ in groups
+    )
+
+
+def format_results(
+    title: str,
+    lines: Sequence[str],
+    budget_tokens: int,
+    offset: int = 0,
+    has_more: bool = False,
+    continuation: Optional[Callable[[int], str]] = None,
+) -> str:
+    """
+    Numbered list of one line per result, cut off once `budget_tokens` is spent.
+
+    The first result is always included, shortened if needed. When results are left out (or
+    `has_more` says the query has more), a final line tells the model how to get the next ones;
+    `continuation` receives the offset of the first result not shown.
+    """
+    output: List[str] = [title]
+    used = estimate_tokens(title)
+    shown = 0
+    for line in lines:
+        line = f"{offset + shown + 1}. {line}"
+        tokens = estimate_tokens(line)
+        if used + tokens > budget_tokens:
+            if shown:
+                break
+            line = line[: max((budget_tokens - used) * 4, 80)] + "... [truncated]"
+            tokens = estimate_tokens(line)
+        output.append(line)
+        used += tokens
+        shown += 1
+
+    if (shown < len(lines) or has_more) and continuation is not None:
+        output.append(f"(Showing results {offset + 1}-{offset + shown}. {continuation(offset + shown)})")
+    return "\n".join(output)
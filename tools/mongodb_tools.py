@@ -1,58 +1,89 @@
-from langchain.agents import tool
+from langchain_core.tools import StructuredTool
 from langchain_openai import OpenAIEmbeddings
-from langchain_mongodb import MongoDBAtlasVectorSearch
-from typing import Optional
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from pymongo.errors import ExecutionTimeout
 from config import (
     OPEN_AI_EMBEDDING_MODEL,
     OPEN_AI_EMBEDDING_MODEL_DIMENSION,
-    MONGO_URI,
-    DATABASE_NAME,
     COLLECTION_NAME,
-    COMPANY_COLLECTION_NAME,
-    WORKFORCE_COLLECTION_NAME,
-    ATLAS_VECTOR_SEARCH_INDEX
+    ATLAS_VECTOR_SEARCH_INDEX,
+    VECTOR_SEARCH_CANDIDATE_FACTOR,
+    VECTOR_SEARCH_MIN_CANDIDATES,
+    EMPLOYEE_SEARCH_MODE,
+    EMPLOYEE_TEXT_SEARCH_INDEX,
+    HYBRID_FUSION,
+    HYBRID_WEIGHTS,
+    EMPLOYEE_VECTOR_INDEX,
+    LOCAL_VECTOR_INDEX_PATH,
+    LOCAL_VECTOR_INDEX_REFRESH_S,
+    EMBEDDING_QUANTIZATION,
+    QUANTIZED_RESCORE_FACTOR,
+    TOOL_MAX_TIME_MS,
+    TOOL_PAGE_SIZE,
+    TOOL_RESULT_TOKEN_BUDGET,
+    NAME_SEARCH_INDEX,
 )
+from mongodb.availability import availability_query
+from mongodb.pagination import encode_cursor, keyset_filter, keyset_sort, sort_index
+from mongodb.vector_search import employee_pre_filter, num_candidates, vector_search_stage
+from mongodb.local_index import LocalVectorIndex
+from mongodb.quantization import QUANTIZED_FIELDS, quantized_vector, rescore
+from mongodb.hybrid_search import rank_fusion_pipeline, reciprocal_rank_fusion, text_search_pipeline
+from mongodb.name_search import fuzzy_name_stage, name_prefix_query
+from tools.formatting import compact, compact_availability, format_results
 from tools.google_tools import authenticate, get_document, insert_comment, create_google_doc, send_email
-from db_utils import companies_collection, workforce_collection
-
-embedding_model = OpenAIEmbeddings(model=OPEN_AI_EMBEDDING_MODEL, dimensions=OPEN_AI_EMBEDDING_MODEL_DIMENSION)
-
-vector_store_employees = MongoDBAtlasVectorSearch.from_connection_string(
-    connection_string=MONGO_URI,
-    namespace=f"{DATABASE_NAME}.{COLLECTION_NAME}",
-    embedding=embedding_model,
-    index_name=ATLAS_VECTOR_SEARCH_INDEX,
-    text_key="employee_string"
-)
-
-vector_store_companies = MongoDBAtlasVectorSearch.from_connection_string(
-    connection_string=MONGO_URI,
-    namespace=f"{DATABASE_NAME}.{COMPANY_COLLECTION_NAME}",
-    embedding=embedding_model,
-    index_name=ATLAS_VECTOR_SEARCH_INDEX,
-    text_key="description"
+from db_utils import (
+    db,
+    companies_collection,
+    workforce_collection,
+    async_companies_collection,
+    async_workforce_collection,
+    async_db,
 )
+from embedding_cache import CachedEmbeddings, get_embedding_cache
 
-vector_store_workforce = MongoDBAtlasVectorSearch.from_connection_string(
-    connection_string=MONGO_URI,
-    namespace=f"{DATABASE_NAME}.{WORKFORCE_COLLECTION_NAME}",
-    embedding=embedding_model,
-    index_name=ATLAS_VECTOR_SEARCH_INDEX,
-    text_key="employee_string"
-)
+embedding_model = OpenAIEmbeddings(model=OPEN_AI_EMBEDDING_MODEL, dimensions=OPEN_AI_EMBEDDING_MODEL_DIMENSION)
 
+# Repeated queries ("who knows Kubernetes") are answered from the shared embedding cache
+embedding_cache = get_embedding_cache()
+if embedding_cache is not None:
+    embedding_model = CachedEmbeddings(embedding_model, embedding_cache)
 
+# Tools fetch only the fields they print (server-side projections), and their output is one compact
+# line per record within TOOL_RESULT_TOKEN_BUDGET, so a result never floods the prompt
+COMPANY_PROJECTION = {"_id": 0, "company_name": 1, "pay": 1, "opening_hours": 1, "description": 1, "address": 1}
+WORKFORCE_PROJECTION = {
+    "_id": 0, "first_name": 1, "last_name": 1, "job_title": 1, "email": 1, "phone_number": 1, "availability_day": 1,
+}
+# Applied after $vectorSearch, so the embedding and the long employee string never leave the server
+EMPLOYEE_PROJECTION = {
+    "_id": 0,
+    "score": 1,
+    "employee_id": 1,
+    "first_name": 1,
+    "last_name": 1,
+    "job_details.job_title": 1,
+    "job_details.department": 1,
+    "job_details.employment_type": 1,
+    "work_location": 1,
+    "skills": 1,
+    "contact_details.email": 1,
+}
 
-@tool
-def list_companies(limit: int = 10, skip: int = 0, sort_by: str = "company_name", sort_order: int = 1) -> str:
+def _list_companies(limit: int = 10, cursor: Optional[str] = None, sort_by: str = "company_name", sort_order: int = 1,
+                    max_time_ms: Optional[int] = None) -> str:
     """
     Retrieves a list of companies from the companies collection.
 
     Args:
         limit: Integer representing the maximum number of companies to retrieve (default: 10).
-        skip: Integer representing the number of companies to skip (for pagination, default: 0).
+        cursor: Optional string token returned by a previous call, to get the companies after that page.
         sort_by: String representing the field to sort by (default: "company_name").
         sort_order: Integer representing the sort order (1 for ascending, -1 for descending, default: 1).
+        max_time_ms: Optional integer limiting how long the database may spend on the query, in milliseconds.
 
     Returns:
         A string containing the list of companies if found, or a message indicating no companies were found.
@@ -62,49 +93,119 @@ def list_companies(limit: int = 10, skip: int = 0, sort_by: str = "company_name"
         if sort_order not in [1, -1]:
             return "Invalid sort_order. Use 1 for ascending or -1 for descending."
 
-        # Perform the query
-        cursor = companies_collection.find().sort(sort_by, sort_order).skip(skip).limit(limit)
-        companies = list(cursor)
-
-        if companies:
-            result = f"Found {len(companies)} companies:\n\n"
-            for company in companies:
-                result += f"Name: {company['company_name']}\n"
-                result += f"Pay: {company['pay']}\n"
-                result += f"Opening Hours: {company['opening_hours']['open']} - {company['opening_hours']['close']}\n"
-                result += f"Description: {company['description']}\n"
-                result += f"Address: {company['address']}\n\n"
-            return result
-        else:
-            return "No companies found with the given criteria."
+        # Perform the query; one extra document tells whether there is a next page
+        query, sort, index = _companies_page(sort_by, sort_order, cursor)
+        documents = companies_collection.find(query, {**COMPANY_PROJECTION, "_id": 1}).sort(sort).hint(index)
+        companies = list(documents.limit(limit + 1).max_time_ms(max_time_ms or TOOL_MAX_TIME_MS))
+        return _format_companies(companies, limit, sort_by, sort_order)
+
+    except ValueError as e:
+        return str(e)
+    except ExecutionTimeout:
+        return _timeout_message(max_time_ms)
+    except Exception as e:
+        return f"An error occurred while retrieving the list of companies: {str(e)}"
+
+async def _alist_companies(limit: int = 10, cursor: Optional[str] = None, sort_by: str = "company_name",
+                           sort_order: int = 1, max_time_ms: Optional[int] = None) -> str:
+    try:
+        if sort_order not in [1, -1]:
+            return "Invalid sort_order. Use 1 for ascending or -1 for descending."
+
+        query, sort, index = _companies_page(sort_by, sort_order, cursor)
+        documents = async_companies_collection.find(query, {**COMPANY_PROJECTION, "_id": 1}).sort(sort).hint(index)
+        companies = await documents.limit(limit + 1).max_time_ms(max_time_ms or TOOL_MAX_TIME_MS).to_list(None)
+        return _format_companies(companies, limit, sort_by, sort_order)
 
+    except ValueError as e:
+        return str(e)
+    except ExecutionTimeout:
+        return _timeout_message(max_time_ms)
     except Exception as e:
         return f"An error occurred while retrieving the list of companies: {str(e)}"
 
-@tool
-def search_company(company_name: str) -> str:
+def _companies_page(sort_by: str, sort_order: int, cursor: Optional[str]):
+    # Keyset pagination: each page starts after the cursor's (sort key, _id) on the sort index, so
+    # deep pages cost the same as the first. The hint makes unindexed sorts fail rather than sort in memory
+    index = sort_index("companies", sort_by)
+    return keyset_filter(sort_by, sort_order, cursor), keyset_sort(sort_by, sort_order), index
+
+def _format_companies(companies, limit: int, sort_by: str, sort_order: int) -> str:
+    if companies:
+        page = companies[:limit]
+        return format_results(
+            "Companies:",
+            [_company_line(company) for company in page],
+            TOOL_RESULT_TOKEN_BUDGET,
+            has_more=len(companies) > limit,
+            continuation=lambda shown: (
+                f'Call list_companies with cursor="{encode_cursor(sort_by, sort_order, page[shown - 1])}" '
+                f"(same sort_by and sort_order) for more."
+            ),
+        )
+    else:
+        return "No companies found with the given criteria."
+
+def _company_line(company) -> str:
+    hours = company.get("opening_hours") or {}
+    return (
+        f"{company.get('company_name')} | pay: {company.get('pay')} | "
+        f"hours: {hours.get('open')}-{hours.get('close')} | {compact(company.get('description', ''))} | "
+        f"address: {compact(company.get('address', ''))}"
+    )
+
+def _search_company(company_name: str, max_time_ms: Optional[int] = None) -> str:
     """
     Searches for a company by name in the companies collection.
 
     Args:
         company_name: String representing the name of the company to search for.
+        max_time_ms: Optional integer limiting how long the database may spend on the query, in milliseconds.
 
     Returns:
         A string containing the company information if found, or a message indicating the company wasn't found.
     """
-    query = {"company_name": {"$regex": company_name, "$options": "i"}}
-    company = companies_collection.find_one(query)
-    
+    # Names starting with the input, shortest (exact match) first, read in index order
+    query = name_prefix_query("companies", "company_name", company_name)
+    try:
+        company = companies_collection.find_one(
+            query, COMPANY_PROJECTION, sort=[("company_name_lower", 1)], max_time_ms=max_time_ms or TOOL_MAX_TIME_MS
+        )
+        if company is None and NAME_SEARCH_INDEX:
+            pipeline = _fuzzy_pipeline({"company_name": company_name}, {}, COMPANY_PROJECTION, 0, 1)
+            company = next(iter(companies_collection.aggregate(pipeline, maxTimeMS=max_time_ms or TOOL_MAX_TIME_MS)), None)
+    except ExecutionTimeout:
+        return _timeout_message(max_time_ms)
+    return _format_company(company, company_name)
+
+async def _asearch_company(company_name: str, max_time_ms: Optional[int] = None) -> str:
+    query = name_prefix_query("companies", "company_name", company_name)
+    try:
+        company = await async_companies_collection.find_one(
+            query, COMPANY_PROJECTION, sort=[("company_name_lower", 1)], max_time_ms=max_time_ms or TOOL_MAX_TIME_MS
+        )
+        if company is None and NAME_SEARCH_INDEX:
+            pipeline = _fuzzy_pipeline({"company_name": company_name}, {}, COMPANY_PROJECTION, 0, 1)
+            cursor = await async_companies_collection.aggregate(pipeline, maxTimeMS=max_time_ms or TOOL_MAX_TIME_MS)
+            companies = await cursor.to_list(None)
+            company = companies[0] if companies else None
+    except ExecutionTimeout:
+        return _timeout_message(max_time_ms)
+    return _format_company(company, company_name)
+
+def _format_company(company, company_name: str) -> str:
     if company:
-        return f"Company found: {company}"
+        return format_results("Company found:", [_company_line(company)], TOOL_RESULT_TOKEN_BUDGET)
     else:
         return f"No company found with the name '{company_name}'"
 
-@tool
-def search_workforce(first_name: Optional[str] = None, 
-                     last_name: Optional[str] = None, 
-                     availability_day: Optional[str] = None, 
-                     availability_time: Optional[str] = None) -> str:
+def _search_workforce(first_name: Optional[str] = None, 
+                      last_name: Optional[str] = None, 
+                      availability_day: Optional[str] = None, 
+                      availability_time: Optional[str] = None,
+                      available_until: Optional[str] = None,
+                      skip: int = 0,
+                      max_time_ms: Optional[int] = None) -> str:
     """
     Searches for workforce documents based on name, availability day, and availability time.
 
@@ -113,34 +214,333 @@ def search_workforce(first_name: Optional[str] = None,
         last_name: Optional string representing the last name to search for.
         availability_day: Optional string representing the day of availability (e.g., "Monday", "Tuesday").
         availability_time: Optional string representing the time of availability (e.g., "9:00am", "2:00pm").
+        available_until: Optional string; with availability_time, only matches people available for the whole span
+            from availability_time to this time (e.g., "5:00pm").
+        skip: Integer representing the number of matching records to skip (for pagination, default: 0).
+        max_time_ms: Optional integer limiting how long the database may spend on the query, in milliseconds.
 
     Returns:
         A string containing the workforce information if found, or a message indicating no matching records were found.
     """
-    query = {}
-    if first_name:
-        query["first_name"] = {"$regex": first_name, "$options": "i"}
-    if last_name:
-        query["last_name"] = {"$regex": last_name, "$options": "i"}
-    if availability_day:
-        query[f"availability_day.{availability_day}"] = {"$exists": True}
-    if availability_time:
-        query["availability_time.start"] = {"$lte": availability_time}
-        query["availability_time.close"] = {"$gte": availability_time}
-
-    results = list(workforce_collection.find(query))
-    
+    names = _workforce_names(first_name, last_name)
+    try:
+        filters = _workforce_filters(availability_day, availability_time, available_until)
+    except ValueError as e:
+        return str(e)
+    try:
+        cursor = workforce_collection.find(_workforce_query(names, filters), WORKFORCE_PROJECTION)
+        results = list(cursor.skip(skip).limit(TOOL_PAGE_SIZE + 1).max_time_ms(max_time_ms or TOOL_MAX_TIME_MS))
+        if not results and names and NAME_SEARCH_INDEX:
+            pipeline = _fuzzy_pipeline(names, filters, WORKFORCE_PROJECTION, skip, TOOL_PAGE_SIZE + 1)
+            results = list(workforce_collection.aggregate(pipeline, maxTimeMS=max_time_ms or TOOL_MAX_TIME_MS))
+    except ExecutionTimeout:
+        return _timeout_message(max_time_ms)
+    return _format_workforce(results, skip)
+
+async def _asearch_workforce(first_name: Optional[str] = None, 
+                             last_name: Optional[str] = None, 
+                             availability_day: Optional[str] = None, 
+                             availability_time: Optional[str] = None,
+                             available_until: Optional[str] = None,
+                             skip: int = 0,
+                             max_time_ms: Optional[int] = None) -> str:
+    names = _workforce_names(first_name, last_name)
+    try:
+        filters = _workforce_filters(availability_day, availability_time, available_until)
+    except ValueError as e:
+        return str(e)
+    try:
+        cursor = async_workforce_collection.find(_workforce_query(names, filters), WORKFORCE_PROJECTION)
+        cursor = cursor.skip(skip).limit(TOOL_PAGE_SIZE + 1).max_time_ms(max_time_ms or TOOL_MAX_TIME_MS)
+        results = await cursor.to_list(None)
+        if not results and names and NAME_SEARCH_INDEX:
+            pipeline = _fuzzy_pipeline(names, filters, WORKFORCE_PROJECTION, skip, TOOL_PAGE_SIZE + 1)
+            cursor = await async_workforce_collection.aggregate(pipeline, maxTimeMS=max_time_ms or TOOL_MAX_TIME_MS)
+            results = await cursor.to_list(None)
+    except ExecutionTimeout:
+        return _timeout_message(max_time_ms)
+    return _format_workforce(results, skip)
+
+def _workforce_names(first_name, last_name) -> dict:
+    return {field: name for field, name in (("first_name", first_name), ("last_name", last_name)) if name}
+
+def _workforce_query(names: dict, filters: dict) -> dict:
+    query = dict(filters)
+    for field, name in names.items():
+        query.update(name_prefix_query("workforce", field, name))
+    return query
+
+def _workforce_filters(availability_day, availability_time, available_until) -> dict:
+    # Minute intervals per weekday, matched with $elemMatch on the availability index
+    if availability_day or availability_time or available_until:
+        return availability_query(availability_day, availability_time, available_until)
+    return {}
+
+def _format_workforce(results, skip: int = 0) -> str:
     if results:
-        return f"Matching workforce records found: {results}"
+        return format_results(
+            "Matching workforce records:",
+            [_workforce_line(record) for record in results[:TOOL_PAGE_SIZE]],
+            TOOL_RESULT_TOKEN_BUDGET,
+            offset=skip,
+            has_more=len(results) > TOOL_PAGE_SIZE,
+            continuation=lambda next_skip: f"Call search_workforce with the same filters and skip={next_skip} for more.",
+        )
     else:
         return "No matching workforce records found"
 
-@tool
-def lookup_employees(query:str, n=10) -> str:
-    "Gathers employee details from a mongodb database"
-    print(query)
-    result = vector_store_employees.similarity_search_with_score(query=query, k=n)
-    return str(result)
+def _workforce_line(record) -> str:
+    return (
+        f"{record.get('first_name')} {record.get('last_name')} | {record.get('job_title')} | "
+        f"{record.get('email')} | {record.get('phone_number')} | "
+        f"available: {compact_availability(record.get('availability_day'))}"
+    )
+
+def _employee_line(employee) -> str:
+    job = employee.get("job_details") or {}
+    location = employee.get("work_location") or {}
+    remote = ", remote" if location.get("is_remote") else ""
+    return (
+        f"{employee.get('first_name')} {employee.get('last_name')} "
+        f"({employee.get('employee_id')}) | {job.get('job_title')}, {job.get('department')}, "
+        f"{job.get('employment_type')} | {location.get('nearest_office')}{remote} | "
+        f"skills: {compact(employee.get('skills', []))} | "
+        f"{(employee.get('contact_details') or {}).get('email')} | score: {employee.get('score', 0):.3f}"
+    )
+
+def _fuzzy_pipeline(names: dict, filters: dict, projection: dict, skip: int, limit: int) -> list:
+    # Typo-tolerant retry through the Atlas Search index, for names the prefix lookup missed
+    pipeline = [fuzzy_name_stage(NAME_SEARCH_INDEX, names)]
+    if filters:
+        pipeline.append({"$match": filters})
+    return pipeline + [{"$skip": skip}, {"$limit": limit}, {"$project": projection}]
+
+def _timeout_message(max_time_ms: Optional[int]) -> str:
+    return f"The database query took longer than {max_time_ms or TOOL_MAX_TIME_MS} ms and was stopped."
+
+# Each tool has a coroutine, so ToolNode awaits the query on the shared AsyncMongoClient during
+# async runs instead of blocking a worker thread; the sync function serves tool.invoke
+list_companies = StructuredTool.from_function(func=_list_companies, coroutine=_alist_companies, name="list_companies")
+search_company = StructuredTool.from_function(func=_search_company, coroutine=_asearch_company, name="search_company")
+search_workforce = StructuredTool.from_function(
+    func=_search_workforce, coroutine=_asearch_workforce, name="search_workforce"
+)
+
+def _lookup_employees(query: str, n: int = 10, offset: int = 0,
+                      department: Optional[str] = None,
+                      nearest_office: Optional[str] = None,
+                      is_remote: Optional[bool] = None,
+                      skills: Optional[List[str]] = None,
+                      min_salary: Optional[float] = None,
+                      max_salary: Optional[float] = None,
+                      max_time_ms: Optional[int] = None) -> str:
+    """
+    Gathers employee details from a mongodb database, ranked by similarity to the query.
+
+    Args:
+        query: String describing the employees to look for (e.g., "experienced backend engineer").
+        n: Integer representing the number of employees to return (default: 10).
+        offset: Integer representing the number of best matches to skip, to get the next results of the same query.
+        department: Optional string; only employees of this department (e.g., "IT").
+        nearest_office: Optional string; only employees whose nearest office is this one (e.g., "Paris").
+        is_remote: Optional boolean; only remote (True) or only on-site (False) employees.
+        skills: Optional list of strings; only employees having every one of these skills.
+        min_salary: Optional number; only employees paid at least this salary.
+        max_salary: Optional number; only employees paid at most this salary.
+        max_time_ms: Optional integer limiting how long the database may spend on the query, in milliseconds.
+
+    Returns:
+        A string with one line per matching employee, or a message indicating no employees matched.
+    """
+    pre_filter = employee_pre_filter(department, nearest_office, is_remote, skills, min_salary, max_salary)
+    try:
+        # Vector search has no skip: page N re-runs it for offset + n hits, plus one to tell whether there are more
+        results = search_employees(query, embedding_model.embed_query(query), offset + n + 1, pre_filter,
+                                   max_time_ms=max_time_ms)
+    except ExecutionTimeout:
+        return _timeout_message(max_time_ms)
+    return _format_employees(results, n, offset)
+
+async def _alookup_employees(query: str, n: int = 10, offset: int = 0,
+                             department: Optional[str] = None,
+                             nearest_office: Optional[str] = None,
+                             is_remote: Optional[bool] = None,
+                             skills: Optional[List[str]] = None,
+                             min_salary: Optional[float] = None,
+                             max_salary: Optional[float] = None,
+                             max_time_ms: Optional[int] = None) -> str:
+    pre_filter = employee_pre_filter(department, nearest_office, is_remote, skills, min_salary, max_salary)
+    try:
+        results = await asearch_employees(query, await embedding_model.aembed_query(query), offset + n + 1, pre_filter,
+                                          max_time_ms=max_time_ms)
+    except ExecutionTimeout:
+        return _timeout_message(max_time_ms)
+    return _format_employees(results, n, offset)
+
+def search_employees(query: str, query_vector: List[float], k: int, pre_filter: Optional[dict] = None,
+                     mode: str = EMPLOYEE_SEARCH_MODE, fusion: str = HYBRID_FUSION,
+                     vector_index: str = EMPLOYEE_VECTOR_INDEX, quantization: str = EMBEDDING_QUANTIZATION,
+                     max_time_ms: Optional[int] = None) -> List[dict]:
+    """
+    The k best employees for a query and its embedding, as projected documents with a `score`.
+    `mode`, `fusion`, `vector_index` and `quantization` default to EMPLOYEE_SEARCH_MODE, HYBRID_FUSION,
+    EMPLOYEE_VECTOR_INDEX and EMBEDDING_QUANTIZATION.
+    """
+    collection = db[COLLECTION_NAME]
+    time_limit = max_time_ms or TOOL_MAX_TIME_MS
+    options = {"maxTimeMS": time_limit}
+    if vector_index == "local":
+        def local_search():
+            index = get_local_employee_index()
+            index.refresh()
+            allowed = None
+            if pre_filter:
+                allowed = [document["_id"] for document in collection.find(pre_filter, {"_id": 1}, max_time_ms=time_limit)]
+            hits = index.search(query_vector, k, allowed)
+            found = collection.find({"_id": {"$in": [i for i, _ in hits]}}, _LOCAL_PROJECTION, max_time_ms=time_limit)
+            return _ranked_documents(found, hits)
+
+        if mode != "hybrid":
+            return local_search()
+        # The full-text search runs on the server while the local index is searched here
+        text = text_search_pipeline(EMPLOYEE_TEXT_SEARCH_INDEX, query, k, pre_filter)
+        with ThreadPoolExecutor(1) as pool:
+            text_results = pool.submit(lambda: list(collection.aggregate(_scored("text", text), **options)))
+            ranked = {"vector": local_search(), "text": text_results.result()}
+        return reciprocal_rank_fusion(ranked, "employee_id", HYBRID_WEIGHTS, k)
+
+    pipelines = _employee_pipelines(query, query_vector, k, pre_filter, mode, quantization)
+    if not quantization and (len(pipelines) == 1 or fusion == "server"):
+        return list(collection.aggregate(_employee_search(pipelines, k), **options))
+
+    # Both searches at once, fused here. Quantized vector results are rescored first, which $rankFusion can't do
+    def search(name):
+        results = list(collection.aggregate(_scored(name, pipelines[name], quantization), **options))
+        return rescore(query_vector, results, k) if name == "vector" and quantization else results
+
+    if len(pipelines) == 1:
+        return search("vector")
+    with ThreadPoolExecutor(len(pipelines)) as pool:
+        ranked = dict(zip(pipelines, pool.map(search, pipelines)))
+    return reciprocal_rank_fusion(ranked, "employee_id", HYBRID_WEIGHTS, k)
+
+async def asearch_employees(query: str, query_vector: List[float], k: int, pre_filter: Optional[dict] = None,
+                            mode: str = EMPLOYEE_SEARCH_MODE, fusion: str = HYBRID_FUSION,
+                            vector_index: str = EMPLOYEE_VECTOR_INDEX, quantization: str = EMBEDDING_QUANTIZATION,
+                            max_time_ms: Optional[int] = None) -> List[dict]:
+    collection = async_db[COLLECTION_NAME]
+    time_limit = max_time_ms or TOOL_MAX_TIME_MS
+    options = {"maxTimeMS": time_limit}
+
+    async def search(pipeline):
+        cursor = await collection.aggregate(pipeline, **options)
+        return await cursor.to_list(None)
+
+    if vector_index == "local":
+        async def local_search():
+            index = get_local_employee_index()
+            # Version check, and a rebuild after ingestion, read the collection: keep them off the event loop
+            await asyncio.to_thread(index.refresh)
+            allowed = None
+            if pre_filter:
+                cursor = collection.find(pre_filter, {"_id": 1}, max_time_ms=time_limit)
+                allowed = [document["_id"] for document in await cursor.to_list(None)]
+            hits = index.search(query_vector, k, allowed)
+            cursor = collection.find({"_id": {"$in": [i for i, _ in hits]}}, _LOCAL_PROJECTION, max_time_ms=time_limit)
+            return _ranked_documents(await cursor.to_list(None), hits)
+
+        if mode != "hybrid":
+            return await local_search()
+        text = text_search_pipeline(EMPLOYEE_TEXT_SEARCH_INDEX, query, k, pre_filter)
+        vector_results, text_results = await asyncio.gather(local_search(), search(_scored("text", text)))
+        ranked = {"vector": vector_results, "text": text_results}
+        return reciprocal_rank_fusion(ranked, "employee_id", HYBRID_WEIGHTS, k)
+
+    pipelines = _employee_pipelines(query, query_vector, k, pre_filter, mode, quantization)
+    if not quantization and (len(pipelines) == 1 or fusion == "server"):
+        return await search(_employee_search(pipelines, k))
+    lists = await asyncio.gather(
+        *(search(_scored(name, pipeline, quantization)) for name, pipeline in pipelines.items())
+    )
+    ranked = dict(zip(pipelines, lists))
+    if quantization:
+        ranked["vector"] = rescore(query_vector, ranked["vector"], k)
+    if len(ranked) == 1:
+        return ranked["vector"]
+    return reciprocal_rank_fusion(ranked, "employee_id", HYBRID_WEIGHTS, k)
+
+# In-process vector index over the employees' embeddings, created on first use with EMPLOYEE_VECTOR_INDEX = "local"
+_local_index: Optional[LocalVectorIndex] = None
+_local_index_lock = threading.Lock()
+_LOCAL_PROJECTION = {**EMPLOYEE_PROJECTION, "_id": 1}
+
+def get_local_employee_index() -> LocalVectorIndex:
+    global _local_index
+    with _local_index_lock:
+        if _local_index is None:
+            _local_index = LocalVectorIndex(
+                db, COLLECTION_NAME, LOCAL_VECTOR_INDEX_PATH, OPEN_AI_EMBEDDING_MODEL_DIMENSION,
+                refresh_interval=LOCAL_VECTOR_INDEX_REFRESH_S,
+            )
+        return _local_index
+
+def _ranked_documents(documents, hits) -> List[dict]:
+    # Projected documents in the index's order, with its scores
+    by_id = {document.pop("_id"): document for document in documents}
+    return [{**by_id[i], "score": score} for i, score in hits if i in by_id]
+
+def _employee_pipelines(query: str, query_vector, k: int, pre_filter: Optional[dict], mode: str,
+                        quantization: str = "") -> Dict[str, list]:
+    """
+    Ranked searches for the k best employees: the vector search, plus a full-text search in hybrid
+    mode, which catches exact terms (skill names, employee IDs, surnames) embeddings rank poorly.
+    With a `quantization`, the vector search runs on the quantized embeddings and returns extra
+    candidates, to be rescored with the full-precision ones.
+    """
+    path, search_vector, limit = "embedding", query_vector, k
+    if quantization:
+        path, search_vector = QUANTIZED_FIELDS[quantization], quantized_vector(query_vector, quantization)
+        limit = k * QUANTIZED_RESCORE_FACTOR[quantization]
+    # The filters are applied inside $vectorSearch (filter fields of the vector index), so only
+    # matching employees are candidates
+    candidates = num_candidates(limit, VECTOR_SEARCH_CANDIDATE_FACTOR, VECTOR_SEARCH_MIN_CANDIDATES)
+    vector_search = vector_search_stage(ATLAS_VECTOR_SEARCH_INDEX, path, search_vector, limit, candidates, pre_filter)
+    pipelines = {"vector": [vector_search]}
+    if mode == "hybrid":
+        pipelines["text"] = text_search_pipeline(EMPLOYEE_TEXT_SEARCH_INDEX, query, k, pre_filter)
+    return pipelines
+
+def _employee_search(pipelines: Dict[str, list], k: int) -> list:
+    # A single aggregation: the vector search alone, or every search fused on the server by $rankFusion
+    if len(pipelines) == 1:
+        return _scored("vector", pipelines["vector"])
+    return rank_fusion_pipeline(pipelines, HYBRID_WEIGHTS, k, EMPLOYEE_PROJECTION)
+
+def _scored(name: str, pipeline: list, quantization: str = "") -> list:
+    score = {"vector": "vectorSearchScore", "text": "searchScore"}[name]
+    projection = EMPLOYEE_PROJECTION
+    if name == "vector" and quantization:
+        # The full-precision embedding, for rescoring
+        projection = {**EMPLOYEE_PROJECTION, "embedding": 1}
+    return pipeline + [{"$set": {"score": {"$meta": score}}}, {"$project": projection}]
+
+def _format_employees(results, n: int, offset: int) -> str:
+    if not results[offset:]:
+        return "No matching employees found"
+    return format_results(
+        "Matching employees:",
+        [_employee_line(employee) for employee in results[offset:offset + n]],
+        TOOL_RESULT_TOKEN_BUDGET,
+        offset=offset,
+        has_more=len(results) > offset + n,
+        continuation=lambda next_offset: (
+            f"Call lookup_employees with the same query and filters and offset={next_offset} for more."
+        ),
+    )
+
+lookup_employees = StructuredTool.from_function(
+    func=_lookup_employees, coroutine=_alookup_employees, name="lookup_employees"
+)
 
 tools = [
     lookup_employees, 
@@ -152,4 +552,4 @@ tools = [
     search_company,
     search_workforce,
     list_companies
-]
\ No newline at end of file
+]
@@ -1,6 +1,7 @@
 import openai
 import re
 import config
+from embedding_cache import get_embedding_cache
 
 
 # OPEN_AI_EMBEDDING_MODEL="text-embedding-3-small"
@@ -14,11 +15,20 @@ def get_embedding(text):
     if not text or not isinstance(text, str):
         return None
 
+    # Identical text has already been embedded before, skip the API call
+    cache = get_embedding_cache()
+    if cache is not None:
+        embedding = cache.get(text)
+        if embedding is not None:
+            return embedding
+
     try:
         # Call OpenAI API to get the embedding
         embedding = openai.embeddings.create(
             input=text,
             model=config.OPEN_AI_EMBEDDING_MODEL, dimensions=config.OPEN_AI_EMBEDDING_MODEL_DIMENSION).data[0].embedding
+        if cache is not None:
+            cache.put(text, embedding)
         return embedding
     except Exception as e:
         print(f"Error in get_embedding: {e}")